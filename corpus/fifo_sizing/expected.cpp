@@ -0,0 +1,87 @@
+#include <tapa.h>
+#include <ap_int.h>
+
+#define DEPTH 4
+
+void src( tapa::mmap<int >& in, tapa::ostream<int> & a, tapa::ostream<int> & b, int n ) {
+    for( int i = 0; i < n; i++ ) {
+        int t = in[i];
+        a.write( t );
+        b.write( t );
+    }
+}
+
+void pass( tapa::istream<int> & x, tapa::ostream<int> & y, int n ) {
+    for( int i = 0; i < n; i++ ) {
+        y.write( x.read() + 1 );
+    }
+}
+
+void acc( tapa::istream<int> & x, tapa::istream<int> & fb_in, tapa::ostream<int> & y, tapa::ostream<int> & fb_out, int n ) {
+    for( int i = 0; i < n; i++ ) {
+        int t = x.read();
+        int u = fb_in.read();
+        y.write( t + u );
+        fb_out.write( t );
+    }
+}
+
+void widen( tapa::istream<int> & y, tapa::ostream<ap_uint<24> > & z, int n ) {
+    for( int i = 0; i < n; i++ ) {
+        int t = y.read();
+        z.write( t );
+    }
+}
+
+void join( tapa::istream<int> & x, tapa::istream<ap_uint<24> > & z, tapa::mmap<int >& out, int n ) {
+    for( int i = 0; i < n; i++ ) {
+        int t = x.read();
+        int u = z.read();
+        out[i] = t + u;
+    }
+}
+
+void top(
+    tapa::mmap<int > in,
+    tapa::mmap<int > out,
+    int n
+) {
+    tapa::stream<int, 2> a; // declared depth 2
+    tapa::stream<int, 7> b; // declared depth 2, +5 to balance src -> join with the latency 8 of src -> pass[0] -> pass[1] -> acc -> widen -> join
+    tapa::stream<int, 2> c; // declared depth 2
+    tapa::stream<int, 2> d; // no depth pragma, minimum depth 2
+    tapa::stream<int, 2> e; // no depth pragma, minimum depth 2
+    tapa::stream<int, 1> fb; // declared depth 1, in a stream cycle
+    tapa::stream<ap_uint<24>, DEPTH> z; // declared depth DEPTH, modeled as 2
+    tapa::task()
+    .invoke( src,
+             in,
+             a,
+             b,
+             n )
+    .invoke( pass,
+             a,
+             c,
+             n )
+    .invoke( pass,
+             c,
+             d,
+             n )
+    .invoke( acc,
+             d,
+             fb,
+             e,
+             fb,
+             n )
+    .invoke( widen,
+             e,
+             z,
+             n )
+    .invoke( join,
+             b,
+             z,
+             out,
+             n )
+    ;
+}
+
@@ -0,0 +1,65 @@
+#include <hls_stream.h>
+#include <ap_int.h>
+
+#define DEPTH 4
+
+// src forks to a short path (b) and a long path (a -> c -> d -> e -> z)
+void src(int* in, hls::stream<int>& a, hls::stream<int>& b, int n) {
+  for (int i = 0; i < n; i++) {
+    int t = in[i];
+    a.write(t);
+    b.write(t);
+  }
+}
+
+void pass(hls::stream<int>& x, hls::stream<int>& y, int n) {
+  for (int i = 0; i < n; i++) {
+    y.write(x.read() + 1);
+  }
+}
+
+void acc(hls::stream<int>& x, hls::stream<int>& fb_in, hls::stream<int>& y, hls::stream<int>& fb_out, int n) {
+  for (int i = 0; i < n; i++) {
+    int t = x.read();
+    int u = fb_in.read();
+    y.write(t + u);
+    fb_out.write(t);
+  }
+}
+
+void widen(hls::stream<int>& y, hls::stream<ap_uint<24> >& z, int n) {
+  for (int i = 0; i < n; i++) {
+    int t = y.read();
+    z.write(t);
+  }
+}
+
+void join(hls::stream<int>& x, hls::stream<ap_uint<24> >& z, int* out, int n) {
+  for (int i = 0; i < n; i++) {
+    int t = x.read();
+    int u = z.read();
+    out[i] = t + u;
+  }
+}
+
+void top(int* in, int* out, int n) {
+  hls::stream<int> a;
+  hls::stream<int> b;
+  hls::stream<int> c;
+  hls::stream<int> d;
+  hls::stream<int> e;
+  hls::stream<int> fb;
+  hls::stream<ap_uint<24> > z;
+#pragma HLS stream variable=a depth=2
+#pragma HLS stream variable=b depth=2
+#pragma HLS stream variable=c depth=2
+#pragma HLS stream variable=fb depth=1
+#pragma HLS stream variable=z depth=DEPTH
+#pragma HLS dataflow
+  src(in, a, b, n);
+  pass(a, c, n);
+  pass(c, d, n);
+  acc(d, fb, e, fb, n);
+  widen(e, z, n);
+  join(b, z, out, n);
+}
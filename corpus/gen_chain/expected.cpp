@@ -0,0 +1,69 @@
+#include <tapa.h>
+#include <ap_int.h>
+
+typedef ap_uint<64> data_t;
+
+void task_0( tapa::ostream<ap_uint<8> > & out_0, tapa::mmap<data_t >& mem_in_0, int n ) {
+    for( int i = 0; i < n; i++ ) {
+#pragma HLS pipeline II=1
+        data_t acc = 0;
+        acc += mem_in_0[i];
+        out_0.write( acc + 0 );
+    }
+}
+
+void task_1( tapa::istream<ap_uint<8> > & in_0, tapa::ostream<ap_uint<8> > & out_0, int n ) {
+    for( int i = 0; i < n; i++ ) {
+#pragma HLS pipeline II=1
+        data_t acc = 0;
+        acc += in_0.read();
+        out_0.write( acc + 0 );
+    }
+}
+
+void task_2( tapa::istream<ap_uint<8> > & in_0, tapa::ostream<ap_uint<8> > & out_0, int n ) {
+    for( int i = 0; i < n; i++ ) {
+#pragma HLS pipeline II=1
+        data_t acc = 0;
+        acc += in_0.read();
+        out_0.write( acc + 0 );
+    }
+}
+
+void task_3( tapa::istream<ap_uint<8> > & in_0, tapa::mmap<data_t >& mem_out_0, int n ) {
+    for( int i = 0; i < n; i++ ) {
+#pragma HLS pipeline II=1
+        data_t acc = 0;
+        acc += in_0.read();
+        mem_out_0[i] = acc;
+    }
+}
+
+void top(
+    tapa::mmap<data_t > mem_in_0,
+    tapa::mmap<data_t > mem_out_0,
+    int n
+) {
+    tapa::stream<ap_uint<8>, 2> s_0_0;
+    tapa::stream<ap_uint<8>, 4> s_1_0;
+    tapa::stream<ap_uint<8>, 8> s_2_0;
+    tapa::task()
+    .invoke( task_0,
+             s_0_0,
+             mem_in_0,
+             n )
+    .invoke( task_1,
+             s_0_0,
+             s_1_0,
+             n )
+    .invoke( task_2,
+             s_1_0,
+             s_2_0,
+             n )
+    .invoke( task_3,
+             s_2_0,
+             mem_out_0,
+             n )
+    ;
+}
+
@@ -0,0 +1,54 @@
+#include <hls_stream.h>
+#include <ap_int.h>
+
+typedef ap_uint<64> data_t;
+
+void task_0(hls::stream<ap_uint<8> >& out_0, data_t* mem_in_0, int n) {
+  for (int i = 0; i < n; i++) {
+#pragma HLS pipeline II=1
+    data_t acc = 0;
+    acc += mem_in_0[i];
+    out_0.write(acc + 0);
+  }
+}
+
+void task_1(hls::stream<ap_uint<8> >& in_0, hls::stream<ap_uint<8> >& out_0, int n) {
+  for (int i = 0; i < n; i++) {
+#pragma HLS pipeline II=1
+    data_t acc = 0;
+    acc += in_0.read();
+    out_0.write(acc + 0);
+  }
+}
+
+void task_2(hls::stream<ap_uint<8> >& in_0, hls::stream<ap_uint<8> >& out_0, int n) {
+  for (int i = 0; i < n; i++) {
+#pragma HLS pipeline II=1
+    data_t acc = 0;
+    acc += in_0.read();
+    out_0.write(acc + 0);
+  }
+}
+
+void task_3(hls::stream<ap_uint<8> >& in_0, data_t* mem_out_0, int n) {
+  for (int i = 0; i < n; i++) {
+#pragma HLS pipeline II=1
+    data_t acc = 0;
+    acc += in_0.read();
+    mem_out_0[i] = acc;
+  }
+}
+
+void top(data_t* mem_in_0, data_t* mem_out_0, int n) {
+  hls::stream<ap_uint<8> > s_0_0;
+  hls::stream<ap_uint<8> > s_1_0;
+  hls::stream<ap_uint<8> > s_2_0;
+#pragma HLS stream variable=s_0_0 depth=2
+#pragma HLS stream variable=s_1_0 depth=4
+#pragma HLS stream variable=s_2_0 depth=8
+#pragma HLS dataflow
+  task_0(s_0_0, mem_in_0, n);
+  task_1(s_0_0, s_1_0, n);
+  task_2(s_1_0, s_2_0, n);
+  task_3(s_2_0, mem_out_0, n);
+}
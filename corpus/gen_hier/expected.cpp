@@ -0,0 +1,127 @@
+#include <tapa.h>
+#include <ap_int.h>
+
+typedef ap_uint<64> data_t;
+
+void task_0( tapa::ostream<ap_uint<8> > & out_0, data_t* mem_in_0, data_t* mem_in_1, int n ) {
+    for( int i = 0; i < n; i++ ) {
+#pragma HLS pipeline II=1
+        data_t acc = 0;
+        acc += mem_in_0[i];
+        acc += mem_in_1[i];
+        out_0.write( acc + 0 );
+    }
+}
+
+void task_0_hier_1( tapa::ostream<ap_uint<8> > & out_0, data_t* mem_in_0, data_t* mem_in_1, int n ) {
+    task_0( out_0, mem_in_0, mem_in_1, n );
+}
+
+void task_0_hier_2( tapa::ostream<ap_uint<8> > & out_0, tapa::mmap<data_t >& mem_in_0, tapa::mmap<data_t >& mem_in_1, int n ) {
+    task_0_hier_1( out_0, mem_in_0, mem_in_1, n );
+}
+
+void task_1( tapa::istream<ap_uint<8> > & in_0, tapa::ostream<ap_uint<8> > & out_0, int n ) {
+    for( int i = 0; i < n; i++ ) {
+#pragma HLS pipeline II=1
+        data_t acc = 0;
+        acc += in_0.read();
+        out_0.write( acc + 0 );
+    }
+}
+
+void task_1_hier_1( tapa::istream<ap_uint<8> > & in_0, tapa::ostream<ap_uint<8> > & out_0, int n ) {
+    task_1( in_0, out_0, n );
+}
+
+void task_1_hier_2( tapa::istream<ap_uint<8> > & in_0, tapa::ostream<ap_uint<8> > & out_0, int n ) {
+    task_1_hier_1( in_0, out_0, n );
+}
+
+void task_2( tapa::istream<ap_uint<8> > & in_0, tapa::ostream<ap_uint<8> > & out_0, int n ) {
+    for( int i = 0; i < n; i++ ) {
+#pragma HLS pipeline II=1
+        data_t acc = 0;
+        acc += in_0.read();
+        out_0.write( acc + 0 );
+    }
+}
+
+void task_2_hier_1( tapa::istream<ap_uint<8> > & in_0, tapa::ostream<ap_uint<8> > & out_0, int n ) {
+    task_2( in_0, out_0, n );
+}
+
+void task_2_hier_2( tapa::istream<ap_uint<8> > & in_0, tapa::ostream<ap_uint<8> > & out_0, int n ) {
+    task_2_hier_1( in_0, out_0, n );
+}
+
+void task_3( tapa::istream<ap_uint<8> > & in_0, tapa::ostream<ap_uint<8> > & out_0, int n ) {
+    for( int i = 0; i < n; i++ ) {
+#pragma HLS pipeline II=1
+        data_t acc = 0;
+        acc += in_0.read();
+        out_0.write( acc + 0 );
+    }
+}
+
+void task_3_hier_1( tapa::istream<ap_uint<8> > & in_0, tapa::ostream<ap_uint<8> > & out_0, int n ) {
+    task_3( in_0, out_0, n );
+}
+
+void task_3_hier_2( tapa::istream<ap_uint<8> > & in_0, tapa::ostream<ap_uint<8> > & out_0, int n ) {
+    task_3_hier_1( in_0, out_0, n );
+}
+
+void task_4( tapa::istream<ap_uint<8> > & in_0, data_t* mem_out_0, data_t* mem_out_1, int n ) {
+    for( int i = 0; i < n; i++ ) {
+#pragma HLS pipeline II=1
+        data_t acc = 0;
+        acc += in_0.read();
+        mem_out_0[i] = acc;
+        mem_out_1[i] = acc;
+    }
+}
+
+void task_4_hier_1( tapa::istream<ap_uint<8> > & in_0, data_t* mem_out_0, data_t* mem_out_1, int n ) {
+    task_4( in_0, mem_out_0, mem_out_1, n );
+}
+
+void task_4_hier_2( tapa::istream<ap_uint<8> > & in_0, tapa::mmap<data_t >& mem_out_0, tapa::mmap<data_t >& mem_out_1, int n ) {
+    task_4_hier_1( in_0, mem_out_0, mem_out_1, n );
+}
+
+void top(
+    tapa::mmap<data_t > mem_in_0,
+    tapa::mmap<data_t > mem_in_1,
+    tapa::mmap<data_t > mem_out_0,
+    tapa::mmap<data_t > mem_out_1,
+    int n
+) {
+    tapa::stream<ap_uint<8>, 2> s_0_0;
+    tapa::stream<ap_uint<8>, 4> s_1_0;
+    tapa::task()
+    .invoke( task_0_hier_2,
+             s_0_0,
+             mem_in_0,
+             mem_in_1,
+             n )
+    .invoke( task_1_hier_2,
+             s_0_0,
+             s_1_0,
+             n )
+    .invoke( task_2_hier_2,
+             s_1_0,
+             s_2_0,
+             n )
+    .invoke( task_3_hier_2,
+             s_2_0,
+             s_3_0,
+             n )
+    .invoke( task_4_hier_2,
+             s_3_0,
+             mem_out_0,
+             mem_out_1,
+             n )
+    ;
+}
+
@@ -0,0 +1,106 @@
+#include <hls_stream.h>
+#include <ap_int.h>
+
+typedef ap_uint<64> data_t;
+
+void task_0(hls::stream<ap_uint<8> >& out_0, data_t* mem_in_0, data_t* mem_in_1, int n) {
+  for (int i = 0; i < n; i++) {
+#pragma HLS pipeline II=1
+    data_t acc = 0;
+    acc += mem_in_0[i];
+    acc += mem_in_1[i];
+    out_0.write(acc + 0);
+  }
+}
+
+void task_0_hier_1(hls::stream<ap_uint<8> >& out_0, data_t* mem_in_0, data_t* mem_in_1, int n) {
+  task_0(out_0, mem_in_0, mem_in_1, n);
+}
+
+void task_0_hier_2(hls::stream<ap_uint<8> >& out_0, data_t* mem_in_0, data_t* mem_in_1, int n) {
+  task_0_hier_1(out_0, mem_in_0, mem_in_1, n);
+}
+
+void task_1(hls::stream<ap_uint<8> >& in_0, hls::stream<ap_uint<8> >& out_0, int n) {
+  for (int i = 0; i < n; i++) {
+#pragma HLS pipeline II=1
+    data_t acc = 0;
+    acc += in_0.read();
+    out_0.write(acc + 0);
+  }
+}
+
+void task_1_hier_1(hls::stream<ap_uint<8> >& in_0, hls::stream<ap_uint<8> >& out_0, int n) {
+  task_1(in_0, out_0, n);
+}
+
+void task_1_hier_2(hls::stream<ap_uint<8> >& in_0, hls::stream<ap_uint<8> >& out_0, int n) {
+  task_1_hier_1(in_0, out_0, n);
+}
+
+void task_2(hls::stream<ap_uint<8> >& in_0, hls::stream<ap_uint<8> >& out_0, int n) {
+  for (int i = 0; i < n; i++) {
+#pragma HLS pipeline II=1
+    data_t acc = 0;
+    acc += in_0.read();
+    out_0.write(acc + 0);
+  }
+}
+
+void task_2_hier_1(hls::stream<ap_uint<8> >& in_0, hls::stream<ap_uint<8> >& out_0, int n) {
+  task_2(in_0, out_0, n);
+}
+
+void task_2_hier_2(hls::stream<ap_uint<8> >& in_0, hls::stream<ap_uint<8> >& out_0, int n) {
+  task_2_hier_1(in_0, out_0, n);
+}
+
+void task_3(hls::stream<ap_uint<8> >& in_0, hls::stream<ap_uint<8> >& out_0, int n) {
+  for (int i = 0; i < n; i++) {
+#pragma HLS pipeline II=1
+    data_t acc = 0;
+    acc += in_0.read();
+    out_0.write(acc + 0);
+  }
+}
+
+void task_3_hier_1(hls::stream<ap_uint<8> >& in_0, hls::stream<ap_uint<8> >& out_0, int n) {
+  task_3(in_0, out_0, n);
+}
+
+void task_3_hier_2(hls::stream<ap_uint<8> >& in_0, hls::stream<ap_uint<8> >& out_0, int n) {
+  task_3_hier_1(in_0, out_0, n);
+}
+
+void task_4(hls::stream<ap_uint<8> >& in_0, data_t* mem_out_0, data_t* mem_out_1, int n) {
+  for (int i = 0; i < n; i++) {
+#pragma HLS pipeline II=1
+    data_t acc = 0;
+    acc += in_0.read();
+    mem_out_0[i] = acc;
+    mem_out_1[i] = acc;
+  }
+}
+
+void task_4_hier_1(hls::stream<ap_uint<8> >& in_0, data_t* mem_out_0, data_t* mem_out_1, int n) {
+  task_4(in_0, mem_out_0, mem_out_1, n);
+}
+
+void task_4_hier_2(hls::stream<ap_uint<8> >& in_0, data_t* mem_out_0, data_t* mem_out_1, int n) {
+  task_4_hier_1(in_0, mem_out_0, mem_out_1, n);
+}
+
+void top(data_t* mem_in_0, data_t* mem_in_1, data_t* mem_out_0, data_t* mem_out_1, int n) {
+  hls::stream<ap_uint<8> > s_0_0;
+  hls::stream<ap_uint<8> > s_1_0;
+  hls::stream<ap_uint<8> > s_2_0;
+  hls::stream<ap_uint<8> > s_3_0;
+#pragma HLS stream variable=s_0_0 depth=2
+#pragma HLS stream variable=s_1_0 depth=4
+#pragma HLS dataflow
+  task_0_hier_2(s_0_0, mem_in_0, mem_in_1, n);
+  task_1_hier_2(s_0_0, s_1_0, n);
+  task_2_hier_2(s_1_0, s_2_0, n);
+  task_3_hier_2(s_2_0, s_3_0, n);
+  task_4_hier_2(s_3_0, mem_out_0, mem_out_1, n);
+}
@@ -0,0 +1,147 @@
+#include <tapa.h>
+#include <ap_int.h>
+
+typedef ap_uint<64> data_t;
+
+void task_0( tapa::ostream<ap_uint<8> > & out_0, tapa::ostream<ap_uint<16> > & out_1, tapa::ostream<ap_uint<24> > & out_2, tapa::mmap<data_t >& mem_in_0, int n ) {
+    for( int i = 0; i < n; i++ ) {
+#pragma HLS pipeline II=1
+        data_t acc = 0;
+        acc += mem_in_0[i];
+        out_0.write( acc + 0 );
+        out_1.write( acc + 1 );
+        out_2.write( acc + 2 );
+    }
+}
+
+void task_1( tapa::istream<ap_uint<8> > & in_0, tapa::istream<ap_uint<16> > & in_1, tapa::istream<ap_uint<24> > & in_2, tapa::ostream<ap_uint<8> > & out_0, tapa::ostream<ap_uint<16> > & out_1, tapa::ostream<ap_uint<24> > & out_2, int n ) {
+    for( int i = 0; i < n; i++ ) {
+#pragma HLS pipeline II=1
+        data_t acc = 0;
+        acc += in_0.read();
+        acc += in_1.read();
+        acc += in_2.read();
+        out_0.write( acc + 0 );
+        out_1.write( acc + 1 );
+        out_2.write( acc + 2 );
+    }
+}
+
+void task_2( tapa::istream<ap_uint<8> > & in_0, tapa::istream<ap_uint<16> > & in_1, tapa::istream<ap_uint<24> > & in_2, tapa::ostream<ap_uint<8> > & out_0, tapa::ostream<ap_uint<16> > & out_1, tapa::ostream<ap_uint<24> > & out_2, int n ) {
+    for( int i = 0; i < n; i++ ) {
+#pragma HLS pipeline II=1
+        data_t acc = 0;
+        acc += in_0.read();
+        acc += in_1.read();
+        acc += in_2.read();
+        out_0.write( acc + 0 );
+        out_1.write( acc + 1 );
+        out_2.write( acc + 2 );
+    }
+}
+
+void task_3( tapa::istream<ap_uint<8> > & in_0, tapa::istream<ap_uint<16> > & in_1, tapa::istream<ap_uint<24> > & in_2, tapa::ostream<ap_uint<8> > & out_0, tapa::ostream<ap_uint<16> > & out_1, tapa::ostream<ap_uint<24> > & out_2, int n ) {
+    for( int i = 0; i < n; i++ ) {
+#pragma HLS pipeline II=1
+        data_t acc = 0;
+        acc += in_0.read();
+        acc += in_1.read();
+        acc += in_2.read();
+        out_0.write( acc + 0 );
+        out_1.write( acc + 1 );
+        out_2.write( acc + 2 );
+    }
+}
+
+void task_4( tapa::istream<ap_uint<8> > & in_0, tapa::istream<ap_uint<16> > & in_1, tapa::istream<ap_uint<24> > & in_2, tapa::ostream<ap_uint<8> > & out_0, tapa::ostream<ap_uint<16> > & out_1, tapa::ostream<ap_uint<24> > & out_2, int n ) {
+    for( int i = 0; i < n; i++ ) {
+#pragma HLS pipeline II=1
+        data_t acc = 0;
+        acc += in_0.read();
+        acc += in_1.read();
+        acc += in_2.read();
+        out_0.write( acc + 0 );
+        out_1.write( acc + 1 );
+        out_2.write( acc + 2 );
+    }
+}
+
+void task_5( tapa::istream<ap_uint<8> > & in_0, tapa::istream<ap_uint<16> > & in_1, tapa::istream<ap_uint<24> > & in_2, tapa::mmap<data_t >& mem_out_0, int n ) {
+    for( int i = 0; i < n; i++ ) {
+#pragma HLS pipeline II=1
+        data_t acc = 0;
+        acc += in_0.read();
+        acc += in_1.read();
+        acc += in_2.read();
+        mem_out_0[i] = acc;
+    }
+}
+
+void top(
+    tapa::mmap<data_t > mem_in_0,
+    tapa::mmap<data_t > mem_out_0,
+    int n
+) {
+    tapa::stream<ap_uint<8>, 2> s_0_0;
+    tapa::stream<ap_uint<16>, 4> s_0_1;
+    tapa::stream<ap_uint<24>, 8> s_0_2;
+    tapa::stream<ap_uint<8>, 16> s_1_0;
+    tapa::stream<ap_uint<16>, 32> s_1_1;
+    tapa::stream<ap_uint<24>, 64> s_1_2;
+    tapa::stream<ap_uint<8>, 2> s_2_0;
+    tapa::stream<ap_uint<16>, 4> s_2_1;
+    tapa::stream<ap_uint<24>, 8> s_2_2;
+    tapa::stream<ap_uint<8>, 16> s_3_0;
+    tapa::stream<ap_uint<16>, 32> s_3_1;
+    tapa::stream<ap_uint<24>, 64> s_3_2;
+    tapa::stream<ap_uint<8>, 2> s_4_0;
+    tapa::stream<ap_uint<16>, 4> s_4_1;
+    tapa::stream<ap_uint<24>, 8> s_4_2;
+    tapa::task()
+    .invoke( task_0,
+             s_0_0,
+             s_0_1,
+             s_0_2,
+             mem_in_0,
+             n )
+    .invoke( task_1,
+             s_0_0,
+             s_0_1,
+             s_0_2,
+             s_1_0,
+             s_1_1,
+             s_1_2,
+             n )
+    .invoke( task_2,
+             s_1_0,
+             s_1_1,
+             s_1_2,
+             s_2_0,
+             s_2_1,
+             s_2_2,
+             n )
+    .invoke( task_3,
+             s_2_0,
+             s_2_1,
+             s_2_2,
+             s_3_0,
+             s_3_1,
+             s_3_2,
+             n )
+    .invoke( task_4,
+             s_3_0,
+             s_3_1,
+             s_3_2,
+             s_4_0,
+             s_4_1,
+             s_4_2,
+             n )
+    .invoke( task_5,
+             s_4_0,
+             s_4_1,
+             s_4_2,
+             mem_out_0,
+             n )
+    ;
+}
+
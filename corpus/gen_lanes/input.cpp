@@ -0,0 +1,118 @@
+#include <hls_stream.h>
+#include <ap_int.h>
+
+typedef ap_uint<64> data_t;
+
+void task_0(hls::stream<ap_uint<8> >& out_0, hls::stream<ap_uint<16> >& out_1, hls::stream<ap_uint<24> >& out_2, data_t* mem_in_0, int n) {
+  for (int i = 0; i < n; i++) {
+#pragma HLS pipeline II=1
+    data_t acc = 0;
+    acc += mem_in_0[i];
+    out_0.write(acc + 0);
+    out_1.write(acc + 1);
+    out_2.write(acc + 2);
+  }
+}
+
+void task_1(hls::stream<ap_uint<8> >& in_0, hls::stream<ap_uint<16> >& in_1, hls::stream<ap_uint<24> >& in_2, hls::stream<ap_uint<8> >& out_0, hls::stream<ap_uint<16> >& out_1, hls::stream<ap_uint<24> >& out_2, int n) {
+  for (int i = 0; i < n; i++) {
+#pragma HLS pipeline II=1
+    data_t acc = 0;
+    acc += in_0.read();
+    acc += in_1.read();
+    acc += in_2.read();
+    out_0.write(acc + 0);
+    out_1.write(acc + 1);
+    out_2.write(acc + 2);
+  }
+}
+
+void task_2(hls::stream<ap_uint<8> >& in_0, hls::stream<ap_uint<16> >& in_1, hls::stream<ap_uint<24> >& in_2, hls::stream<ap_uint<8> >& out_0, hls::stream<ap_uint<16> >& out_1, hls::stream<ap_uint<24> >& out_2, int n) {
+  for (int i = 0; i < n; i++) {
+#pragma HLS pipeline II=1
+    data_t acc = 0;
+    acc += in_0.read();
+    acc += in_1.read();
+    acc += in_2.read();
+    out_0.write(acc + 0);
+    out_1.write(acc + 1);
+    out_2.write(acc + 2);
+  }
+}
+
+void task_3(hls::stream<ap_uint<8> >& in_0, hls::stream<ap_uint<16> >& in_1, hls::stream<ap_uint<24> >& in_2, hls::stream<ap_uint<8> >& out_0, hls::stream<ap_uint<16> >& out_1, hls::stream<ap_uint<24> >& out_2, int n) {
+  for (int i = 0; i < n; i++) {
+#pragma HLS pipeline II=1
+    data_t acc = 0;
+    acc += in_0.read();
+    acc += in_1.read();
+    acc += in_2.read();
+    out_0.write(acc + 0);
+    out_1.write(acc + 1);
+    out_2.write(acc + 2);
+  }
+}
+
+void task_4(hls::stream<ap_uint<8> >& in_0, hls::stream<ap_uint<16> >& in_1, hls::stream<ap_uint<24> >& in_2, hls::stream<ap_uint<8> >& out_0, hls::stream<ap_uint<16> >& out_1, hls::stream<ap_uint<24> >& out_2, int n) {
+  for (int i = 0; i < n; i++) {
+#pragma HLS pipeline II=1
+    data_t acc = 0;
+    acc += in_0.read();
+    acc += in_1.read();
+    acc += in_2.read();
+    out_0.write(acc + 0);
+    out_1.write(acc + 1);
+    out_2.write(acc + 2);
+  }
+}
+
+void task_5(hls::stream<ap_uint<8> >& in_0, hls::stream<ap_uint<16> >& in_1, hls::stream<ap_uint<24> >& in_2, data_t* mem_out_0, int n) {
+  for (int i = 0; i < n; i++) {
+#pragma HLS pipeline II=1
+    data_t acc = 0;
+    acc += in_0.read();
+    acc += in_1.read();
+    acc += in_2.read();
+    mem_out_0[i] = acc;
+  }
+}
+
+void top(data_t* mem_in_0, data_t* mem_out_0, int n) {
+  hls::stream<ap_uint<8> > s_0_0;
+  hls::stream<ap_uint<16> > s_0_1;
+  hls::stream<ap_uint<24> > s_0_2;
+  hls::stream<ap_uint<8> > s_1_0;
+  hls::stream<ap_uint<16> > s_1_1;
+  hls::stream<ap_uint<24> > s_1_2;
+  hls::stream<ap_uint<8> > s_2_0;
+  hls::stream<ap_uint<16> > s_2_1;
+  hls::stream<ap_uint<24> > s_2_2;
+  hls::stream<ap_uint<8> > s_3_0;
+  hls::stream<ap_uint<16> > s_3_1;
+  hls::stream<ap_uint<24> > s_3_2;
+  hls::stream<ap_uint<8> > s_4_0;
+  hls::stream<ap_uint<16> > s_4_1;
+  hls::stream<ap_uint<24> > s_4_2;
+#pragma HLS stream variable=s_0_0 depth=2
+#pragma HLS stream variable=s_0_1 depth=4
+#pragma HLS stream variable=s_0_2 depth=8
+#pragma HLS stream variable=s_1_0 depth=16
+#pragma HLS stream variable=s_1_1 depth=32
+#pragma HLS stream variable=s_1_2 depth=64
+#pragma HLS stream variable=s_2_0 depth=2
+#pragma HLS stream variable=s_2_1 depth=4
+#pragma HLS stream variable=s_2_2 depth=8
+#pragma HLS stream variable=s_3_0 depth=16
+#pragma HLS stream variable=s_3_1 depth=32
+#pragma HLS stream variable=s_3_2 depth=64
+#pragma HLS stream variable=s_4_0 depth=2
+#pragma HLS stream variable=s_4_1 depth=4
+#pragma HLS stream variable=s_4_2 depth=8
+#pragma HLS dataflow
+  task_0(s_0_0, s_0_1, s_0_2, mem_in_0, n);
+  task_1(s_0_0, s_0_1, s_0_2, s_1_0, s_1_1, s_1_2, n);
+  task_2(s_1_0, s_1_1, s_1_2, s_2_0, s_2_1, s_2_2, n);
+  task_3(s_2_0, s_2_1, s_2_2, s_3_0, s_3_1, s_3_2, n);
+  task_4(s_3_0, s_3_1, s_3_2, s_4_0, s_4_1, s_4_2, n);
+  task_5(s_4_0, s_4_1, s_4_2, mem_out_0, n);
+}
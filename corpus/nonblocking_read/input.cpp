@@ -0,0 +1,44 @@
+#include <hls_stream.h>
+#include <ap_int.h>
+
+typedef ap_uint<512> bus_t;
+
+// load data from memory
+void load(bus_t* in, hls::stream<bus_t>& s, int n) {
+  for (int i = 0; i < n; i++) {
+    s.write(in[i]);
+  }
+}
+
+void compute_leaf(hls::stream<bus_t>& a, hls::stream<bus_t>& b, hls::stream<bus_t>& c, int n) {
+  for (int i = 0; i < n; i++) {
+    bus_t x = a.read();
+    bus_t y;
+    if (b.read_nb(y)) {}
+    c.write(x + y);
+  }
+}
+
+void compute(hls::stream<bus_t>& a, hls::stream<bus_t>& b, hls::stream<bus_t>& c, int n) {
+  compute_leaf(a, b, c, n);
+}
+
+void store(hls::stream<bus_t>& s, bus_t* out, int n) {
+  for (int i = 0; i < n; i++) {
+    out[i] = s.read();
+  }
+}
+
+void vadd(bus_t* in0, bus_t* in1, bus_t* out, int n) {
+  hls::stream<bus_t> s0("s0");
+  hls::stream<bus_t> s1;
+  hls::stream<bus_t> s2;
+#pragma HLS stream variable=s0 depth=2
+#pragma HLS stream variable=s1 depth=4
+#pragma HLS stream variable=s2 depth=8
+#pragma HLS dataflow
+  load(in0, s0, n);
+  load(in1, s1, n);
+  compute(s0, s1, s2, n);
+  store(s2, out, n);
+}
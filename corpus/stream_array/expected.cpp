@@ -0,0 +1,45 @@
+#include <tapa.h>
+
+void src( tapa::ostream<int> & out, int n ) {
+    for( int i = 0; i < n; i++ ) {
+        out.write( i );
+    }
+}
+
+void add( tapa::istream<int> & a, tapa::istream<int> & b, tapa::ostream<int> & out, int n ) {
+    for( int i = 0; i < n; i++ ) {
+        out.write( a.read() + b.read() );
+    }
+}
+
+void dst( tapa::istream<int> & in, tapa::mmap<int >& mem, int n ) {
+    for( int i = 0; i < n; i++ ) {
+        mem[i] = in.read();
+    }
+}
+
+void top(
+    tapa::mmap<int > mem,
+    int n
+) {
+    tapa::streams<int, 2, 2> s; // no depth pragma, minimum depth 2
+    tapa::streams<int, 1, 4> t; // declared depth 4
+    tapa::task()
+    .invoke( src,
+             s[0],
+             n )
+    .invoke( src,
+             s[1],
+             n )
+    .invoke( add,
+             s[0],
+             s[1],
+             t[0],
+             n )
+    .invoke( dst,
+             t[0],
+             mem,
+             n )
+    ;
+}
+
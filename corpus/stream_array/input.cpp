@@ -0,0 +1,30 @@
+#include <hls_stream.h>
+
+void src(hls::stream<int>& out, int n) {
+  for (int i = 0; i < n; i++) {
+    out.write(i);
+  }
+}
+
+void add(hls::stream<int>& a, hls::stream<int>& b, hls::stream<int>& out, int n) {
+  for (int i = 0; i < n; i++) {
+    out.write(a.read() + b.read());
+  }
+}
+
+void dst(hls::stream<int>& in, int* mem, int n) {
+  for (int i = 0; i < n; i++) {
+    mem[i] = in.read();
+  }
+}
+
+void top(int* mem, int n) {
+#pragma HLS dataflow
+  hls::stream<int> s[2];
+  hls::stream<int> t[1];
+#pragma HLS stream variable=t depth=4
+  src(s[0], n);
+  src(s[1], n);
+  add(s[0], s[1], t[0], n);
+  dst(t[0], mem, n);
+}
@@ -0,0 +1,37 @@
+#include <tapa.h>
+#include <ap_int.h>
+
+typedef ap_uint<64> pkt_t;
+
+void src( tapa::ostream< ap_uint<32> > & s, tapa::mmap<ap_int<8> >& p ) {
+    s.write( p[0] );
+}
+
+void mid( tapa::istream< ap_uint<32> > & a, tapa::ostream<pkt_t> & b ) {
+    b.write( pkt_t() );
+    a.read();
+}
+
+void snk( tapa::istream<pkt_t> & b, tapa::mmap<ap_int<8> >& q ) {
+    q[0] = b.read();
+}
+
+void top(
+    tapa::mmap<ap_int<8> > p,
+    tapa::mmap<ap_int<8> > q
+) {
+    tapa::stream<ap_uint<32>, 16> s0;
+    tapa::stream<pkt_t, 32> s1;
+    tapa::task()
+    .invoke( src,
+             s0,
+             p )
+    .invoke( mid,
+             s0,
+             s1 )
+    .invoke( snk,
+             s1,
+             q )
+    ;
+}
+
@@ -0,0 +1,20 @@
+#include <hls_stream.h>
+#include <ap_int.h>
+
+typedef ap_uint<64> pkt_t;
+
+void src(hls::stream< ap_uint<32> >& s, ap_int<8>* p) { s.write(p[0]); }
+void mid(hls::stream< ap_uint<32> >& a, hls::stream<pkt_t>& b) { b.write(pkt_t()); a.read(); }
+void snk(hls::stream<pkt_t>& b, ap_int<8>* q) { q[0] = b.read(); }
+
+void top(ap_int<8>* p, ap_int<8>* q) {
+  hls::stream< ap_uint<32> > s0("s0");
+  hls::stream<pkt_t> s1;
+#pragma HLS stream variable=s0 depth=16
+#pragma HLS stream variable=s1 depth=32
+#pragma HLS dataflow
+  for (int i = 0; i < 1; i++) {}
+  src(s0, p);
+  mid(s0, s1);
+  snk(s1, q);
+}
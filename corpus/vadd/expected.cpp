@@ -0,0 +1,59 @@
+#include <tapa.h>
+#include <ap_int.h>
+
+typedef ap_uint<512> bus_t;
+
+void load( tapa::mmap<bus_t >& in, tapa::ostream<bus_t> & s, int n ) {
+    for( int i = 0; i < n; i++ ) {
+        s.write( in[i] );
+    }
+}
+
+void compute_leaf( tapa::istream<bus_t> & a, tapa::istream<bus_t> & b, tapa::ostream<bus_t> & c, int n ) {
+    for( int i = 0; i < n; i++ ) {
+        bus_t x = a.read();
+        bus_t y = b.read();
+        c.write( x + y );
+    }
+}
+
+void compute( tapa::istream<bus_t> & a, tapa::istream<bus_t> & b, tapa::ostream<bus_t> & c, int n ) {
+    compute_leaf( a, b, c, n );
+}
+
+void store( tapa::istream<bus_t> & s, tapa::mmap<bus_t >& out, int n ) {
+    for( int i = 0; i < n; i++ ) {
+        out[i] = s.read();
+    }
+}
+
+void vadd(
+    tapa::mmap<bus_t > in0,
+    tapa::mmap<bus_t > in1,
+    tapa::mmap<bus_t > out,
+    int n
+) {
+    tapa::stream<bus_t, 2> s0;
+    tapa::stream<bus_t, 4> s1;
+    tapa::stream<bus_t, 8> s2;
+    tapa::task()
+    .invoke( load,
+             in0,
+             s0,
+             n )
+    .invoke( load,
+             in1,
+             s1,
+             n )
+    .invoke( compute,
+             s0,
+             s1,
+             s2,
+             n )
+    .invoke( store,
+             s2,
+             out,
+             n )
+    ;
+}
+
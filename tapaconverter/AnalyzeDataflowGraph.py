@@ -0,0 +1,294 @@
+# static throughput and deadlock checks on the dataflow graph
+# - each task is modeled by a latency, i.e. the cycles before its first output.
+#   Without a hint, every task has the same latency
+# - reconvergent paths: when a fork task feeds a join task through several paths,
+#   the fifos of a short path must hold the tokens produced while the long path
+#   is still filling up, otherwise the fork stalls and the throughput drops, or
+#   the design deadlocks. A path p is balanced if latency(p) + depth(p) >= the max latency
+# - cycles: tasks that feed back into themselves through streams
+# - the critical chain: the path with the largest total latency
+
+import logging
+
+from typing import *
+from tapaconverter.DataflowGraph import DataflowGraph, StreamEdge
+from tapaconverter.common import get_strongly_connected_components
+
+__all__ = [
+  'analyze_dataflow_graph',
+]
+
+DEFAULT_TASK_LATENCY = 1
+
+# the depth of a stream without a literal depth pragma, same as the default of HLS and tapa
+DEFAULT_STREAM_DEPTH = 2
+
+
+class Reconvergence:
+  def __init__(
+      self,
+      fork: str,
+      join: str,
+      max_latency: int,
+      long_path: List[str],
+      min_slack: int,
+      short_path: List[str],
+      short_path_streams: List[str],
+  ):
+    self.fork = fork
+    self.join = join
+    self.max_latency = max_latency
+    self.long_path = long_path
+    # the latency plus the total depth of the least buffered path
+    self.min_slack = min_slack
+    self.short_path = short_path
+    self.short_path_streams = short_path_streams
+
+  @property
+  def missing_depth(self) -> int:
+    """
+    the depth to add to the streams of the short path
+    """
+    return max(0, self.max_latency - self.min_slack)
+
+  def to_dict(self) -> Dict[str, Any]:
+    return {
+      'fork': self.fork,
+      'join': self.join,
+      'max_latency': self.max_latency,
+      'long_path': self.long_path,
+      'min_slack': self.min_slack,
+      'short_path': self.short_path,
+      'short_path_streams': self.short_path_streams,
+      'missing_depth': self.missing_depth,
+    }
+
+
+class StreamCycle:
+  def __init__(self, task_names: List[str], streams: List[StreamEdge]):
+    self.task_names = task_names
+    self.streams = streams
+
+  @property
+  def total_depth(self) -> int:
+    return sum(get_stream_depth(stream) for stream in self.streams)
+
+  def to_dict(self) -> Dict[str, Any]:
+    return {
+      'tasks': self.task_names,
+      'streams': [stream.name for stream in self.streams],
+      'total_depth': self.total_depth,
+    }
+
+
+class DataflowReport:
+  def __init__(self):
+    self.reconvergence_list: List[Reconvergence] = []
+    self.cycle_list: List[StreamCycle] = []
+    self.critical_chain: List[str] = []
+    self.critical_latency = 0
+    # the streams without a producer or without a consumer
+    self.unconnected_stream_list: List[StreamEdge] = []
+
+  @property
+  def unbalanced_reconvergence_list(self) -> List[Reconvergence]:
+    return [reconvergence for reconvergence in self.reconvergence_list if reconvergence.missing_depth > 0]
+
+  def to_dict(self) -> Dict[str, Any]:
+    return {
+      'reconvergences': [reconvergence.to_dict() for reconvergence in self.reconvergence_list],
+      'unbalanced_reconvergences': len(self.unbalanced_reconvergence_list),
+      'cycles': [cycle.to_dict() for cycle in self.cycle_list],
+      'critical_chain': self.critical_chain,
+      'critical_latency': self.critical_latency,
+      'unconnected_streams': [stream.name for stream in self.unconnected_stream_list],
+    }
+
+
+def get_stream_depth(stream: StreamEdge) -> int:
+  return stream.depth if stream.depth is not None else DEFAULT_STREAM_DEPTH
+
+
+def get_task_latency(graph: DataflowGraph, node_name: str, task_to_latency: Dict[str, int]) -> int:
+  """
+  a hint may be given for a single invocation, e.g. "load[1]", or for all invocations of a task
+  """
+  if node_name in task_to_latency:
+    return task_to_latency[node_name]
+  return task_to_latency.get(graph.name_to_task[node_name].task_name, DEFAULT_TASK_LATENCY)
+
+
+def find_cycles(
+    graph: DataflowGraph,
+    component_list: List[List[str]],
+    edge_list: List[Tuple[str, str, StreamEdge]],
+) -> List[StreamCycle]:
+  node_to_component = {node: i for i, component in enumerate(component_list) for node in component}
+  cycle_list = []
+  for i, component in enumerate(component_list):
+    streams = [
+      stream for producer, consumer, stream in edge_list
+      if node_to_component[producer] == i and node_to_component[consumer] == i
+    ]
+    if len(component) > 1 or streams:
+      # list the tasks in invocation order
+      task_names = [task.name for task in graph.task_list if task.name in component]
+      cycle_list.append(StreamCycle(task_names, streams))
+  return cycle_list
+
+
+def trace_back(join: str, node_to_pred: Dict[str, Tuple[str, StreamEdge]]) -> Tuple[List[str], List[str]]:
+  """
+  the tasks and the streams of a path recorded by predecessors
+  """
+  task_names = [join]
+  stream_names = []
+  while join in node_to_pred:
+    join, stream = node_to_pred[join]
+    task_names.append(join)
+    stream_names.append(stream.name)
+  return task_names[::-1], stream_names[::-1]
+
+
+def find_reconvergences(
+    graph: DataflowGraph,
+    topo_order: List[str],
+    node_to_out_edges: Dict[str, List[Tuple[str, StreamEdge]]],
+    task_to_latency: Dict[str, int],
+) -> List[Reconvergence]:
+  """
+  for each fork, find the tasks where the paths from different output streams of the fork meet,
+  by a forward pass in topological order. The tasks further down are not reported again
+  """
+  topo_index = {node: i for i, node in enumerate(topo_order)}
+  reconvergence_list = []
+
+  for fork in topo_order:
+    if len(node_to_out_edges[fork]) < 2:
+      continue
+
+    max_latency = {fork: 0}
+    max_pred: Dict[str, Tuple[str, StreamEdge]] = {}
+    min_slack = {fork: 0}
+    min_pred: Dict[str, Tuple[str, StreamEdge]] = {}
+    # the output streams of the fork through which a task is reached, collected for each input of the task
+    input_first_streams: Dict[str, Set[FrozenSet[str]]] = {}
+
+    for node in topo_order[topo_index[fork]:]:
+      if node not in max_latency:
+        continue
+      if node != fork:
+        first_streams = frozenset().union(*input_first_streams[node])
+      latency = get_task_latency(graph, node, task_to_latency)
+      for successor, stream in node_to_out_edges[node]:
+        if successor == fork:
+          continue
+        if max_latency[node] + latency > max_latency.get(successor, -1):
+          max_latency[successor] = max_latency[node] + latency
+          max_pred[successor] = (node, stream)
+        slack = min_slack[node] + latency + get_stream_depth(stream)
+        if successor not in min_slack or slack < min_slack[successor]:
+          min_slack[successor] = slack
+          min_pred[successor] = (node, stream)
+        input_first_streams.setdefault(successor, set()).add(
+          first_streams if node != fork else frozenset([stream.name]))
+
+    # the paths meet where the inputs come from different output streams of the fork
+    for join in topo_order[topo_index[fork] + 1:]:
+      if len(input_first_streams.get(join, ())) < 2:
+        continue
+      long_path, _ = trace_back(join, max_pred)
+      short_path, short_path_streams = trace_back(join, min_pred)
+      reconvergence_list.append(Reconvergence(
+        fork, join, max_latency[join], long_path, min_slack[join], short_path, short_path_streams))
+
+  return reconvergence_list
+
+
+def find_critical_chain(
+    graph: DataflowGraph,
+    topo_order: List[str],
+    node_to_out_edges: Dict[str, List[Tuple[str, StreamEdge]]],
+    task_to_latency: Dict[str, int],
+) -> Tuple[List[str], int]:
+  """
+  the path with the largest sum of task latencies
+  """
+  # the latency of the longest path that ends at each task, including the task itself
+  chain_latency: Dict[str, int] = {}
+  chain_pred: Dict[str, Tuple[str, StreamEdge]] = {}
+  for node in topo_order:
+    chain_latency.setdefault(node, 0)
+    chain_latency[node] += get_task_latency(graph, node, task_to_latency)
+    for successor, stream in node_to_out_edges[node]:
+      if chain_latency[node] > chain_latency.get(successor, 0):
+        chain_latency[successor] = chain_latency[node]
+        chain_pred[successor] = (node, stream)
+
+  if not chain_latency:
+    return [], 0
+  # the first task of the longest chain in topological order, so the result is deterministic
+  last = max(topo_order, key=lambda node: chain_latency[node])
+  chain, _ = trace_back(last, chain_pred)
+  return chain, chain_latency[last]
+
+
+def get_acyclic_part(
+    graph: DataflowGraph,
+) -> Tuple[List[List[str]], List[str], Dict[str, List[Tuple[str, StreamEdge]]]]:
+  """
+  return the strongly connected components, a topological order of the tasks and
+  task -> (successor, stream) without the edges within a cycle
+  """
+  node_names = [task.name for task in graph.task_list]
+  edge_list = graph.get_edges()
+
+  node_to_successors: Dict[str, List[str]] = {node: [] for node in node_names}
+  for producer, consumer, _ in edge_list:
+    node_to_successors[producer].append(consumer)
+  component_list = get_strongly_connected_components(node_names, node_to_successors)
+
+  node_to_component = {node: i for i, component in enumerate(component_list) for node in component}
+  node_to_out_edges: Dict[str, List[Tuple[str, StreamEdge]]] = {node: [] for node in node_names}
+  for producer, consumer, stream in edge_list:
+    if node_to_component[producer] != node_to_component[consumer]:
+      node_to_out_edges[producer].append((consumer, stream))
+  topo_order = [node for component in reversed(component_list) for node in component]
+
+  return component_list, topo_order, node_to_out_edges
+
+
+def analyze_dataflow_graph(graph: DataflowGraph, task_to_latency: Optional[Dict[str, int]] = None) -> DataflowReport:
+  """
+  task_to_latency maps a task name or a node name to its latency in cycles
+  """
+  task_to_latency = task_to_latency or {}
+  report = DataflowReport()
+
+  report.unconnected_stream_list = [stream for stream in graph.stream_list if not (stream.producers and stream.consumers)]
+  for stream in report.unconnected_stream_list:
+    logging.warning(
+      f'stream {stream.name} has {len(stream.producers)} producers and {len(stream.consumers)} consumers'
+      + (f', undetermined direction in {", ".join(stream.unresolved)}' if stream.unresolved else ''))
+
+  # the paths are only analyzed on the acyclic part
+  component_list, topo_order, node_to_out_edges = get_acyclic_part(graph)
+
+  report.cycle_list = find_cycles(graph, component_list, graph.get_edges())
+  for cycle in report.cycle_list:
+    logging.warning(
+      f'stream cycle among {", ".join(cycle.task_names)} with a total depth of {cycle.total_depth}, '
+      f'may deadlock')
+
+
+  report.reconvergence_list = find_reconvergences(graph, topo_order, node_to_out_edges, task_to_latency)
+  for reconvergence in report.unbalanced_reconvergence_list:
+    logging.warning(
+      f'reconvergent paths from {reconvergence.fork} to {reconvergence.join} are unbalanced: '
+      f'{" -> ".join(reconvergence.short_path)} needs {reconvergence.missing_depth} more depth '
+      f'to match {" -> ".join(reconvergence.long_path)}')
+
+  report.critical_chain, report.critical_latency = find_critical_chain(
+    graph, topo_order, node_to_out_edges, task_to_latency)
+
+  return report
@@ -1,8 +1,15 @@
 import logging
 import re
 
+from collections import deque
 from typing import *
 from tapaconverter.AnalyzeStreamDirectionByOperation import Param, Func, extract_functions
+from tapaconverter.common import find_matching_paren, get_strongly_connected_components, split_top_level_args
+from tapaconverter.Profile import count
+from tapaconverter.SourceBuffer import SourceBuffer
+
+CALL_END_PATTERN = re.compile(r'\s*;')
+
 
 class FuncCall:
   def __init__(
@@ -16,39 +23,71 @@ class FuncCall:
     self.caller = caller
     self.callee = callee
     self.caller_arg_list = caller_arg_list
-    self.callee_param_list = callee.get_param_list()
+
+  @property
+  def callee_param_list(self) -> Tuple[Param, ...]:
+    """
+    always reflect the latest param types of the callee
+    """
+    return self.callee.get_param_list()
 
 
 class HierFunc(Func):
-  def __init__(self, name, func_type, func_range: Tuple[int, int], text, name_to_func: Dict[str, Func]):
-    self.name = name
-    self.func_type = func_type
-    self.func_range = func_range
-    self.text = text
+  def __init__(self, name, func_type, func_range: Tuple[int, int], buffer: SourceBuffer, name_to_func: Dict[str, Func]):
+    super().__init__(name, func_type, func_range, buffer)
     self.name_to_func = name_to_func
-    self.name_to_param: Dict[str, Param] = {param.param_name: param for param in self.get_param_list()}
-    self.param_list_range: Tuple[int, int] = self.update_param_list_range()
 
 
-def get_func_calls(curr_func: Func, name_to_func: Dict[str, Func]) -> List[FuncCall]:
+def get_func_call_pattern(func_names: Iterable[str]) -> Pattern:
+  """
+  one pattern that matches the call of any of the given functions.
+  Try longer names first so that a name is not shadowed by its prefix
+  """
+  sorted_names = sorted(func_names, key=len, reverse=True)
+  return re.compile(rf'\b({"|".join(map(re.escape, sorted_names))})\s*\(')
+
+
+def get_func_calls(
+    curr_func: Func, 
+    name_to_func: Dict[str, Func], 
+    func_call_pattern: Optional[Pattern] = None,
+) -> List[FuncCall]:
   """
-  extract all func calls within the given function
+  extract all func calls within the given function in a single scan
   """
+  if not name_to_func:
+    return []
+  if func_call_pattern is None:
+    func_call_pattern = get_func_call_pattern(name_to_func.keys())
+
   func_call_list = []
-  for candidate_func_name, candidate_func in name_to_func.items():
-    # filter out self
-    if candidate_func_name == curr_func.name:
+  raw_code = curr_func.buffer.text
+  func_begin, func_end = curr_func.func_range
+  pos = func_begin
+  while True:
+    match = func_call_pattern.search(raw_code, pos, func_end)
+    if not match:
+      break
+
+    func_call_name = match.group(1)
+    arg_begin = match.end()
+    arg_end = find_matching_paren(raw_code, arg_begin - 1)
+    if arg_end == -1 or arg_end >= func_end:
+      break
+    pos = arg_begin
+
+    # filter out self, e.g. the signature of the current function
+    if func_call_name == curr_func.name:
       continue
 
     # use ';' to differentiate a func call from the caller signature
-    match = re.search(rf'({candidate_func_name})\s*\(([^)]*)\s*\);', curr_func.text)  # no need to findall
-    if match:
-      func_call_name = match.group(1)
-      func_call_arg_str = match.group(2)
-      func_call_arg_list = [arg.strip() for arg in func_call_arg_str.split(',')]
+    if not CALL_END_PATTERN.match(raw_code, arg_end + 1, func_end):
+      continue
 
-      func_call_list.append(FuncCall(func_call_name, curr_func, candidate_func, func_call_arg_list))
+    func_call_arg_list = split_top_level_args(raw_code[arg_begin:arg_end])
+    func_call_list.append(FuncCall(func_call_name, curr_func, name_to_func[func_call_name], func_call_arg_list))
 
+  count('regex_scans')
   return func_call_list
 
 
@@ -57,24 +96,132 @@ def get_func_to_func_calls(func_list: List[Func]) -> Dict[Func, List[FuncCall]]:
   get the mapping from all functions to the function calls within
   """
   name_to_func = {func.name : func for func in func_list}
-  func_to_func_calls = {func: get_func_calls(func, name_to_func) for func in func_list}
+  func_call_pattern = get_func_call_pattern(name_to_func.keys())
+  func_to_func_calls = {func: get_func_calls(func, name_to_func, func_call_pattern) for func in func_list}
   return func_to_func_calls
 
 
-def populate_stream_dir(func_list: List[Func]) -> None:
+class StreamDirectionSolver:
   """
-  derive stream directions based on function calls
+  propagate stream directions from callees to callers until convergence.
+  The call graph is built once. Functions are visited bottom-up and a caller
+  is revisited only if one of its callees has changed.
   """
-  func_to_func_calls = get_func_to_func_calls(func_list)
-
-  for func, func_call_list in func_to_func_calls.items():
-    for func_call in func_call_list:
+  def __init__(self, func_list: List[Func], func_to_func_calls: Optional[Dict[Func, List[FuncCall]]] = None):
+    self.func_list = func_list
+    if func_to_func_calls is None:
+      func_to_func_calls = get_func_to_func_calls(func_list)
+    self.func_to_func_calls = func_to_func_calls
+    self.func_to_callers: Dict[Func, List[Func]] = {func: [] for func in func_list}
+    for func, func_call_list in self.func_to_func_calls.items():
+      for func_call in func_call_list:
+        callers = self.func_to_callers[func_call.callee]
+        if func not in callers:
+          callers.append(func)
+
+    self.cycles: List[List[Func]] = []
+    self.conflicts: List[Tuple[Func, str, str, str]] = []
+    self.iteration_count = 0
+
+  def get_bottom_up_order(self) -> List[Func]:
+    """
+    order the functions so that callees come before their callers.
+    Use Tarjan's algorithm so that recursive calls are detected as cycles
+    """
+    func_to_callees = {
+      func: [func_call.callee for func_call in func_call_list] for func, func_call_list in self.func_to_func_calls.items()
+    }
+    order: List[Func] = []
+    for component in get_strongly_connected_components(self.func_list, func_to_callees):
+      if len(component) > 1:
+        self.cycles.append(component)
+        logging.warning(f'detect recursive calls among: {", ".join(f.name for f in component)}')
+      order += component
+
+    return order
+
+  def propagate_func_calls(self, func: Func) -> bool:
+    """
+    update the stream params of func based on the params of its callees.
+    Return True if any param of func is changed
+    """
+    is_changed = False
+    for func_call in self.func_to_func_calls[func]:
       for i, param in enumerate(func_call.callee_param_list):
-        if 'stream' in param.param_type:
-          found_stream_var = func_call.caller_arg_list[i]
-          stream_var_direction = param.param_type
-          func.check_and_update_param_type_by_name(found_stream_var, stream_var_direction)
-
+        callee_dir = param.get_stream_dir()
+        if callee_dir is None:
+          continue
+
+        if i >= len(func_call.caller_arg_list):
+          logging.warning(f'{func.name} passes too few arguments to {func_call.name}')
+          break
+
+        found_stream_var = func_call.caller_arg_list[i]
+        if found_stream_var not in func.name_to_param:
+          logging.debug(f'{found_stream_var} in {func.name} is not a parameter, skip')
+          continue
+
+        caller_param = func.name_to_param[found_stream_var]
+        caller_dir = caller_param.get_stream_dir()
+        if caller_dir is None:
+          updated_param_type = re.sub('stream', callee_dir, caller_param.param_type, count=1)
+          is_changed |= func.check_and_update_param_type_by_name(found_stream_var, updated_param_type)
+        elif caller_dir != callee_dir:
+          conflict = (func, found_stream_var, caller_dir, callee_dir)
+          if conflict not in self.conflicts:
+            self.conflicts.append(conflict)
+            logging.warning(
+              f'conflicting directions of {found_stream_var} in {func.name}: '
+              f'{caller_dir} vs. {callee_dir} required by {func_call.name}')
+
+    return is_changed
+
+  def get_transitive_callers(self, func_list: Iterable[Func]) -> Set[Func]:
+    """
+    the given functions and all functions that directly or indirectly call them
+    """
+    visited = set(func_list)
+    stack = list(visited)
+    while stack:
+      for caller in self.func_to_callers[stack.pop()]:
+        if caller not in visited:
+          visited.add(caller)
+          stack.append(caller)
+    return visited
+
+  def solve(self, seed_funcs: Optional[Set[Func]] = None) -> None:
+    """
+    a stream param only changes from undetermined to a direction once, and
+    conflicts never overwrite a determined direction, so the worklist always drains.
+    If seed_funcs is given, only start from them, e.g. the functions changed since the last run
+    """
+    order = self.get_bottom_up_order()
+    if seed_funcs is not None:
+      order = [func for func in order if func in seed_funcs]
+    worklist = deque(order)
+    in_worklist = set(order)
+
+    while worklist:
+      func = worklist.popleft()
+      in_worklist.discard(func)
+      self.iteration_count += 1
+
+      if self.propagate_func_calls(func):
+        for caller in self.func_to_callers[func]:
+          if caller not in in_worklist:
+            worklist.append(caller)
+            in_worklist.add(caller)
+
+    logging.debug(f'stream directions converge after visiting {self.iteration_count} functions')
+
+
+def populate_stream_dir(func_list: List[Func]) -> StreamDirectionSolver:
+  """
+  derive stream directions based on function calls
+  """
+  solver = StreamDirectionSolver(func_list)
+  solver.solve()
+  return solver
 
 
 # given the filename, first extract all functions
@@ -82,4 +229,4 @@ def populate_stream_dir(func_list: List[Func]) -> None:
 # match stream operations with parameters
 # next, extract all funccalls, match the parameter of callees with the variables
 # then update the params of callers
-# repeat this process until nothing changed
\ No newline at end of file
+# repeat for the callers whose callees have changed until nothing changes
\ No newline at end of file
@@ -5,12 +5,17 @@
 # there may be hierarchical func call
 # if a stream var is passed as parameter to another function, then we need to first analyze the inner function
 
+import bisect
+import contextvars
 import logging
 import re
-import subprocess
+import threading
 
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from typing import *
-from tapaconverter.common import get_func_range
+from tapaconverter.IndexFunctions import index_functions
+from tapaconverter.Profile import count, profile
+from tapaconverter.SourceBuffer import SourceBuffer
 
 STREAM_DIRECTION = {
   'write': 'ostream',
@@ -19,20 +24,48 @@ STREAM_DIRECTION = {
   'try_read': 'istream',
 }
 
+# a variable followed by a stream operation, e.g. "if (b.try_read(x))".
+# Skip the members of other objects, e.g. "p->s.read()" and "x.s.read()"
+STREAM_OP_PATTERN = re.compile(r'(?<![\w.>:])([A-Za-z_]\w*)\s*\.\s*(read|try_read|write|try_write)\s*\(')
+STREAM_DIR_PATTERN = re.compile(r'(istream|ostream)')
+PARAM_NAME_PATTERN = re.compile(r'[ \t\n*&](\S+)\s*$')
+PARAM_TYPE_PATTERN = re.compile(r'\s*(.*[ \t\n*&])\S+\s*$')
+# the name of a param, possibly an array, e.g. buf[16]
+PARAM_IDENTIFIER_PATTERN = re.compile(r'[A-Za-z_]\w*(?:\s*\[[^\]]*\])*')
+# the last word of an unnamed param may be a type, e.g. unsigned int
+TYPE_KEYWORDS = {'bool', 'char', 'short', 'int', 'long', 'float', 'double', 'void', 'signed', 'unsigned', 'const'}
+
+# below this many functions for each worker, the pool costs more than it saves
+MIN_FUNCS_PER_WORKER = 64
+
 
 class Param:
   """
-  represent a stream parameter
+  represent a parameter. The stream flag and the direction are derived from the type
   """
-  def __init__(self, param_name, param_type, orig_text):
+  __slots__ = ('param_name', 'param_type', 'orig_text', 'is_stream', 'stream_dir')
+
+  def __init__(self, param_name: str, param_type: str, orig_text: str):
     self.param_name = param_name
-    self.param_type = param_type
     self.orig_text = orig_text
+    self.set_type(param_type)
+
+  def set_type(self, param_type: str) -> None:
+    self.param_type = param_type
+    self.is_stream = 'stream' in param_type
+    match = STREAM_DIR_PATTERN.search(param_type)
+    self.stream_dir: Optional[str] = match.group(1) if match else None
 
   def update_stream_dir(self, stream_dir):
-    assert 'stream' in self.param_type
+    assert self.is_stream
     assert '::' not in stream_dir
-    self.param_type = re.sub('stream', stream_dir, self.param_type)
+    self.set_type(re.sub('stream', stream_dir, self.param_type))
+
+  def get_stream_dir(self) -> Optional[str]:
+    """
+    return None if the direction of the stream has not been determined
+    """
+    return self.stream_dir
 
   def __eq__(self, other):
     """
@@ -44,47 +77,177 @@ class Param:
     return f'{self.param_type} {self.param_name}'
 
 
+def has_no_params(param_list_text: str) -> bool:
+  """
+  e.g. int f() or int f(void)
+  """
+  return param_list_text.strip() in ('', 'void')
+
+
+def has_unnamed_params(param_list_text: str) -> bool:
+  """
+  e.g. the prototype void f(int, hls::stream<int>&)
+  """
+  if has_no_params(param_list_text):
+    return False
+  for raw_param in param_list_text.split(','):
+    match = PARAM_NAME_PATTERN.search(raw_param)
+    if not match or not PARAM_IDENTIFIER_PATTERN.fullmatch(match.group(1)) or match.group(1) in TYPE_KEYWORDS:
+      return True
+  return False
+
+
+def parse_param_list_text(param_list_text: str) -> Tuple[Param, ...]:
+  if has_no_params(param_list_text):
+    return ()
+  param_list = []
+  for raw_param in param_list_text.split(','):
+    param_name = PARAM_NAME_PATTERN.search(raw_param).group(1)
+    param_type = PARAM_TYPE_PATTERN.search(raw_param).group(1)
+    param_list.append(Param(param_name, param_type, raw_param.strip()))
+  return tuple(param_list)
+
+
+def group_stream_dirs(var_op_list: List[Tuple[str, str]]) -> Dict[str, List[str]]:
+  """
+  variable -> all directions in the order of first use
+  """
+  stream_var_to_dirs: Dict[str, List[str]] = {}
+  for var, op in var_op_list:
+    stream_dirs = stream_var_to_dirs.setdefault(var, [])
+    if STREAM_DIRECTION[op] not in stream_dirs:
+      stream_dirs.append(STREAM_DIRECTION[op])
+  return stream_var_to_dirs
+
+
+class StreamOpIndex:
+  """
+  the stream operations of a source in offset order, found by a single scan on the first lookup.
+  All functions of the same source share one index and look up the operations within their range
+  """
+  def __init__(self, text: str, start: int = 0, end: Optional[int] = None):
+    self.text = text
+    self.start = start
+    self.end = len(text) if end is None else end
+    self.offsets: Optional[List[int]] = None
+    self.var_op_list: List[Tuple[str, str]] = []
+    self.lock = threading.Lock()
+
+  def build(self) -> None:
+    offsets = []
+    for match in STREAM_OP_PATTERN.finditer(self.text, self.start, self.end):
+      offsets.append(match.start())
+      self.var_op_list.append(match.groups())
+    count('regex_scans')
+    count('stream_ops', len(offsets))
+    self.offsets = offsets
+
+  def get_var_op_list(self, start: int, end: int) -> List[Tuple[str, str]]:
+    """
+    (variable, operation) of the operations in [start, end), in source order
+    """
+    with self.lock:
+      if self.offsets is None:
+        self.build()
+    return self.var_op_list[bisect.bisect_left(self.offsets, start):bisect.bisect_left(self.offsets, end)]
+
+
 class Func:
-  def __init__(self, name, func_type, func_range: Tuple[int, int], text):
+  """
+  a function in the shared source buffer. All ranges are offsets into the original text
+  """
+  def __init__(
+      self, 
+      name, 
+      func_type, 
+      func_range: Tuple[int, int], 
+      buffer: SourceBuffer, 
+      param_list_range: Optional[Tuple[int, int]] = None,
+      stream_op_index: Optional[StreamOpIndex] = None,
+      param_list: Optional[Tuple[Param, ...]] = None,
+      stream_var_to_dirs: Optional[Dict[str, List[str]]] = None,
+  ):
+    """
+    param_list and stream_var_to_dirs may be computed beforehand, e.g. by a worker of extract_functions
+    """
     self.name = name
     self.func_type = func_type
     self.func_range = func_range
-    self.text = text
-    self.name_to_param: Dict[str, Param] = {param.param_name: param for param in self.get_param_list()}
-    self.param_list_range: Tuple[int, int] = self.update_param_list_range()
+    self.buffer = buffer
+    if param_list_range is None:
+      param_list_range = self.update_param_list_range()
+    self.param_list_range: Tuple[int, int] = param_list_range
+
+    # the signature is parsed once. Later updates go through update_param
+    if param_list is None:
+      param_list = self.parse_param_list()
+    self.param_list: Tuple[Param, ...] = param_list
+    self.stream_param_list: Tuple[Param, ...] = tuple(param for param in self.param_list if param.is_stream)
+    self.name_to_param: Dict[str, Param] = {param.param_name: param for param in self.param_list}
+
+    # param updates are only rendered when the text is requested
+    self.param_list_text: Optional[str] = None
+    self.is_param_list_patched = False
+
+    # without a shared index, only scan the function itself
+    if stream_op_index is None:
+      stream_op_index = StreamOpIndex(buffer.text, *func_range)
+    self.stream_op_index = stream_op_index
+    self.stream_var_to_dirs = stream_var_to_dirs
+    # the stream params that are both read and written
+    self.stream_op_conflicts: List[str] = []
+
+  @property
+  def text(self) -> str:
+    return self.buffer.get_text(*self.func_range)
 
   def update_param_list_range(self) -> Tuple[int, int]:
-    self.param_list_range = re.search(rf'{self.func_type}\s+{self.name}\s*\(([^)]+)\)', self.text).span(1)
+    pattern = re.compile(rf'{self.func_type}\s+{self.name}\s*\(([^)]+)\)')
+    self.param_list_range = pattern.search(self.buffer.text, *self.func_range).span(1)
     return self.param_list_range
 
-  def get_param_list(self) -> List[Param]:
-    raw_param_list = re.search(rf'{self.func_type}\s+{self.name}\s*\(([^)]+)\)', self.text).group(1).split(',')
-    param_list = []
-    for raw_param in raw_param_list:
-      param_name = re.search(r'[ \t\n*&](\S+)\s*$', raw_param).group(1)
-      param_type = re.search(r'\s*(.*[ \t\n*&])\S+\s*$', raw_param).group(1)
-      param_list.append(Param(param_name, param_type, raw_param.strip()))
-    return param_list
+  def parse_param_list(self) -> Tuple[Param, ...]:
+    count('param_list_parses')
+    return parse_param_list_text(self.buffer.text[self.param_list_range[0]:self.param_list_range[1]])
 
-  def get_stream_var_to_dir(self) -> Dict[str, str]:
+  def get_param_list(self) -> Tuple[Param, ...]:
     """
-    find all variables that are being read from or written to
+    the cached params with the latest types. Use update_param to modify them
     """
-    var_op_list = re.findall(r'(\S+)\.(read|try_read|write|try_write)', self.text)
-    return {var: STREAM_DIRECTION[op] for var, op in var_op_list}
+    return self.param_list
 
-  def get_stream_param_list(self) -> List[Param]:
-    param_list = self.get_param_list()
-    return [param for param in param_list if 'stream' in param.param_type]
+  def get_stream_var_to_dirs(self) -> Dict[str, List[str]]:
+    """
+    find all variables that are being read from or written to, with all directions in the order of first use
+    """
+    if self.stream_var_to_dirs is None:
+      self.stream_var_to_dirs = group_stream_dirs(self.stream_op_index.get_var_op_list(*self.func_range))
+    return self.stream_var_to_dirs
+
+  def get_stream_param_list(self) -> Tuple[Param, ...]:
+    return self.stream_param_list
 
   def update_param(self, updated_param: Param) -> None:
-    assert 'stream' in updated_param.param_type
-    self.name_to_param[updated_param.param_name] = updated_param
+    assert updated_param.is_stream
+    if self.name_to_param[updated_param.param_name] is not updated_param:
+      self.name_to_param[updated_param.param_name] = updated_param
+      self.param_list = tuple(self.name_to_param.values())
+      self.stream_param_list = tuple(param for param in self.param_list if param.is_stream)
+    self.param_list_text = None
 
-    # always keep the text and the param list in sync
-    all_param_text = ', '.join([param.get_text() for param in self.name_to_param.values()])
-    self.text = self.text[:self.param_list_range[0]] + all_param_text + self.text[self.param_list_range[1]:]
-    self.update_param_list_range()
+    # the patch renders the latest param list whenever the text is requested
+    if not self.is_param_list_patched:
+      self.buffer.add_patch(*self.param_list_range, self.get_param_list_text)
+      self.is_param_list_patched = True
+
+  def get_param_list_text(self) -> str:
+    """
+    render all pending param updates at once
+    """
+    if self.param_list_text is None:
+      self.param_list_text = ', '.join([param.get_text() for param in self.name_to_param.values()])
+      count('param_list_renders')
+    return self.param_list_text
 
   def check_and_update_param_type_by_name(self, updated_param_name: str, updated_param_type: str) -> bool:
     """
@@ -96,52 +259,119 @@ class Func:
     if updated_param_type == self.name_to_param[updated_param_name].param_type:
       return False
     else:
-      self.name_to_param[updated_param_name].param_type = updated_param_type
+      self.name_to_param[updated_param_name].set_type(updated_param_type)
       self.update_param(self.name_to_param[updated_param_name])
 
       return True
 
   def get_text(self) -> str:
-    """
-    FIXME: make sure the text is up-to-date
-    """
-    # self.update_param_list_range()
-    # all_param_text = ', '.join([param.get_text() for param in self.name_to_param.values()])
-    # self.text = self.text[:self.param_list_range[0]] + all_param_text + self.text[self.param_list_range[1]:]
     return self.text
 
 
 def update_stream_dir_by_operation(func: Func) -> None:
   """
+  a stream param that is both read and written is a conflict, its direction is left undetermined
   """
   stream_param_list = func.get_stream_param_list()
-  stream_var_to_dir = func.get_stream_var_to_dir()
-  if len(stream_param_list) != len(stream_var_to_dir):
+  stream_var_to_dirs = func.get_stream_var_to_dirs()
+  if len(stream_param_list) != len(stream_var_to_dirs):
     logging.debug(f'detect sub function calls with stream parameters')
   
   stream_name_to_param: Dict[str, Param] = {param.param_name: param for param in stream_param_list}
-  for stream_var, stream_dir in stream_var_to_dir.items():
-    if stream_var in stream_name_to_param:
-      updated_stream_param = stream_name_to_param[stream_var]
-      updated_stream_param.update_stream_dir(stream_dir)
-      func.update_param(updated_stream_param)
-
-
-def extract_functions(filename: str) -> List[Func]:
-  # use ctags to extract all function names
-  assert filename.endswith('.cpp'), f'the file must have extension .cpp in order for ctags to work'
-  out, err = subprocess.Popen(['ctags', '-x', '--c++-kinds=fp', filename], stdout=subprocess.PIPE, stderr=subprocess.PIPE).communicate()
-  func_tags = out.decode('utf-8').strip().split('\n')
-
-  func_list = []
-  whole_file = open(filename, 'r').read()
-  for tag in func_tags:
-    func_name = re.search(r'(\S+)\s+function', tag).group(1)
-    func_type = re.search(rf'{filename}\s+(\S+)\s+{func_name}', tag).group(1)
-
-    func_range = get_func_range(whole_file, func_name)
-    func_text = whole_file[func_range[0]: func_range[1]]
-    func_list.append(Func(func_name, func_type, func_range, func_text))
-  
-  return func_list
+  func.stream_op_conflicts = []
+  for stream_var, stream_dirs in stream_var_to_dirs.items():
+    if stream_var not in stream_name_to_param:
+      continue
+    if len(stream_dirs) > 1:
+      func.stream_op_conflicts.append(stream_var)
+      logging.warning(f'{stream_var} is both read and written in {func.name}, leave the direction undetermined')
+      continue
+
+    updated_stream_param = stream_name_to_param[stream_var]
+    updated_stream_param.update_stream_dir(stream_dirs[0])
+    func.update_param(updated_stream_param)
+
+
+def analyze_func_chunk(
+    text: str, 
+    offset: int, 
+    range_list: List[Tuple[Tuple[int, int], Tuple[int, int]]],
+) -> List[Tuple[Tuple[Param, ...], Dict[str, List[str]]]]:
+  """
+  run in a worker. Parse the signatures and group the stream operations of consecutive functions,
+  given by (func range, param list range). text is the part of the source that starts at offset
+  """
+  stream_op_index = StreamOpIndex(text)
+  result_list = []
+  for (func_begin, func_end), (param_begin, param_end) in range_list:
+    param_list = parse_param_list_text(text[param_begin - offset:param_end - offset])
+    var_op_list = stream_op_index.get_var_op_list(func_begin - offset, func_end - offset)
+    result_list.append((param_list, group_stream_dirs(var_op_list)))
+  return result_list
+
+
+def analyze_func_chunk_in_process(
+    text: str, 
+    offset: int, 
+    range_list: List[Tuple[Tuple[int, int], Tuple[int, int]]],
+) -> Tuple[List[Tuple[Tuple[Param, ...], Dict[str, List[str]]]], Dict[str, int]]:
+  """
+  a worker process does not share the profiler of the caller, so the counters are returned with the result
+  """
+  with profile() as profiler:
+    result_list = analyze_func_chunk(text, offset, range_list)
+  return result_list, dict(profiler.counters)
+
+
+def extract_functions(buffer: SourceBuffer, max_workers: int = 1, pool_type: str = 'process') -> List[Func]:
+  """
+  index all function definitions in one pass over the source.
+  The stream operations of all functions are indexed together when first needed.
+  With more than one worker, the functions are split into chunks of consecutive functions, and
+  the signatures and the stream operations of each chunk are analyzed by a thread or a process.
+  The results are merged in source order, so the output does not depend on the workers
+  """
+  func_def_list = [func_def for func_def in index_functions(buffer.text) if func_def.is_definition]
+  num_chunks = min(max_workers, len(func_def_list) // MIN_FUNCS_PER_WORKER)
+
+  if num_chunks <= 1:
+    stream_op_index = StreamOpIndex(buffer.text)
+    return [
+      Func(func_def.name, func_def.return_type, func_def.func_range, buffer, func_def.param_range, stream_op_index)
+      for func_def in func_def_list
+    ]
+
+  chunk_size = -(-len(func_def_list) // num_chunks)
+  chunk_list = [func_def_list[i:i + chunk_size] for i in range(0, len(func_def_list), chunk_size)]
+  executor_class = ProcessPoolExecutor if pool_type == 'process' else ThreadPoolExecutor
+  with executor_class(max_workers=num_chunks) as executor:
+    future_list = []
+    for chunk in chunk_list:
+      begin, end = chunk[0].func_range[0], chunk[-1].func_range[1] + 1
+      range_list = [(func_def.func_range, func_def.param_range) for func_def in chunk]
+      if pool_type == 'process':
+        future_list.append(executor.submit(analyze_func_chunk_in_process, buffer.text[begin:end], begin, range_list))
+      else:
+        # a thread does not inherit the context variables, i.e. the active profiler, of the caller
+        future_list.append(executor.submit(
+          contextvars.copy_context().run, analyze_func_chunk, buffer.text[begin:end], begin, range_list))
+
+    result_list = []
+    for future in future_list:
+      if pool_type == 'process':
+        chunk_result_list, counters = future.result()
+        for name, n in counters.items():
+          count(name, n)
+      else:
+        chunk_result_list = future.result()
+      result_list += chunk_result_list
+  count('analysis_chunks', len(chunk_list))
+  count('param_list_parses', len(func_def_list))
 
+  return [
+    Func(
+      func_def.name, func_def.return_type, func_def.func_range, buffer, func_def.param_range,
+      param_list=param_list, stream_var_to_dirs=stream_var_to_dirs,
+    )
+    for func_def, (param_list, stream_var_to_dirs) in zip(func_def_list, result_list)
+  ]
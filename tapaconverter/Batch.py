@@ -0,0 +1,135 @@
+# convert many designs in parallel
+# the manifest is a json list of jobs, e.g.
+# [{"filename": "a.cpp", "top_name": "kernel_a", "output": "a_tapa.cpp"}, ...]
+# top_name and output can also be matching lists to convert several tops of the same file
+# a job can set its own convert options, e.g. "options": {"size_fifos": true}, over the options of the batch
+# relative paths are resolved against the directory of the manifest
+
+import json
+import logging
+import os
+import time
+import traceback
+
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from typing import *
+from tapaconverter.Cache import ConversionCache
+from tapaconverter.Convert import convert_file, get_options
+from tapaconverter.Profile import Profiler, profile
+
+
+class Job:
+  def __init__(
+      self, 
+      filename: str, 
+      top_name: Union[str, List[str]], 
+      output: Union[str, List[str]], 
+      options: Optional[Dict[str, Any]] = None,
+  ):
+    self.filename = filename
+    self.top_name = top_name
+    self.output = output
+    self.options = options or {}
+
+  def to_dict(self) -> Dict[str, Any]:
+    job_dict = {'filename': self.filename, 'top_name': self.top_name, 'output': self.output}
+    if self.options:
+      job_dict['options'] = self.options
+    return job_dict
+
+
+class JobResult:
+  def __init__(
+      self, 
+      job: Job, 
+      is_success: bool, 
+      elapsed: float, 
+      error: Optional[str] = None, 
+      profiler: Optional[Profiler] = None,
+  ):
+    self.job = job
+    self.is_success = is_success
+    self.elapsed = elapsed
+    self.error = error
+    self.profiler = profiler
+
+  def to_dict(self) -> Dict[str, Any]:
+    return {
+      **self.job.to_dict(),
+      'success': self.is_success,
+      'elapsed': round(self.elapsed, 6),
+      'error': self.error,
+      'profile': self.profiler.to_dict() if self.profiler else None,
+    }
+
+
+def load_manifest(manifest_path: str) -> List[Job]:
+  base_dir = os.path.dirname(os.path.abspath(manifest_path))
+  _resolve = lambda path: os.path.join(base_dir, path) if isinstance(path, str) else [_resolve(p) for p in path]
+
+  job_list = []
+  for entry in json.load(open(manifest_path, 'r')):
+    options = entry.get('options', {})
+    # fail on an unknown option before any job starts
+    get_options(options)
+    job_list.append(Job(_resolve(entry['filename']), entry['top_name'], _resolve(entry['output']), options))
+  return job_list
+
+
+def get_available_cores() -> int:
+  if hasattr(os, 'sched_getaffinity'):
+    return len(os.sched_getaffinity(0))
+  return os.cpu_count() or 1
+
+
+def run_job(
+    job: Job, 
+    cache: Optional[ConversionCache] = None, 
+    options: Optional[Dict[str, Any]] = None,
+) -> JobResult:
+  """
+  the conversion does not touch any intermediate file, so concurrent jobs do not interfere.
+  The options of the job take precedence over the given options
+  """
+  start = time.perf_counter()
+  with profile() as profiler:
+    try:
+      convert_file(job.filename, job.top_name, job.output, cache, **{**(options or {}), **job.options})
+      error = None
+    except Exception:
+      error = traceback.format_exc()
+  return JobResult(job, error is None, time.perf_counter() - start, error, profiler)
+
+
+def run_batch(
+    job_list: List[Job], 
+    max_workers: Optional[int] = None, 
+    cache: Optional[ConversionCache] = None,
+    options: Optional[Dict[str, Any]] = None,
+) -> List[JobResult]:
+  """
+  results are in the same order as the jobs. The options apply to every job that does not set them itself
+  """
+  if max_workers is None:
+    max_workers = get_available_cores()
+  max_workers = max(1, min(max_workers, len(job_list)))
+
+  with ProcessPoolExecutor(max_workers=max_workers) as executor:
+    result_list = list(executor.map(run_job, job_list, repeat(cache), repeat(options)))
+
+  for result in result_list:
+    if not result.is_success:
+      logging.error(f'fail to convert {result.job.filename} ({result.job.top_name}):\n{result.error}')
+
+  return result_list
+
+
+def get_summary(result_list: List[JobResult], wall_time: float) -> Dict[str, Any]:
+  return {
+    'total': len(result_list),
+    'success': sum(result.is_success for result in result_list),
+    'failure': sum(not result.is_success for result in result_list),
+    'wall_time': round(wall_time, 6),
+    'jobs': [result.to_dict() for result in result_list],
+  }
@@ -0,0 +1,106 @@
+# time each stage of the converter on synthetic designs of increasing size
+# python -m tapaconverter.Benchmark --num_tasks 10 100 300 --output bench.json
+
+import argparse
+import json
+import logging
+import time
+
+from typing import *
+from tapaconverter.AnalyzeStreamDirectionByOperation import extract_functions
+from tapaconverter.Convert import convert
+from tapaconverter.Formatter import format_source
+from tapaconverter.GenerateDesign import DesignConfig, generate_design
+from tapaconverter.ParseTop import get_top_ast_from_source
+from tapaconverter.SourceBuffer import SourceBuffer
+from tapaconverter.TraverseTopAST import get_tapa_init_version_from_source
+from tapaconverter.UpdateStreamDirection import update_stream_directions_from_source
+
+STAGES = [
+  'get_top_ast',
+  'get_tapa_init_version',
+  'extract_functions',
+  'update_stream_directions',
+  'format_output',
+]
+
+
+def time_best(func: Callable[[], Any], repeat: int) -> Tuple[float, Any]:
+  """
+  return the best wall time out of several runs and the result of the last run
+  """
+  best = float('inf')
+  result = None
+  for _ in range(repeat):
+    start = time.perf_counter()
+    result = func()
+    best = min(best, time.perf_counter() - start)
+  return best, result
+
+
+def benchmark_design(source: str, top_name: str, repeat: int = 3) -> Dict[str, float]:
+  """
+  each stage is fed with the output of the previous stage
+  """
+  stage_to_time = {}
+  stage_to_time['get_top_ast'], _ = time_best(
+    lambda: get_top_ast_from_source(source, top_name), repeat)
+  stage_to_time['get_tapa_init_version'], init_version = time_best(
+    lambda: get_tapa_init_version_from_source(source, top_name), repeat)
+  stage_to_time['extract_functions'], _ = time_best(
+    lambda: extract_functions(SourceBuffer(init_version)), repeat)
+  stage_to_time['update_stream_directions'], tapa_cpp = time_best(
+    lambda: update_stream_directions_from_source(init_version, top_name), repeat)
+  stage_to_time['format_output'], _ = time_best(
+    lambda: format_source(tapa_cpp), repeat)
+  return stage_to_time
+
+
+def run_benchmarks(config_list: List[DesignConfig], repeat: int = 3) -> List[Dict[str, Any]]:
+  result_list = []
+  for config in config_list:
+    source = generate_design(config)
+    logging.info(f'benchmark {config.to_dict()}')
+    stage_to_time = benchmark_design(source, config.top_name, repeat)
+    # the stages overlap, e.g. extract_functions is part of update_stream_directions,
+    # so the total is the time of the whole conversion rather than the sum of the stages
+    total, _ = time_best(lambda: convert(source, config.top_name), repeat)
+    result_list.append({
+      'config': config.to_dict(),
+      'source_bytes': len(source),
+      'source_lines': source.count('\n'),
+      'stages': {stage: round(t, 6) for stage, t in stage_to_time.items()},
+      'total': round(total, 6),
+    })
+  return result_list
+
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser()
+  parser.add_argument('--num_tasks', type=int, nargs='+', default=[4, 16, 64, 256])
+  parser.add_argument('--num_lanes', type=int, default=1, help='parallel streams between adjacent tasks')
+  parser.add_argument('--num_depth_pragmas', type=int, default=None, help='default to one per stream')
+  parser.add_argument('--num_mmaps', type=int, default=2)
+  parser.add_argument('--num_template_types', type=int, default=4)
+  parser.add_argument('--hier_depth', type=int, default=1)
+  parser.add_argument('--repeat', type=int, default=3)
+  parser.add_argument('--output', type=str, default=None, help='write the results as json')
+  parser.add_argument('--dump_design', type=str, default=None, help='write the largest generated design to this path')
+  args = parser.parse_args()
+
+  config_list = [
+    DesignConfig(
+      num_tasks, args.num_lanes, args.num_depth_pragmas, args.num_mmaps, args.num_template_types, args.hier_depth)
+    for num_tasks in args.num_tasks
+  ]
+  result_list = run_benchmarks(config_list, args.repeat)
+
+  print(f'{"tasks":>6} {"bytes":>10} ' + ' '.join(f'{stage:>24}' for stage in STAGES))
+  for result in result_list:
+    print(f'{result["config"]["num_tasks"]:>6} {result["source_bytes"]:>10} ' +
+          ' '.join(f'{result["stages"][stage]:>24.4f}' for stage in STAGES))
+
+  if args.output:
+    open(args.output, 'w').write(json.dumps(result_list, indent=2))
+  if args.dump_design:
+    open(args.dump_design, 'w').write(generate_design(config_list[-1]))
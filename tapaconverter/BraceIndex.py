@@ -0,0 +1,180 @@
+# match all braces of a source in one pass, so that the end of any block is a dict lookup
+# braces in comments, string literals and preprocessor lines are ignored
+# after an edit, only the edited span is lexed again if it cannot change how the
+# rest of the source is lexed. Otherwise the whole index is rebuilt
+
+import bisect
+import re
+import threading
+
+from collections import OrderedDict
+from typing import *
+from tapaconverter.Profile import count
+
+# outside of comments and strings, "#" only appears in preprocessor lines.
+# Try the braces first, they are the most common match
+BRACE_TOKEN_PATTERN = re.compile(r'''
+    (?P<brace>[{}])
+  | (?P<skip>/(?:/[^\n]*|\*.*?\*/)|"(?:\\.|[^\\"\n])*"|'(?:\\.|[^\\'\n])*'|\#(?:\\\n|[^\n])*)
+''', re.DOTALL | re.VERBOSE)
+
+# an edit containing any of them may start or end a comment, a string or a macro
+LEXER_SENSITIVE_PATTERN = re.compile(r'["\'/*#\\\n]')
+
+BRACE_INDEX_CACHE_SIZE = 2
+
+
+class BraceIndex:
+  def __init__(self, text: str, open_to_close: Dict[int, int], skip_ranges: List[Tuple[int, int]]):
+    self.text = text
+    # -1 if the "{" is not closed
+    self.open_to_close = open_to_close
+    self.open_list: List[int] = sorted(open_to_close)
+    self.skip_ranges = skip_ranges
+    self.skip_starts: List[int] = [start for start, _ in skip_ranges]
+
+  @staticmethod
+  def build(text: str) -> 'BraceIndex':
+    open_to_close, skip_ranges = lex_braces(text, 0, len(text))
+    count('regex_scans')
+    return BraceIndex(text, open_to_close, skip_ranges)
+
+  def get_matching_brace(self, open_index: int) -> int:
+    """
+    given the index of a "{", return the index of the matching "}", or -1
+    """
+    return self.open_to_close[open_index]
+
+  def get_block_end(self, start_index: int) -> int:
+    """
+    the index of the "}" that closes the first block at or after start_index, or -1
+    """
+    i = bisect.bisect_left(self.open_list, start_index)
+    if i == len(self.open_list):
+      return -1
+    return self.open_to_close[self.open_list[i]]
+
+  def is_in_skip_range(self, start: int, end: int) -> bool:
+    """
+    whether [start, end] touches a comment, a string or a macro
+    """
+    i = bisect.bisect_right(self.skip_starts, end)
+    return i > 0 and self.skip_ranges[i-1][1] >= start
+
+  def apply_edit(self, start: int, end: int, new_text: str) -> 'BraceIndex':
+    """
+    return the index of text[:start] + new_text + text[end:]
+    """
+    text = self.text[:start] + new_text + self.text[end:]
+    old_text = self.text[start:end]
+
+    if (LEXER_SENSITIVE_PATTERN.search(old_text) or LEXER_SENSITIVE_PATTERN.search(new_text)
+        or self.is_in_skip_range(start - 1, end)
+        or not is_balanced(old_text) or not is_balanced(new_text)):
+      count('brace_index_rebuilds')
+      return BraceIndex.build(text)
+
+    # the braces in the edited span are matched among themselves
+    delta = len(new_text) - len(old_text)
+    shift = lambda i: i + delta if i >= end else i
+    open_to_close = {
+      shift(open_index): (shift(close_index) if close_index >= 0 else -1)
+      for open_index, close_index in self.open_to_close.items() if not start <= open_index < end
+    }
+    new_open_to_close, _ = lex_braces(text, start, start + len(new_text))
+    open_to_close.update(new_open_to_close)
+    skip_ranges = [(shift(skip_start), shift(skip_end)) for skip_start, skip_end in self.skip_ranges]
+    count('brace_index_updates')
+
+    return BraceIndex(text, open_to_close, skip_ranges)
+
+  def update(self, text: str) -> 'BraceIndex':
+    """
+    return the index of a new version of the text. Only the span between the
+    common prefix and the common suffix is treated as edited
+    """
+    prefix_len = get_common_prefix_len(self.text, text)
+    suffix_len = get_common_suffix_len(self.text[prefix_len:], text[prefix_len:])
+    index = self.apply_edit(prefix_len, len(self.text) - suffix_len, text[prefix_len:len(text) - suffix_len])
+    # share the string object of the caller
+    index.text = text
+    return index
+
+
+def lex_braces(text: str, start: int, end: int) -> Tuple[Dict[int, int], List[Tuple[int, int]]]:
+  open_to_close: Dict[int, int] = {}
+  skip_ranges: List[Tuple[int, int]] = []
+  stack: List[int] = []
+  for match in BRACE_TOKEN_PATTERN.finditer(text, start, end):
+    if match.lastgroup == 'skip':
+      skip_ranges.append(match.span())
+    elif match.group() == '{':
+      stack.append(match.start())
+    elif stack:
+      open_to_close[stack.pop()] = match.start()
+
+  for open_index in stack:
+    open_to_close[open_index] = -1
+
+  return open_to_close, skip_ranges
+
+
+def is_balanced(text: str) -> bool:
+  depth = 0
+  for char in text:
+    if char == '{':
+      depth += 1
+    elif char == '}':
+      depth -= 1
+      if depth < 0:
+        return False
+  return depth == 0
+
+
+def get_common_prefix_len(a: str, b: str) -> int:
+  """
+  binary search with slice comparisons, which run in C
+  """
+  low, high = 0, min(len(a), len(b))
+  while low < high:
+    mid = (low + high + 1) // 2
+    if a[:mid] == b[:mid]:
+      low = mid
+    else:
+      high = mid - 1
+  return low
+
+
+def get_common_suffix_len(a: str, b: str) -> int:
+  low, high = 0, min(len(a), len(b))
+  while low < high:
+    mid = (low + high + 1) // 2
+    if a[len(a) - mid:] == b[len(b) - mid:]:
+      low = mid
+    else:
+      high = mid - 1
+  return low
+
+
+BRACE_INDEX_CACHE: 'OrderedDict[str, BraceIndex]' = OrderedDict()
+BRACE_INDEX_CACHE_LOCK = threading.Lock()
+
+
+def get_brace_index(text: str, base: Optional[BraceIndex] = None) -> BraceIndex:
+  """
+  the index of the recently used sources is cached.
+  If base is the index of a previous version of the text, only the edited span is lexed again
+  """
+  with BRACE_INDEX_CACHE_LOCK:
+    if text in BRACE_INDEX_CACHE:
+      BRACE_INDEX_CACHE.move_to_end(text)
+      return BRACE_INDEX_CACHE[text]
+
+  index = base.update(text) if base is not None else BraceIndex.build(text)
+
+  with BRACE_INDEX_CACHE_LOCK:
+    BRACE_INDEX_CACHE[text] = index
+    while len(BRACE_INDEX_CACHE) > BRACE_INDEX_CACHE_SIZE:
+      BRACE_INDEX_CACHE.popitem(last=False)
+
+  return index
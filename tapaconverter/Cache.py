@@ -0,0 +1,129 @@
+# persistent cache of the final formatted tapa code
+# the key is the hash of the source text, the top name, the converter version and the options
+# each entry is one file named by its key. The mtime of the file records the last use for LRU eviction
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+
+from typing import *
+from tapaconverter.common import CONVERTER_VERSION
+
+DEFAULT_CACHE_DIR = os.path.join(
+  os.environ.get('XDG_CACHE_HOME', os.path.join(os.path.expanduser('~'), '.cache')), 'tapaconverter')
+DEFAULT_CACHE_MAX_BYTES = 256 * 1024 * 1024
+CACHE_ENTRY_SUFFIX = '.tapa.cpp'
+# the options that only change how the conversion runs, not its output, are not part of the key
+OUTPUT_NEUTRAL_OPTIONS = ('analysis_workers', 'analysis_pool')
+
+
+def get_output_options(options: Dict[str, Any]) -> Dict[str, Any]:
+  return {key: value for key, value in options.items() if key not in OUTPUT_NEUTRAL_OPTIONS}
+
+
+class ConversionCache:
+  def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_CACHE_MAX_BYTES):
+    self.cache_dir = cache_dir
+    self.max_bytes = max_bytes
+
+  def get_key(self, source: str, top_name: str, options: Optional[Dict[str, Any]] = None) -> str:
+    hasher = hashlib.sha256()
+    for item in (CONVERTER_VERSION, top_name, json.dumps(get_output_options(options or {}), sort_keys=True), source):
+      hasher.update(item.encode('utf-8'))
+      hasher.update(b'\0')
+    return hasher.hexdigest()
+
+  def get_entry_path(self, key: str) -> str:
+    return os.path.join(self.cache_dir, key + CACHE_ENTRY_SUFFIX)
+
+  def get(self, key: str) -> Optional[str]:
+    """
+    return None on a miss. A hit refreshes the last use time of the entry
+    """
+    entry_path = self.get_entry_path(key)
+    try:
+      text = open(entry_path, 'r').read()
+      os.utime(entry_path)
+    except FileNotFoundError:
+      return None
+
+    logging.debug(f'cache hit: {key}')
+    return text
+
+  def put(self, key: str, text: str) -> None:
+    """
+    write to a temp file then rename, so that concurrent readers never see a partial entry
+    """
+    os.makedirs(self.cache_dir, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=self.cache_dir, prefix='.tmp_')
+    with os.fdopen(fd, 'w') as f:
+      f.write(text)
+    os.replace(temp_path, self.get_entry_path(key))
+
+    self.evict()
+
+  def list_entries(self) -> List[Dict[str, Any]]:
+    """
+    from the most recently used to the least recently used
+    """
+    if not os.path.isdir(self.cache_dir):
+      return []
+
+    entry_list = []
+    for entry in os.scandir(self.cache_dir):
+      if not entry.name.endswith(CACHE_ENTRY_SUFFIX):
+        continue
+      try:
+        stat = entry.stat()
+      except FileNotFoundError:
+        continue
+      entry_list.append({
+        'key': entry.name[:-len(CACHE_ENTRY_SUFFIX)],
+        'size': stat.st_size,
+        'last_used': stat.st_mtime,
+      })
+
+    return sorted(entry_list, key=lambda e: e['last_used'], reverse=True)
+
+  def evict(self) -> int:
+    """
+    remove the least recently used entries until the total size is within the bound
+    """
+    entry_list = self.list_entries()
+    total_bytes = sum(e['size'] for e in entry_list)
+
+    removed_count = 0
+    while entry_list and total_bytes > self.max_bytes:
+      entry = entry_list.pop()
+      try:
+        os.remove(self.get_entry_path(entry['key']))
+        removed_count += 1
+      except FileNotFoundError:
+        pass
+      total_bytes -= entry['size']
+
+    return removed_count
+
+  def get_stats(self) -> Dict[str, Any]:
+    entry_list = self.list_entries()
+    return {
+      'cache_dir': self.cache_dir,
+      'entries': len(entry_list),
+      'total_bytes': sum(e['size'] for e in entry_list),
+      'max_bytes': self.max_bytes,
+    }
+
+  def purge(self) -> int:
+    """
+    remove all entries and return the number of removed entries
+    """
+    removed_count = 0
+    for entry in self.list_entries():
+      try:
+        os.remove(self.get_entry_path(entry['key']))
+        removed_count += 1
+      except FileNotFoundError:
+        pass
+    return removed_count
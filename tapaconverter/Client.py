@@ -0,0 +1,121 @@
+# a thin client of the converter daemon. It takes the conversion arguments of main.py:
+# a file or a project, and the convert options such as --size_fifos
+# python -m tapaconverter.Client --filename vadd.cpp --top_name vadd --output vadd_tapa.cpp
+
+import argparse
+import errno
+import json
+import os
+import socket
+import stat
+import sys
+import tempfile
+
+from typing import *
+from tapaconverter.ConvertOptions import add_option_arguments, get_options_from_args
+
+
+def get_default_socket_path() -> str:
+  """
+  the runtime dir of the user if there is one, otherwise a private dir of the user in the temp dir.
+  A fixed name directly in the temp dir could be taken by any other user first
+  """
+  runtime_dir = os.environ.get('XDG_RUNTIME_DIR')
+  if runtime_dir:
+    return os.path.join(runtime_dir, 'tapaconverter.sock')
+  return os.path.join(tempfile.gettempdir(), f'tapaconverter-{os.getuid()}', 'daemon.sock')
+
+
+# keep the client free of the converter imports, it only talks to the daemon
+DEFAULT_SOCKET_PATH = get_default_socket_path()
+
+
+def check_owner(path: str, is_dir: bool = False) -> None:
+  """
+  raise PermissionError unless path is a socket, or a dir only accessible to its owner, of the current user.
+  Symlinks are not followed
+  """
+  st = os.lstat(path)
+  if is_dir:
+    is_expected_type = stat.S_ISDIR(st.st_mode) and st.st_mode & 0o077 == 0
+  else:
+    is_expected_type = stat.S_ISSOCK(st.st_mode)
+  if st.st_uid != os.getuid() or not is_expected_type:
+    kind = 'private dir' if is_dir else 'socket'
+    raise PermissionError(errno.EACCES, f'{path} is not a {kind} of the current user')
+
+
+def connect(socket_path: Optional[str] = None) -> socket.socket:
+  """
+  the requests name the files to read and write, so they are only sent to a daemon of the same user
+  """
+  socket_path = socket_path or DEFAULT_SOCKET_PATH
+  check_owner(socket_path)
+  sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+  sock.connect(socket_path)
+  return sock
+
+
+def send_request(request: Dict[str, Any], socket_path: Optional[str] = None) -> Dict[str, Any]:
+  with connect(socket_path) as sock:
+    sock.sendall(json.dumps(request).encode('utf-8') + b'\n')
+    with sock.makefile('rb') as f:
+      return json.loads(f.readline())
+
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser()
+  parser.add_argument('--filename', type=str)
+  parser.add_argument('--top_name', type=str, nargs='+')
+  parser.add_argument('--output', type=str, nargs='+')
+  parser.add_argument('--project', type=str, nargs='+', help='source and header files of a multi-file design')
+  parser.add_argument('--output_dir', type=str, default=None, help='where the converted files of --project are written')
+  parser.add_argument('--profile', type=str, default=None, help='write the per-stage timing and counters as json')
+  parser.add_argument('--stats', action='store_true', help='print the per-stage timing and counters')
+  parser.add_argument('--socket', type=str, default=None, help=f'default to {DEFAULT_SOCKET_PATH}')
+  parser.add_argument('--ping', action='store_true', help='check if the daemon is up')
+  parser.add_argument('--daemon_stats', action='store_true', help='print the request counters of the daemon')
+  parser.add_argument('--shutdown', action='store_true', help='stop the daemon')
+  add_option_arguments(parser)
+  args = parser.parse_args()
+
+  # the daemon may run in another directory
+  _abspath = lambda path: os.path.abspath(path) if path else path
+
+  if args.ping or args.daemon_stats or args.shutdown:
+    command = 'ping' if args.ping else 'stats' if args.daemon_stats else 'shutdown'
+    response = send_request({'command': command}, args.socket)
+    print(json.dumps(response, indent=2))
+    sys.exit(0 if response['success'] else 1)
+
+  if args.project:
+    if not (args.top_name and args.output_dir) or len(args.top_name) > 1:
+      parser.error('--project requires a single --top_name and --output_dir')
+    request = {
+      'command': 'convert',
+      'project': [_abspath(filename) for filename in args.project],
+      'top_name': args.top_name,
+      'output_dir': _abspath(args.output_dir),
+    }
+  else:
+    if not (args.filename and args.top_name and args.output):
+      parser.error('--filename, --top_name and --output are required without --project')
+    if len(args.top_name) != len(args.output):
+      parser.error('--top_name and --output must have the same number of values')
+    request = {
+      'command': 'convert',
+      'filename': _abspath(args.filename),
+      'top_name': args.top_name,
+      'output': [_abspath(output) for output in args.output],
+    }
+
+  request['options'] = get_options_from_args(parser, args)
+  response = send_request(request, args.socket)
+  if not response['success']:
+    print(response['error'], file=sys.stderr)
+    sys.exit(1)
+
+  if args.profile:
+    open(args.profile, 'w').write(json.dumps(response['profile'], indent=2))
+  if args.stats:
+    print(json.dumps(response['profile'], indent=2))
@@ -0,0 +1,188 @@
+from typing import *
+from pycparser import c_ast
+from tapaconverter.Cache import ConversionCache
+from tapaconverter.DataflowGraph import DataflowGraph, build_dataflow_graph
+from tapaconverter.Formatter import format_source
+from tapaconverter.ParseTop import get_top_ast_from_source
+from tapaconverter.Profile import count, stage
+from tapaconverter.SizeStreamDepth import DEFAULT_MIN_FIFO_DEPTH, apply_stream_depths, size_stream_depths
+from tapaconverter.TraverseTopAST import (
+  get_shared_init_version,
+  get_tapa_init_version_from_shared,
+  get_tapa_init_version_from_source,
+  replace_top_func,
+)
+from tapaconverter.UpdateStreamDirection import (
+  apply_stream_param_types,
+  get_stream_param_types,
+  update_stream_directions_from_source,
+)
+from tapaconverter.common import read_source
+
+__all__ = [
+  'convert',
+  'convert_file',
+  'convert_tops',
+  'convert_with_graph',
+]
+
+DEFAULT_OPTIONS = {
+  # run the fake top func through cpp instead of the in-memory preprocessing
+  'use_cpp': False,
+  # format the output in the astyle layout
+  'format': True,
+  # declare all streams of the top at the depths recommended by the dataflow graph
+  'size_fifos': False,
+  # the depth of the streams without a depth pragma when sizing
+  'min_fifo_depth': DEFAULT_MIN_FIFO_DEPTH,
+  # task name or node name -> latency in cycles, used when sizing
+  'task_latency': {},
+  # the workers that parse the signatures and the stream operations of the functions. 1 to run serially
+  'analysis_workers': 1,
+  # 'process' or 'thread'
+  'analysis_pool': 'process',
+}
+
+
+def get_options(options: Dict[str, Any]) -> Dict[str, Any]:
+  unknown_options = set(options) - set(DEFAULT_OPTIONS)
+  if unknown_options:
+    raise TypeError(f'unknown options: {", ".join(sorted(unknown_options))}')
+  if options.get('analysis_pool', 'process') not in ('process', 'thread'):
+    raise ValueError(f'analysis_pool must be "process" or "thread", got {options["analysis_pool"]}')
+  return {**DEFAULT_OPTIONS, **options}
+
+
+def convert(source: str, top_name: str, **options) -> str:
+  """
+  convert the source of a HLS dataflow design to tapa.
+  Everything happens in memory and no state is shared between calls, so it is safe to call from multiple threads
+  """
+  options = get_options(options)
+  if options['size_fifos']:
+    return convert_with_graph(source, top_name, **options)[0]
+
+  tapa_cpp = get_tapa_init_version_from_source(source, top_name, options['use_cpp'])
+  tapa_cpp = update_stream_directions_from_source(
+    tapa_cpp, top_name, options['analysis_workers'], options['analysis_pool'])
+  if options['format']:
+    tapa_cpp = format_source(tapa_cpp)
+
+  return tapa_cpp
+
+
+def size_top_streams(
+    tapa_cpp: str, 
+    top_name: str, 
+    ast: c_ast.FileAST, 
+    options: Dict[str, Any], 
+    graph: Optional[DataflowGraph] = None,
+) -> Tuple[str, DataflowGraph]:
+  """
+  redeclare the streams of the top at the sized depths. tapa_cpp must have the stream directions.
+  The graph is built if not given, and is updated to the sized depths
+  """
+  if graph is None:
+    with stage('build_dataflow_graph'):
+      graph = build_dataflow_graph(ast, top_name, tapa_cpp)
+
+  with stage('size_stream_depths'):
+    stream_to_depth = size_stream_depths(graph, options['task_latency'], options['min_fifo_depth'])
+    apply_stream_depths(graph, stream_to_depth)
+    tapa_cpp = replace_top_func(tapa_cpp, top_name, ast, stream_to_depth)
+  count('sized_streams', len(stream_to_depth))
+
+  return tapa_cpp, graph
+
+
+def convert_with_graph(source: str, top_name: str, **options) -> Tuple[str, DataflowGraph]:
+  """
+  same as convert, and also return the dataflow graph of the top func
+  """
+  options = get_options(options)
+
+  ast = get_top_ast_from_source(source, top_name, options['use_cpp'])
+  tapa_cpp = get_tapa_init_version_from_source(source, top_name, ast=ast)
+  tapa_cpp = update_stream_directions_from_source(
+    tapa_cpp, top_name, options['analysis_workers'], options['analysis_pool'])
+  with stage('build_dataflow_graph'):
+    graph = build_dataflow_graph(ast, top_name, tapa_cpp)
+  if options['size_fifos']:
+    tapa_cpp, graph = size_top_streams(tapa_cpp, top_name, ast, options, graph)
+  if options['format']:
+    tapa_cpp = format_source(tapa_cpp)
+
+  return tapa_cpp, graph
+
+
+def convert_tops(source: str, top_names: List[str], **options) -> Dict[str, str]:
+  """
+  convert several top functions of the same source, e.g. a file with multiple kernels.
+  The source-wide rewrites and the stream direction analysis are done once and shared by all tops.
+  Return top name -> tapa code
+  """
+  if len(top_names) == 1:
+    return {top_names[0]: convert(source, top_names[0], **options)}
+
+  options = get_options(options)
+  count('tops', len(top_names))
+
+  shared_code = get_shared_init_version(source)
+  name_to_param_types = get_stream_param_types(shared_code, options['analysis_workers'], options['analysis_pool'])
+
+  top_to_tapa_cpp = {}
+  for top_name in top_names:
+    ast = get_top_ast_from_source(source, top_name, options['use_cpp'])
+    with stage('get_tapa_init_version'):
+      tapa_cpp = get_tapa_init_version_from_shared(shared_code, top_name, ast)
+    tapa_cpp = apply_stream_param_types(tapa_cpp, top_name, name_to_param_types)
+    if options['size_fifos']:
+      tapa_cpp, _ = size_top_streams(tapa_cpp, top_name, ast, options)
+    if options['format']:
+      tapa_cpp = format_source(tapa_cpp)
+    top_to_tapa_cpp[top_name] = tapa_cpp
+
+  return top_to_tapa_cpp
+
+
+def convert_file(
+    filename: str, 
+    top_name: Union[str, List[str]], 
+    output: Union[str, List[str]], 
+    cache: Optional[ConversionCache] = None,
+    **options,
+) -> None:
+  """
+  convert a HLS dataflow design to tapa and write to output.
+  Pass a list of top names and a matching list of outputs to convert several tops of the same file.
+  If a cache is given, an identical previous conversion is reused
+  """
+  top_names = [top_name] if isinstance(top_name, str) else list(top_name)
+  outputs = [output] if isinstance(output, str) else list(output)
+  if len(top_names) != len(outputs):
+    raise ValueError(f'got {len(top_names)} top names but {len(outputs)} outputs')
+
+  source = read_source(filename)
+
+  top_to_tapa_cpp = {}
+  top_to_key = {}
+  if cache is not None:
+    for name in top_names:
+      top_to_key[name] = cache.get_key(source, name, get_options(options))
+      tapa_cpp = cache.get(top_to_key[name])
+      if tapa_cpp is None:
+        count('cache_misses')
+      else:
+        count('cache_hits')
+        top_to_tapa_cpp[name] = tapa_cpp
+
+  missing_top_names = [name for name in top_names if name not in top_to_tapa_cpp]
+  if missing_top_names:
+    converted = convert_tops(source, missing_top_names, **options)
+    if cache is not None:
+      for name, tapa_cpp in converted.items():
+        cache.put(top_to_key[name], tapa_cpp)
+    top_to_tapa_cpp.update(converted)
+
+  for name, path in zip(top_names, outputs):
+    open(path, 'w').write(top_to_tapa_cpp[name])
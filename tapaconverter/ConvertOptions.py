@@ -0,0 +1,79 @@
+# the command line flags of the convert options, shared by main.py, the client of the daemon
+# and the regression harness. Kept free of the converter imports so that the client stays light
+
+import argparse
+
+from typing import *
+
+__all__ = [
+  'add_option_arguments',
+  'get_option_args',
+  'get_options_from_args',
+  'get_task_latency',
+]
+
+
+def add_option_arguments(parser: argparse.ArgumentParser) -> None:
+  parser.add_argument('--use_cpp', action='store_true',
+                      help='run the fake top func through cpp instead of the in-memory preprocessing')
+  parser.add_argument('--no_format', action='store_true', help='write the output without formatting')
+  parser.add_argument('--size_fifos', action='store_true',
+                      help='declare all streams of the top at the depths that balance the reconvergent paths')
+  parser.add_argument('--min_fifo_depth', type=int, default=2, help='the depth of the streams without a depth pragma')
+  parser.add_argument('--task_latency', type=str, nargs='+', default=[],
+                      help='the latency of tasks in cycles, e.g. compute=20 load[1]=5')
+  parser.add_argument('--analysis_workers', type=int, default=1,
+                      help='parse the signatures and the stream operations of the functions in parallel')
+  parser.add_argument('--analysis_pool', type=str, default='process', choices=['process', 'thread'])
+
+
+def get_task_latency(parser: argparse.ArgumentParser, args: argparse.Namespace) -> Dict[str, int]:
+  task_to_latency = {}
+  for item in args.task_latency:
+    name, _, latency = item.rpartition('=')
+    if not name or not latency.isdigit():
+      parser.error(f'--task_latency expects name=cycles, got {item}')
+    task_to_latency[name] = int(latency)
+  return task_to_latency
+
+
+def get_options_from_args(parser: argparse.ArgumentParser, args: argparse.Namespace) -> Dict[str, Any]:
+  """
+  the options of convert given by the flags. Only the options that differ from the defaults are set
+  """
+  options = {}
+  if args.use_cpp:
+    options['use_cpp'] = True
+  if args.no_format:
+    options['format'] = False
+  if args.size_fifos:
+    options.update({
+      'size_fifos': True,
+      'min_fifo_depth': args.min_fifo_depth,
+      'task_latency': get_task_latency(parser, args),
+    })
+  if args.analysis_workers > 1:
+    options.update({'analysis_workers': args.analysis_workers, 'analysis_pool': args.analysis_pool})
+  return options
+
+
+def get_option_args(options: Dict[str, Any]) -> List[str]:
+  """
+  the flags that give the options, the inverse of get_options_from_args
+  """
+  args = []
+  for key, value in options.items():
+    if key in ('use_cpp', 'size_fifos'):
+      if value:
+        args.append(f'--{key}')
+    elif key == 'format':
+      if not value:
+        args.append('--no_format')
+    elif key == 'task_latency':
+      if value:
+        args += ['--task_latency'] + [f'{name}={latency}' for name, latency in value.items()]
+    elif key in ('min_fifo_depth', 'analysis_workers', 'analysis_pool'):
+      args += [f'--{key}', str(value)]
+    else:
+      raise ValueError(f'option {key} has no command line flag')
+  return args
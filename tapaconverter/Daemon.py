@@ -0,0 +1,229 @@
+# a long-lived converter that serves requests over a unix socket
+# python -m tapaconverter.Daemon --socket $XDG_RUNTIME_DIR/tapaconverter.sock --workers 4
+#
+# each request and each response is one line of json. A request mirrors the
+# arguments of main.py, e.g.
+# {"command": "convert", "filename": "/abs/a.cpp", "top_name": ["a"], "output": ["/abs/a_tapa.cpp"],
+#  "options": {"size_fifos": true}}
+# The daemon reads and writes any path its user can, so the socket is only accessible to that user.
+# There is no tcp listener, since localhost is shared by all users of the machine
+# Conversions run in warm worker processes. Each worker keeps the incremental state
+# of the recently converted files, so a repeated request only re-analyzes what changed
+
+import argparse
+import errno
+import json
+import os
+import socket
+import socketserver
+import sys
+import threading
+import time
+import traceback
+
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import *
+from tapaconverter.Batch import get_available_cores
+from tapaconverter.Client import DEFAULT_SOCKET_PATH, check_owner
+from tapaconverter.Convert import convert_file, get_options
+from tapaconverter.GenerateDesign import DesignConfig, generate_design
+from tapaconverter.Incremental import IncrementalConverter
+from tapaconverter.Profile import profile
+from tapaconverter.Project import convert_project
+from tapaconverter.common import read_source
+
+# the incremental converters kept by each worker
+MAX_CONVERTERS_PER_WORKER = 16
+
+# worker-local state, only accessed by the worker process that owns it
+CONVERTERS: 'OrderedDict[Tuple[str, str, str], IncrementalConverter]' = OrderedDict()
+
+
+def warm_up() -> None:
+  """
+  run in each worker once, so that the first request does not pay for the imports and the regex compilation
+  """
+  config = DesignConfig(num_tasks=2)
+  IncrementalConverter(config.top_name).convert(generate_design(config))
+
+
+def get_converter(filename: str, top_name: str, options: Dict[str, Any]) -> IncrementalConverter:
+  key = (os.path.abspath(filename), top_name, json.dumps(options, sort_keys=True))
+  if key in CONVERTERS:
+    CONVERTERS.move_to_end(key)
+  else:
+    CONVERTERS[key] = IncrementalConverter(top_name, **options)
+    while len(CONVERTERS) > MAX_CONVERTERS_PER_WORKER:
+      CONVERTERS.popitem(last=False)
+  return CONVERTERS[key]
+
+
+def serve_convert(request: Dict[str, Any]) -> Dict[str, Any]:
+  """
+  run in a worker process
+  """
+  start = time.perf_counter()
+  options = get_options(request.get('options', {}))
+  # a worker process cannot start its own pool
+  if options['analysis_workers'] > 1:
+    options['analysis_pool'] = 'thread'
+  top_names = request['top_name']
+  top_names = [top_names] if isinstance(top_names, str) else top_names
+
+  with profile() as profiler:
+    try:
+      if request.get('project'):
+        convert_project(request['project'], top_names[0], request['output_dir'], 1, **options)
+      elif len(top_names) == 1:
+        output = request['output'] if isinstance(request['output'], str) else request['output'][0]
+        converter = get_converter(request['filename'], top_names[0], options)
+        open(output, 'w').write(converter.convert(read_source(request['filename'])))
+      else:
+        convert_file(request['filename'], top_names, request['output'], **options)
+      error = None
+    except Exception:
+      error = traceback.format_exc()
+
+  return {
+    'success': error is None,
+    'error': error,
+    'elapsed': round(time.perf_counter() - start, 6),
+    'worker': os.getpid(),
+    'profile': profiler.to_dict(),
+  }
+
+
+class RequestHandler(socketserver.StreamRequestHandler):
+  def handle(self):
+    for line in self.rfile:
+      if not line.strip():
+        continue
+      try:
+        response = self.server.serve(json.loads(line))
+      except Exception:
+        response = {'success': False, 'error': traceback.format_exc()}
+      self.wfile.write(json.dumps(response).encode('utf-8') + b'\n')
+      self.wfile.flush()
+
+
+class DaemonMixin:
+  daemon_threads = True
+
+  def init_daemon(self, max_workers: int):
+    self.executor = ProcessPoolExecutor(max_workers=max_workers, initializer=warm_up)
+    # start and warm up all workers before the first request
+    for future in [self.executor.submit(os.getpid) for _ in range(max_workers)]:
+      future.result()
+    self.start_time = time.time()
+    self.request_count = 0
+    self.failure_count = 0
+    self.lock = threading.Lock()
+
+  def serve(self, request: Dict[str, Any]) -> Dict[str, Any]:
+    command = request.get('command', 'convert')
+    if command == 'ping':
+      return {'success': True, 'pid': os.getpid()}
+    elif command == 'stats':
+      with self.lock:
+        return {
+          'success': True,
+          'uptime': round(time.time() - self.start_time, 3),
+          'requests': self.request_count,
+          'failures': self.failure_count,
+        }
+    elif command == 'shutdown':
+      threading.Thread(target=self.shutdown).start()
+      return {'success': True}
+    elif command == 'convert':
+      response = self.executor.submit(serve_convert, request).result()
+      with self.lock:
+        self.request_count += 1
+        self.failure_count += not response['success']
+      return response
+    else:
+      return {'success': False, 'error': f'unknown command: {command}'}
+
+  def server_close(self):
+    super().server_close()
+    self.executor.shutdown()
+
+
+def is_socket_live(socket_path: str) -> bool:
+  """
+  whether a server accepts connections on the socket. A socket file left by a daemon that died is not live
+  """
+  with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+    try:
+      sock.connect(socket_path)
+    except (ConnectionRefusedError, FileNotFoundError):
+      return False
+  return True
+
+
+class UnixDaemon(DaemonMixin, socketserver.ThreadingUnixStreamServer):
+  def __init__(self, socket_path: str, max_workers: int):
+    if os.path.exists(socket_path):
+      if is_socket_live(socket_path):
+        raise OSError(errno.EADDRINUSE, f'another daemon is listening on {socket_path}')
+      os.remove(socket_path)
+    # the requests name the files to read and write, so only the user of the daemon may connect.
+    # The socket is created private rather than restricted after the bind
+    old_umask = os.umask(0o177)
+    try:
+      super().__init__(socket_path, RequestHandler)
+    finally:
+      os.umask(old_umask)
+    self.init_daemon(max_workers)
+    self.socket_path = socket_path
+
+  def server_close(self):
+    super().server_close()
+    if os.path.exists(self.socket_path):
+      os.remove(self.socket_path)
+
+
+def make_private_dir(dir_path: str) -> None:
+  """
+  create the dir of the default socket, accessible only to the current user.
+  An existing dir is used only if it is already private to the current user
+  """
+  try:
+    os.mkdir(dir_path, 0o700)
+  except FileExistsError:
+    pass
+  check_owner(dir_path, is_dir=True)
+
+
+def run_daemon(socket_path: Optional[str] = None, max_workers: Optional[int] = None) -> None:
+  if max_workers is None:
+    max_workers = get_available_cores()
+
+  if socket_path is None:
+    socket_path = DEFAULT_SOCKET_PATH
+    make_private_dir(os.path.dirname(socket_path))
+  server = UnixDaemon(socket_path, max_workers)
+  print(f'listening on {server.socket_path} with {max_workers} workers', flush=True)
+
+  try:
+    server.serve_forever()
+  except KeyboardInterrupt:
+    pass
+  finally:
+    server.server_close()
+
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser()
+  parser.add_argument('--socket', type=str, default=None, help=f'default to {DEFAULT_SOCKET_PATH}')
+  parser.add_argument('--workers', type=int, default=None, help='default to the available cores')
+  args = parser.parse_args()
+
+  try:
+    run_daemon(args.socket, args.workers)
+  except OSError as e:
+    if e.errno not in (errno.EADDRINUSE, errno.EACCES):
+      raise
+    print(e.strerror, file=sys.stderr)
+    sys.exit(1)
+  sys.exit(0)
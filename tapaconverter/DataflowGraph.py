@@ -0,0 +1,289 @@
+# the dataflow graph of the top function
+# - each invoked task is a node. A task invoked several times gets one node per invocation
+# - each stream is an edge from the task that writes it to the task that reads it,
+#   with the element type, the bit width of the element and the depth.
+#   The elements of a stream array, e.g. s[0], are edges of the array stream s
+# - the pointer params of the top are mmap ports, with the tasks that access them
+# the directions come from the converted code, i.e. the istream/ostream params of the tasks
+
+import json
+import re
+
+from collections import Counter
+from typing import *
+from pycparser import c_ast
+from tapaconverter.AnalyzeStreamDirectionByOperation import extract_functions
+from tapaconverter.SourceBuffer import SourceBuffer
+from tapaconverter.TraverseTopAST import (
+  GetPragmaVisitor,
+  GetStreamVisitor,
+  GetTapaFuncDefVisitor,
+  GetTaskVisitor,
+)
+
+__all__ = [
+  'DataflowGraph',
+  'build_dataflow_graph',
+]
+
+BUILTIN_TYPE_TO_WIDTH = {
+  'bool': 1,
+  'char': 8, 'signed char': 8, 'unsigned char': 8,
+  'short': 16, 'unsigned short': 16,
+  'int': 32, 'signed': 32, 'unsigned': 32, 'unsigned int': 32,
+  'long': 64, 'unsigned long': 64, 'long long': 64, 'unsigned long long': 64,
+  'half': 16, 'float': 32, 'double': 64,
+  'int8_t': 8, 'uint8_t': 8, 'int16_t': 16, 'uint16_t': 16,
+  'int32_t': 32, 'uint32_t': 32, 'int64_t': 64, 'uint64_t': 64,
+}
+
+# the first template argument of the arbitrary precision types is the total width
+AP_TYPE_WIDTH_PATTERN = re.compile(r'^(?:ap_u?int|ap_u?fixed)\s*<\s*(\d+)')
+MMAP_ELEM_TYPE_PATTERN = re.compile(r'tapa::mmap<(.*) >')
+# an element of a stream array passed to a task, e.g. s[0]
+ARRAY_REF_PATTERN = re.compile(r'^([A-Za-z_]\w*)\s*\[(.*)\]$')
+
+
+class TaskNode:
+  def __init__(self, name: str, task_name: str, arg_list: List[str]):
+    # unique among the nodes, e.g. "load[1]" for the second invocation of load
+    self.name = name
+    self.task_name = task_name
+    self.arg_list = arg_list
+
+  def to_dict(self) -> Dict[str, Any]:
+    return {'name': self.name, 'task_name': self.task_name, 'arg_list': self.arg_list}
+
+
+class StreamEdge:
+  def __init__(self, name: str, type: str, width: Optional[int], depth: Optional[int], depth_text: Optional[str]):
+    self.name = name
+    self.type = type
+    # None if the element type cannot be resolved, e.g. a struct
+    self.width = width
+    # None if there is no depth pragma or the depth is not a literal, e.g. a macro
+    self.depth = depth
+    self.depth_text = depth_text
+    self.producers: List[str] = []
+    self.consumers: List[str] = []
+    # the tasks that take the stream as a param of undetermined direction
+    self.unresolved: List[str] = []
+    # for a stream array, the index of the element each task accesses, e.g. "0" for s[0].
+    # The tasks that take the whole array are not included
+    self.task_to_index: Dict[str, str] = {}
+
+  def is_same_element(self, producer: str, consumer: str) -> bool:
+    """
+    whether the two tasks may access the same element. Only different literal indices are known to differ
+    """
+    producer_index = self.task_to_index.get(producer, '')
+    consumer_index = self.task_to_index.get(consumer, '')
+    return not (producer_index.isdigit() and consumer_index.isdigit() and int(producer_index) != int(consumer_index))
+
+  def get_endpoints(self) -> List[Tuple[str, str]]:
+    return [
+      (producer, consumer) for producer in self.producers for consumer in self.consumers
+      if self.is_same_element(producer, consumer)
+    ]
+
+  def to_dict(self) -> Dict[str, Any]:
+    return {
+      'name': self.name,
+      'type': self.type,
+      'width': self.width,
+      'depth': self.depth,
+      'depth_text': self.depth_text,
+      'producers': self.producers,
+      'consumers': self.consumers,
+      'unresolved': self.unresolved,
+      'task_to_index': self.task_to_index,
+    }
+
+
+class MmapPort:
+  def __init__(self, name: str, type: str, width: Optional[int]):
+    self.name = name
+    self.type = type
+    self.width = width
+    self.tasks: List[str] = []
+
+  def to_dict(self) -> Dict[str, Any]:
+    return {'name': self.name, 'type': self.type, 'width': self.width, 'tasks': self.tasks}
+
+
+class DataflowGraph:
+  def __init__(self, top_name: str):
+    self.top_name = top_name
+    self.task_list: List[TaskNode] = []
+    self.stream_list: List[StreamEdge] = []
+    self.mmap_port_list: List[MmapPort] = []
+    self.name_to_task: Dict[str, TaskNode] = {}
+    self.name_to_stream: Dict[str, StreamEdge] = {}
+
+  def add_task(self, task: TaskNode) -> None:
+    self.task_list.append(task)
+    self.name_to_task[task.name] = task
+
+  def add_stream(self, stream: StreamEdge) -> None:
+    self.stream_list.append(stream)
+    self.name_to_stream[stream.name] = stream
+
+  def get_edges(self) -> List[Tuple[str, str, StreamEdge]]:
+    """
+    (producer, consumer, stream) of all connected streams, in declaration order
+    """
+    return [
+      (producer, consumer, stream) for stream in self.stream_list for producer, consumer in stream.get_endpoints()
+    ]
+
+  def to_dict(self) -> Dict[str, Any]:
+    return {
+      'top_name': self.top_name,
+      'tasks': [task.to_dict() for task in self.task_list],
+      'streams': [stream.to_dict() for stream in self.stream_list],
+      'mmap_ports': [port.to_dict() for port in self.mmap_port_list],
+    }
+
+  def to_json(self) -> str:
+    return json.dumps(self.to_dict(), indent=2)
+
+  def to_dot(self) -> str:
+    buf = [f'digraph "{self.top_name}" {{', '  rankdir=LR;']
+    for task in self.task_list:
+      buf.append(f'  "{task.name}" [shape=box];')
+    for port in self.mmap_port_list:
+      buf.append(f'  "{port.name}" [shape=cylinder, label="{port.name}\\n{port.type}"];')
+      for task_name in port.tasks:
+        buf.append(f'  "{port.name}" -> "{task_name}" [dir=both, style=dashed];')
+
+    for producer, consumer, stream in self.get_edges():
+      width = f'{stream.width}b' if stream.width is not None else '?b'
+      depth = stream.depth_text if stream.depth_text is not None else '?'
+      buf.append(f'  "{producer}" -> "{consumer}" [label="{stream.name}\\n{stream.type} {width}, depth {depth}"];')
+
+    # the streams with a missing end are drawn from or to an empty point
+    for stream in self.stream_list:
+      if stream.producers and stream.consumers:
+        continue
+      buf.append(f'  "{stream.name}" [shape=point];')
+      for producer in stream.producers:
+        buf.append(f'  "{producer}" -> "{stream.name}" [label="{stream.name}", color=red];')
+      for consumer in stream.consumers:
+        buf.append(f'  "{stream.name}" -> "{consumer}" [label="{stream.name}", color=red];')
+      for task_name in stream.unresolved:
+        buf.append(f'  "{stream.name}" -> "{task_name}" [label="{stream.name}", color=red, style=dotted, dir=none];')
+
+    buf.append('}')
+    return '\n'.join(buf) + '\n'
+
+
+class GetTypeDefVisitor(c_ast.NodeVisitor):
+  """
+  the typedefs of plain types, e.g. typedef ap_uint<512> bus_t;
+  """
+  def __init__(self, ast: c_ast.FileAST):
+    self.type_def_to_type: Dict[str, str] = {}
+    self.visit(ast)
+
+  def visit_Typedef(self, node):
+    if isinstance(node.type, c_ast.TypeDecl) and isinstance(node.type.type, c_ast.IdentifierType):
+      self.type_def_to_type[node.name] = ' '.join(node.type.type.names)
+
+
+def get_type_width(type: str, type_def_to_type: Dict[str, str]) -> Optional[int]:
+  """
+  the bit width of a type. Return None if unknown
+  """
+  visited = set()
+  while type in type_def_to_type and type not in visited:
+    visited.add(type)
+    type = type_def_to_type[type]
+
+  type = ' '.join(type.replace('const ', '').split())
+  if type in BUILTIN_TYPE_TO_WIDTH:
+    return BUILTIN_TYPE_TO_WIDTH[type]
+  match = AP_TYPE_WIDTH_PATTERN.match(type)
+  return int(match.group(1)) if match else None
+
+
+def get_func_to_stream_dirs(tapa_cpp: str, func_names: Set[str]) -> Dict[str, List[Optional[str]]]:
+  """
+  func name -> the direction of each param. None for the non-stream params and the undetermined streams
+  """
+  return {
+    func.name: [param.get_stream_dir() for param in func.get_param_list()]
+    for func in extract_functions(SourceBuffer(tapa_cpp)) if func.name in func_names
+  }
+
+
+def get_task_node_names(task_names: List[str]) -> List[str]:
+  name_to_count = Counter(task_names)
+  name_to_index: Dict[str, int] = {}
+  node_names = []
+  for name in task_names:
+    if name_to_count[name] == 1:
+      node_names.append(name)
+    else:
+      index = name_to_index.get(name, 0)
+      name_to_index[name] = index + 1
+      node_names.append(f'{name}[{index}]')
+  return node_names
+
+
+def build_dataflow_graph(
+    ast: c_ast.FileAST,
+    top_name: str,
+    tapa_cpp: Optional[str] = None,
+    func_to_stream_dirs: Optional[Dict[str, List[Optional[str]]]] = None,
+) -> DataflowGraph:
+  """
+  ast is the ast of the top func. The stream directions of the tasks are taken from
+  tapa_cpp, the converted code, unless given by func_to_stream_dirs, e.g. for a multi-file project
+  """
+  type_def_to_type = GetTypeDefVisitor(ast).type_def_to_type
+  stream_to_type = GetStreamVisitor(ast).stream_to_type
+  stream_to_depth_text = {
+    pragma.kv_properties['variable']: pragma.kv_properties.get('depth')
+    for pragma in GetPragmaVisitor(ast).pragma_list if pragma.name == 'stream' and 'variable' in pragma.kv_properties
+  }
+  mmap_arg_to_type = GetTapaFuncDefVisitor(ast).mmap_arg_to_type
+  task_list = GetTaskVisitor(ast).task_list
+
+  graph = DataflowGraph(top_name)
+  for name, type in stream_to_type.items():
+    depth_text = stream_to_depth_text.get(name)
+    depth = int(depth_text) if depth_text is not None and depth_text.isdigit() else None
+    graph.add_stream(StreamEdge(name, type, get_type_width(type, type_def_to_type), depth, depth_text))
+
+  name_to_port = {}
+  for name, type in mmap_arg_to_type.items():
+    elem_type = MMAP_ELEM_TYPE_PATTERN.search(type).group(1)
+    name_to_port[name] = MmapPort(name, elem_type, get_type_width(elem_type, type_def_to_type))
+  graph.mmap_port_list = list(name_to_port.values())
+
+  if func_to_stream_dirs is None:
+    func_to_stream_dirs = get_func_to_stream_dirs(tapa_cpp, {task.task_name for task in task_list})
+  node_names = get_task_node_names([task.task_name for task in task_list])
+  for node_name, task in zip(node_names, task_list):
+    graph.add_task(TaskNode(node_name, task.task_name, task.arg_list))
+    stream_dirs = func_to_stream_dirs.get(task.task_name, [])
+    for i, arg in enumerate(task.arg_list):
+      if arg in name_to_port:
+        name_to_port[arg].tasks.append(node_name)
+      array_ref_match = ARRAY_REF_PATTERN.match(arg)
+      if arg in graph.name_to_stream:
+        stream = graph.name_to_stream[arg]
+      elif array_ref_match and array_ref_match.group(1) in graph.name_to_stream:
+        stream = graph.name_to_stream[array_ref_match.group(1)]
+        stream.task_to_index[node_name] = array_ref_match.group(2).strip()
+      else:
+        continue
+      stream_dir = stream_dirs[i] if i < len(stream_dirs) else None
+      if stream_dir == 'ostream':
+        stream.producers.append(node_name)
+      elif stream_dir == 'istream':
+        stream.consumers.append(node_name)
+      else:
+        stream.unresolved.append(node_name)
+
+  return graph
@@ -1,25 +1,390 @@
-import os
+# built-in formatter equivalent to running astyle with
+#   --delete-empty-lines --align-reference=type --align-pointer=type
+#   --convert-tabs --unpad-paren --pad-paren-in
+# on top of the default astyle layout:
+# - 4-space indentation by block. Namespaces are not indented, case labels,
+#   access labels and goto labels are one level out, preprocessor lines are at column 0
+# - no space before a comma
+# - one statement per line, and a label is broken from the statement after it.
+#   A block that is not empty is broken after "{" and before "}"
+# - the body of an if, else, for, while or do without braces is indented one level.
+#   If the body is on the line of the header, its continuation lines are indented one more level
+# - continuation lines are aligned after the innermost open paren, or after the
+#   "=" or the "return" of the statement
+# - * and & are attached to the type only after the words astyle takes as a type,
+#   so expressions such as (a & b) or a * b are left alone
+
 import re
 
-def format_output(filename):
-  options = [
-    "--delete-empty-lines",
-    "--align-reference=type",
-    "--align-pointer=type",
-    "--convert-tabs",
-    "--unpad-paren",
-    "--pad-paren-in",
-  ]
-  command = 'astyle ' + ' '.join(options) + ' ' + filename
-  os.system(command)
-  os.system(f'rm {filename}.orig')
+from collections import deque
+from typing import *
+from tapaconverter.Profile import count, stage
+
+INDENT_WIDTH = 4
+TAB_SIZE = 4
+# the least indentation of the continuation lines of a header, e.g. an if with a multi-line condition
+MIN_CONDITIONAL_INDENT = 2 * INDENT_WIDTH
+
+# string literals and comments are never modified
+NON_CODE_PATTERN = re.compile(r'"(?:\\.|[^\\"])*"|\'(?:\\.|[^\\\'])*\'|//.*$|/\*.*?(?:\*/|$)')
+
+# astyle only attaches * and & to the word before them if the word is one of these types,
+# or a name of at least 6 chars ending in _t, e.g. data_t or uint32_t
+POINTER_TYPE_WORDS = {'char', 'int', 'void', 'long', 'short', 'float', 'double', 'String', 'NSString'}
+POINTER_PATTERN = re.compile(r'\b(?P<word>[A-Za-z_]\w*)[ \t]*(?P<op>\*+|&)(?![&=])[ \t]*(?=[^ \t*&\d!~=]|$)')
+
+# the outer padding of a paren is removed after a name, a paren, a bracket, ~ or !
+UNPAD_PAREN_PATTERN = re.compile(r'(?<=[\w)\]\[~!])[ \t]+\(')
+# except after the keywords that astyle does not take as a function name
+UNPAD_PAREN_EXCLUDED_PATTERN = re.compile(r'\breturn$')
+
+# the spaces before a comma are removed, except the indentation of a line that starts with it
+UNPAD_COMMA_PATTERN = re.compile(r'(?<=\S)[ \t]+,')
+
+CASE_LABEL_PATTERN = re.compile(r'(case\b.*|default\s*):')
+# goto labels and access labels, e.g. public:
+LABEL_PATTERN = re.compile(r'[A-Za-z_]\w*\s*:$')
+# a case label, a goto label or an access label at the start of a statement
+LABEL_PREFIX_PATTERN = re.compile(r'\s*(?:case\b(?:[^:;]|::)*|[A-Za-z_]\w*\s*):(?!:)')
+# the statements whose body may be a single statement without braces
+HEADER_PATTERN = re.compile(r'(?:\}\s*)?(?:else\b\s*)?(?:if|for|while|switch)\b')
+ELSE_DO_PATTERN = re.compile(r'(?:\}\s*)?(?:else|do)\b')
+TEMPLATE_PATTERN = re.compile(r'template\b.*>$')
+RETURN_PATTERN = re.compile(r'return\b\s*')
+CLASS_PATTERN = re.compile(r'(?:typedef\s+)?(?:struct|class|union)\b')
+NAMESPACE_PATTERN = re.compile(r'namespace\b')
+ENUM_PATTERN = re.compile(r'(?:typedef\s+)?enum\b')
+
+# the kinds of a brace block. Empty lines are only deleted in function blocks
+FUNC_BLOCK = 'func'
+CLASS_BLOCK = 'class'
+NAMESPACE_BLOCK = 'namespace'
+
+
+def mask_non_code(line: str) -> str:
+  """
+  blank out the comments and fill the literals with "\0", keeping the columns of the code
+  """
+  def replacer(match):
+    text = match.group()
+    return ' ' * len(text) if text.startswith('/') else '\0' * len(text)
+  return NON_CODE_PATTERN.sub(replacer, line)
+
+
+def is_in_block_comment_after(line: str) -> bool:
+  """
+  whether the line opens a block comment that continues on the next line
+  """
+  is_open = False
+  for match in NON_CODE_PATTERN.finditer(line):
+    text = match.group()
+    is_open = text.startswith('/*') and (len(text) < 4 or not text.endswith('*/'))
+  return is_open
+
+
+def align_pointer(code: str) -> str:
+  """
+  attach * and & to the type, e.g. "int * a" -> "int* a"
+  """
+  def replacer(match):
+    word = match.group('word')
+    if word not in POINTER_TYPE_WORDS and not (len(word) >= 6 and word.endswith('_t')):
+      return match.group()
+    end = match.end()
+    space = ' ' if end < len(code) and (code[end].isalnum() or code[end] == '_') else ''
+    return f'{word}{match.group("op")}{space}'
+
+  return POINTER_PATTERN.sub(replacer, code)
+
+
+def pad_paren(code: str) -> str:
+  """
+  remove the padding outside the parens and keep exactly one space inside
+  """
+  def unpad(match):
+    if UNPAD_PAREN_EXCLUDED_PATTERN.search(match.string, 0, match.start()):
+      return match.group()
+    return '('
+
+  code = UNPAD_PAREN_PATTERN.sub(unpad, code)
+  code = re.sub(r'\([ \t]+(?=[^ \t)])', '(', code)
+  code = re.sub(r'(?<=[^ \t(])[ \t]+\)', ')', code)
+  code = re.sub(r'\([ \t]+\)', '( )', code)
+  code = re.sub(r'\((?=[^)\s])', '( ', code)
+  code = re.sub(r'(?<=[^(\s])\)', ' )', code)
+  return code
+
+
+def format_line(line: str) -> str:
+  """
+  the literals and comments are replaced by "\0" while the code is formatted
+  """
+  non_code_list = []
+
+  def mask(match):
+    non_code_list.append(match.group())
+    return '\0'
+
+  code = pad_paren(align_pointer(NON_CODE_PATTERN.sub(mask, line)))
+  code = UNPAD_COMMA_PATTERN.sub(',', code)
+  non_code_iter = iter(non_code_list)
+  return re.sub('\0', lambda _: next(non_code_iter), code).rstrip()
+
+
+def is_init_brace(prev_char: str, is_in_paren: bool, statement: str) -> bool:
+  """
+  the braces of an initializer or an enum are aligned like parens instead of opening a block
+  """
+  return is_in_paren or prev_char in ('=', ',') or bool(ENUM_PATTERN.match(statement))
+
+
+def find_split(code: str, paren_depth: int, prev_char: str, statement: str) -> int:
+  """
+  the index to break a masked line at, so that each statement and each brace of a
+  block that is not empty gets its own line, as well as the closing brace of a
+  multi-line initializer. -1 if the line is not broken
+  """
+  # a label at the start of a statement, the comments after it stay on its line
+  match = LABEL_PREFIX_PATTERN.match(code) if not statement and not paren_depth else None
+  if match:
+    rest = code[match.end():]
+    if rest.strip() and rest.lstrip()[0] != '{':
+      return len(code) - len(rest.lstrip())
+
+  line_start_depth = paren_depth
+  for i, char in enumerate(code):
+    if char in '([':
+      paren_depth += 1
+    elif char == '{':
+      if is_init_brace(prev_char, paren_depth > 0, statement or code):
+        paren_depth += 1
+      else:
+        rest = code[i + 1:].strip()
+        if rest and rest[0] != '}':
+          return i + 1
+    elif char in ')]}':
+      if paren_depth:
+        if char == '}' and paren_depth <= line_start_depth and code[:i].strip():
+          return i
+        paren_depth -= 1
+      elif char == '}' and prev_char != '{' and code[:i].strip():
+        return i
+    elif char == ';' and not paren_depth and code[i + 1:].strip():
+      return i + 1
+
+    if not char.isspace():
+      prev_char = char
+
+  return -1
 
+
+def get_continuation_column(code: str, column: int) -> int:
+  """
+  the column of the continuation lines of a statement that starts with code.
+  Aligned after the first "=" or the "return", otherwise at the statement
+  """
+  depth = 0
+  for i, char in enumerate(code):
+    if char in '([{':
+      depth += 1
+    elif char in ')]}':
+      depth -= 1
+    elif (char == '=' and depth == 0 and code[i + 1:i + 2] != '='
+          and (i == 0 or code[i - 1] not in '=!<>')):
+      rest = code[i + 1:]
+      if not rest.strip():
+        return column + INDENT_WIDTH
+      return column + len(code) - len(rest.lstrip())
+
+  match = RETURN_PATTERN.match(code)
+  if match and code[match.end():].strip():
+    return column + match.end()
+  return column
+
+
+def get_body_start(code: str) -> int:
+  """
+  the index of the body of an if, for, while, else or do that is on the same line as the header.
+  -1 if the line has no such body
+  """
+  match = HEADER_PATTERN.match(code)
+  if match:
+    depth = 0
+    body_start = -1
+    for i in range(match.end(), len(code)):
+      if code[i] in '([':
+        depth += 1
+      elif code[i] in ')]':
+        depth -= 1
+        if not depth:
+          body_start = i + 1
+          break
+  else:
+    match = ELSE_DO_PATTERN.match(code)
+    body_start = match.end() if match else -1
+
+  if body_start < 0 or not code[body_start:].strip() or code[body_start:].lstrip()[0] == '{':
+    return -1
+  return body_start
+
+
+def get_block_kind(statement: str) -> str:
+  if CLASS_PATTERN.match(statement):
+    return CLASS_BLOCK
+  if NAMESPACE_PATTERN.match(statement):
+    return NAMESPACE_BLOCK
+  return FUNC_BLOCK
+
+
+def indent_source(contents: str) -> str:
+  formatted_lines = []
+
+  # for each open paren or initializer brace, (column of the continuation lines, column of a closing line)
+  paren_stack: List[Tuple[int, int]] = []
+  # for each open block, (kind, level of the opening line, level of the content)
+  block_stack: List[Tuple[str, int, int]] = []
+  # the single-statement bodies to indent the next statement for
+  header_count = 0
+  is_statement_start = True
+  # the first line of the current statement
+  statement = ''
+  statement_level = 0
+  continuation_column = 0
+  # the index of the body in the line of its header, whose continuation lines are indented one more level
+  body_start = -1
+  last_code_char = ''
+  is_in_block_comment = False
+  is_in_macro = False
+  # the shift of the first line of the current block comment
+  comment_shift = 0
+
+  lines = deque(contents.expandtabs(TAB_SIZE).split('\n'))
+  while lines:
+    raw_line = lines.popleft()
+    line = raw_line.strip()
+
+    if is_in_block_comment:
+      indent = len(raw_line) - len(raw_line.lstrip())
+      shift = max(comment_shift, -indent)
+      formatted_lines.append(' ' * (indent + shift) + raw_line.lstrip() if line else '')
+      is_in_block_comment = '*/' not in line
+      continue
+
+    if is_in_macro or line.startswith('#'):
+      formatted_lines.append(raw_line.rstrip() if is_in_macro else line)
+      is_in_macro = line.endswith('\\')
+      continue
+
+    if not line:
+      # only keep the empty lines outside of functions
+      if not paren_stack and all(kind != FUNC_BLOCK for kind, _, _ in block_stack):
+        formatted_lines.append('')
+      continue
+
+    split_index = find_split(
+      mask_non_code(line), len(paren_stack), last_code_char, '' if is_statement_start else statement)
+    if split_index >= 0:
+      lines.appendleft(line[split_index:])
+      line = line[:split_index]
+
+    line = format_line(line)
+    code = mask_non_code(line)
+    stripped_code = code.strip()
+
+    # determine the indentation of this line
+    body_start = -1
+    content_level = block_stack[-1][2] if block_stack else 0
+    if paren_stack:
+      align_column, close_column = paren_stack[-1]
+      column = close_column if stripped_code[:1] in (')', '}') else align_column
+    elif not stripped_code:
+      # a comment line does not change the statement
+      column = (content_level + header_count) * INDENT_WIDTH if is_statement_start else continuation_column
+    elif is_statement_start:
+      statement = stripped_code
+      level = content_level + header_count
+      if stripped_code.startswith('}') and block_stack:
+        level = block_stack[-1][1]
+      elif stripped_code.startswith('{') and header_count:
+        level -= 1
+      elif CASE_LABEL_PATTERN.match(line) or LABEL_PATTERN.match(line):
+        level -= 1
+      statement_level = max(level, 0)
+      column = statement_level * INDENT_WIDTH
+      continuation_column = get_continuation_column(code, column)
+      body_start = get_body_start(code)
+      if body_start >= 0:
+        continuation_column += INDENT_WIDTH
+    else:
+      column = continuation_column
+
+    formatted_lines.append(' ' * column + line)
+
+    if is_in_block_comment_after(line):
+      is_in_block_comment = True
+      comment_shift = column - (len(raw_line) - len(raw_line.lstrip()))
+    if not stripped_code:
+      continue
+
+    # update the state after this line
+    for i, char in enumerate(code):
+      if char in '([' or (char == '{' and is_init_brace(last_code_char, bool(paren_stack), statement)):
+        rest = code[i + 1:]
+        shift = INDENT_WIDTH if 0 <= body_start <= i else 0
+        if rest.strip():
+          align_column = column + len(code) - len(rest.lstrip())
+          # the condition of a multi-line header is kept clear of the body
+          if not paren_stack and HEADER_PATTERN.match(statement):
+            align_column = max(align_column, statement_level * INDENT_WIDTH + MIN_CONDITIONAL_INDENT)
+          paren_stack.append((align_column + shift, column + i + shift))
+        else:
+          paren_stack.append((column + INDENT_WIDTH + shift, column + shift))
+      elif char == '{':
+        kind = get_block_kind(statement)
+        content_level = statement_level if kind == NAMESPACE_BLOCK else statement_level + 1
+        block_stack.append((kind, statement_level, content_level))
+        header_count = 0
+      elif char in ')]}':
+        if paren_stack:
+          paren_stack.pop()
+        elif char == '}' and block_stack:
+          block_stack.pop()
+          header_count = 0
+      if not char.isspace():
+        last_code_char = char
+
+    if paren_stack:
+      is_statement_start = False
+    elif last_code_char in (';', '{', '}'):
+      is_statement_start = True
+      if last_code_char == ';':
+        header_count = 0
+    elif ((last_code_char == ')' and HEADER_PATTERN.match(statement))
+          or ELSE_DO_PATTERN.fullmatch(stripped_code)):
+      is_statement_start = True
+      header_count += 1
+    else:
+      # a template header or a label is a complete line, anything else continues
+      is_statement_start = bool(TEMPLATE_PATTERN.match(stripped_code)) or last_code_char == ':'
+
+  return '\n'.join(formatted_lines)
+
+
+def format_source(contents: str) -> str:
+  with stage('format_output'):
+    contents = indent_source(contents)
+
+    # remove extra spaces
+    contents = re.sub(r'(\S ) +', r'\1', contents)
+
+    # remove extra empty lines
+    contents = re.sub(r'(\n\n)\n+', r'\n\n', contents)
+
+  count('formatted_lines', contents.count('\n') + 1)
+  count('bytes_scanned', len(contents))
+  return contents
+
+
+def format_output(filename):
   contents = open(filename, 'r').read()
-  
-  # remove extra spaces
-  contents = re.sub(r'(\S ) +', r'\1', contents)
-
-  # remove extra empty lines
-  contents = re.sub(r'(\n\n)\n+', r'\n\n', contents)
-  
-  open(filename, 'w').write(contents)
\ No newline at end of file
+  open(filename, 'w').write(format_source(contents))
@@ -0,0 +1,159 @@
+# generate synthetic Vitis HLS dataflow designs for benchmarking
+# the tasks form a chain: the first task loads from the input mmap ports,
+# the last task stores to the output mmap ports, and every pair of adjacent
+# tasks is connected by a number of parallel streams (lanes).
+# Each compute task may be wrapped in several levels of hierarchical functions
+# so that stream directions have to be propagated through the call graph
+
+from typing import *
+
+
+class DesignConfig:
+  def __init__(
+      self,
+      num_tasks: int = 8,
+      num_lanes: int = 1,
+      num_depth_pragmas: Optional[int] = None,
+      num_mmaps: int = 2,
+      num_template_types: int = 1,
+      hier_depth: int = 0,
+      top_name: str = 'top',
+  ):
+    assert num_tasks >= 2, f'need at least a load task and a store task'
+    assert num_mmaps >= 2, f'need at least one input port and one output port'
+    assert num_lanes >= 1 and num_template_types >= 1 and hier_depth >= 0
+    self.num_tasks = num_tasks
+    self.num_lanes = num_lanes
+    self.num_depth_pragmas = num_depth_pragmas
+    self.num_mmaps = num_mmaps
+    self.num_template_types = num_template_types
+    self.hier_depth = hier_depth
+    self.top_name = top_name
+
+  @property
+  def num_streams(self) -> int:
+    return self.num_lanes * (self.num_tasks - 1)
+
+  def to_dict(self) -> Dict[str, Any]:
+    return {
+      'num_tasks': self.num_tasks,
+      'num_lanes': self.num_lanes,
+      'num_streams': self.num_streams,
+      'num_depth_pragmas': self.num_streams if self.num_depth_pragmas is None else self.num_depth_pragmas,
+      'num_mmaps': self.num_mmaps,
+      'num_template_types': self.num_template_types,
+      'hier_depth': self.hier_depth,
+    }
+
+
+def get_stream_name(edge: int, lane: int) -> str:
+  return f's_{edge}_{lane}'
+
+
+def get_elem_type(config: DesignConfig, edge: int, lane: int) -> str:
+  return f'ap_uint<{8 * (1 + (edge * config.num_lanes + lane) % config.num_template_types)}>'
+
+
+def get_task_name(task: int, level: int) -> str:
+  """
+  level 0 is the leaf that operates the streams
+  """
+  return f'task_{task}' if level == 0 else f'task_{task}_hier_{level}'
+
+
+def get_task_params(config: DesignConfig, task: int, in_ports: List[str], out_ports: List[str]) -> List[str]:
+  param_list = []
+  if task > 0:
+    param_list += [
+      f'hls::stream<{get_elem_type(config, task-1, lane)} >& in_{lane}' for lane in range(config.num_lanes)]
+  if task < config.num_tasks - 1:
+    param_list += [
+      f'hls::stream<{get_elem_type(config, task, lane)} >& out_{lane}' for lane in range(config.num_lanes)]
+  param_list += [f'data_t* {port}' for port in in_ports + out_ports]
+  param_list.append('int n')
+  return param_list
+
+
+def get_task_args(config: DesignConfig, task: int, in_ports: List[str], out_ports: List[str]) -> List[str]:
+  arg_list = []
+  if task > 0:
+    arg_list += [f'in_{lane}' for lane in range(config.num_lanes)]
+  if task < config.num_tasks - 1:
+    arg_list += [f'out_{lane}' for lane in range(config.num_lanes)]
+  return arg_list + in_ports + out_ports + ['n']
+
+
+def get_leaf_body(config: DesignConfig, task: int, in_ports: List[str], out_ports: List[str]) -> List[str]:
+  body = [
+    '  for (int i = 0; i < n; i++) {',
+    '#pragma HLS pipeline II=1',
+    '    data_t acc = 0;',
+  ]
+  for port in in_ports:
+    body.append(f'    acc += {port}[i];')
+  if task > 0:
+    for lane in range(config.num_lanes):
+      body.append(f'    acc += in_{lane}.read();')
+  if task < config.num_tasks - 1:
+    for lane in range(config.num_lanes):
+      body.append(f'    out_{lane}.write(acc + {lane});')
+  for port in out_ports:
+    body.append(f'    {port}[i] = acc;')
+  body.append('  }')
+  return body
+
+
+def generate_design(config: DesignConfig) -> str:
+  num_in_ports = config.num_mmaps // 2
+  in_ports = [f'mem_in_{i}' for i in range(num_in_ports)]
+  out_ports = [f'mem_out_{i}' for i in range(config.num_mmaps - num_in_ports)]
+  task_to_in_ports = lambda task: in_ports if task == 0 else []
+  task_to_out_ports = lambda task: out_ports if task == config.num_tasks - 1 else []
+
+  buf = [
+    '#include <hls_stream.h>',
+    '#include <ap_int.h>',
+    '',
+    'typedef ap_uint<64> data_t;',
+    '',
+  ]
+
+  for task in range(config.num_tasks):
+    task_in_ports, task_out_ports = task_to_in_ports(task), task_to_out_ports(task)
+    params = ', '.join(get_task_params(config, task, task_in_ports, task_out_ports))
+    args = ', '.join(get_task_args(config, task, task_in_ports, task_out_ports))
+
+    buf.append(f'void {get_task_name(task, 0)}({params}) {{')
+    buf += get_leaf_body(config, task, task_in_ports, task_out_ports)
+    buf += ['}', '']
+
+    for level in range(1, config.hier_depth + 1):
+      buf.append(f'void {get_task_name(task, level)}({params}) {{')
+      buf.append(f'  {get_task_name(task, level-1)}({args});')
+      buf += ['}', '']
+
+  # the top function
+  top_params = ', '.join([f'data_t* {port}' for port in in_ports + out_ports] + ['int n'])
+  buf.append(f'void {config.top_name}({top_params}) {{')
+
+  for edge in range(config.num_tasks - 1):
+    for lane in range(config.num_lanes):
+      buf.append(f'  hls::stream<{get_elem_type(config, edge, lane)} > {get_stream_name(edge, lane)};')
+
+  num_depth_pragmas = config.num_streams if config.num_depth_pragmas is None else config.num_depth_pragmas
+  for i in range(min(num_depth_pragmas, config.num_streams)):
+    edge, lane = divmod(i, config.num_lanes)
+    buf.append(f'#pragma HLS stream variable={get_stream_name(edge, lane)} depth={2 ** (1 + i % 6)}')
+  buf.append('#pragma HLS dataflow')
+
+  for task in range(config.num_tasks):
+    arg_list = []
+    if task > 0:
+      arg_list += [get_stream_name(task-1, lane) for lane in range(config.num_lanes)]
+    if task < config.num_tasks - 1:
+      arg_list += [get_stream_name(task, lane) for lane in range(config.num_lanes)]
+    arg_list += task_to_in_ports(task) + task_to_out_ports(task) + ['n']
+    buf.append(f'  {get_task_name(task, config.hier_depth)}({", ".join(arg_list)});')
+
+  buf += ['}', '']
+  return '\n'.join(buf)
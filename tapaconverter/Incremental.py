@@ -0,0 +1,209 @@
+# re-convert a design after small edits by reusing the analysis of the previous run
+# - the ast of the top func is reused if the top func and the typedefs are unchanged
+# - each function is identified by the hash of its text. Only the changed functions
+#   and their transitive callers are analyzed again. The other functions get their
+#   stream params from the saved state
+# - the call sites of unchanged functions are reused if no function is added or removed
+# - the brace index of the source is updated from the previous version instead of rebuilt
+
+import hashlib
+import logging
+import os
+import pickle
+import time
+
+from typing import *
+from tapaconverter.AnalyzeStreamDirectionByOperation import extract_functions, update_stream_dir_by_operation, Func
+from tapaconverter.AnalyzeStreamDirectionByFuncCall import (
+  FuncCall,
+  StreamDirectionSolver,
+  get_func_call_pattern,
+  get_func_calls,
+)
+from tapaconverter.BraceIndex import BraceIndex, get_brace_index
+from tapaconverter.Cache import get_output_options
+from tapaconverter.Convert import get_options, size_top_streams
+from tapaconverter.Formatter import format_source
+from tapaconverter.ParseTop import add_type_defs, get_top_ast_from_source, get_top_func
+from tapaconverter.Profile import count, stage
+from tapaconverter.SourceBuffer import SourceBuffer
+from tapaconverter.TraverseTopAST import get_tapa_init_version_from_source
+from tapaconverter.common import CONVERTER_VERSION, read_source
+
+
+def get_hash(text: str) -> str:
+  return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def get_call_sites(func_call_list: List[FuncCall]) -> List[Tuple[str, List[str]]]:
+  return [(func_call.name, func_call.caller_arg_list) for func_call in func_call_list]
+
+
+class FuncState:
+  """
+  the analysis result of one function in the previous run
+  """
+  def __init__(self, text_hash: str, param_types: Dict[str, str], call_sites: List[Tuple[str, List[str]]]):
+    self.text_hash = text_hash
+    self.param_types = param_types
+    self.call_sites = call_sites
+
+
+class IncrementalConverter:
+  def __init__(self, top_name: str, **options):
+    self.top_name = top_name
+    self.options = get_options(options)
+    self.top_hash: Optional[str] = None
+    self.top_ast = None
+    self.name_to_state: Dict[str, FuncState] = {}
+    self.brace_index: Optional[BraceIndex] = None
+
+  def __getstate__(self):
+    # the brace index holds the whole source, it is cheap to rebuild
+    state = self.__dict__.copy()
+    state['brace_index'] = None
+    return state
+
+  def get_top_ast(self, source: str):
+    top_hash = get_hash(add_type_defs(get_top_func(source, self.top_name), source))
+    if top_hash != self.top_hash:
+      self.top_ast = get_top_ast_from_source(source, self.top_name, self.options['use_cpp'])
+      self.top_hash = top_hash
+    else:
+      count('reused_top_ast')
+    return self.top_ast
+
+  def get_func_to_func_calls(self, func_list: List[Func], dirty_funcs: Set[Func]) -> Dict[Func, List[FuncCall]]:
+    name_to_func = {func.name: func for func in func_list}
+    is_same_func_set = set(name_to_func) == set(self.name_to_state)
+    func_call_pattern = get_func_call_pattern(name_to_func.keys())
+
+    func_to_func_calls = {}
+    for func in func_list:
+      if is_same_func_set and func not in dirty_funcs:
+        func_to_func_calls[func] = [
+          FuncCall(callee_name, func, name_to_func[callee_name], arg_list)
+          for callee_name, arg_list in self.name_to_state[func.name].call_sites
+        ]
+      else:
+        func_to_func_calls[func] = get_func_calls(func, name_to_func, func_call_pattern)
+    return func_to_func_calls
+
+  def update_stream_directions(self, init_version: str) -> str:
+    buffer = SourceBuffer(init_version)
+    func_list = [
+      func for func in extract_functions(buffer, self.options['analysis_workers'], self.options['analysis_pool'])
+      if func.name != self.top_name
+    ]
+    func_to_hash = {func: get_hash(buffer.text[func.func_range[0]:func.func_range[1]]) for func in func_list}
+
+    dirty_funcs = {
+      func for func in func_list
+      if func.name not in self.name_to_state or self.name_to_state[func.name].text_hash != func_to_hash[func]
+    }
+
+    func_to_func_calls = self.get_func_to_func_calls(func_list, dirty_funcs)
+    # an unchanged function is also dirty if its calls changed because a callee was added or removed
+    dirty_funcs |= {
+      func for func in func_list
+      if func.name in self.name_to_state
+      and self.name_to_state[func.name].call_sites != get_call_sites(func_to_func_calls[func])
+    }
+
+    solver = StreamDirectionSolver(func_list, func_to_func_calls)
+    affected_funcs = solver.get_transitive_callers(dirty_funcs)
+    count('reanalyzed_functions', len(affected_funcs))
+    count('reused_functions', len(func_list) - len(affected_funcs))
+
+    for func in func_list:
+      if func in affected_funcs:
+        update_stream_dir_by_operation(func)
+      else:
+        for param_name, param_type in self.name_to_state[func.name].param_types.items():
+          func.check_and_update_param_type_by_name(param_name, param_type)
+
+    solver.solve(affected_funcs)
+
+    self.name_to_state = {
+      func.name: FuncState(
+        func_to_hash[func],
+        {param.param_name: param.param_type for param in func.get_stream_param_list()},
+        get_call_sites(solver.func_to_func_calls[func]),
+      )
+      for func in func_list
+    }
+
+    return buffer.materialize()
+
+  def convert(self, source: str) -> str:
+    with stage('incremental_convert'):
+      self.brace_index = get_brace_index(source, self.brace_index)
+      ast = self.get_top_ast(source)
+      tapa_cpp = get_tapa_init_version_from_source(source, self.top_name, ast=ast)
+      with stage('update_stream_directions'):
+        tapa_cpp = self.update_stream_directions(tapa_cpp)
+      if self.options['size_fifos']:
+        tapa_cpp, _ = size_top_streams(tapa_cpp, self.top_name, ast, self.options)
+      if self.options['format']:
+        tapa_cpp = format_source(tapa_cpp)
+    return tapa_cpp
+
+  def save(self, state_path: str) -> None:
+    with open(state_path, 'wb') as f:
+      pickle.dump((CONVERTER_VERSION, self), f)
+
+  @staticmethod
+  def load(state_path: str, top_name: str, **options) -> 'IncrementalConverter':
+    """
+    start from scratch if there is no usable state for the same top and options.
+    The workers of the analysis do not change the state, so a state saved with other workers is reused
+    """
+    converter = IncrementalConverter(top_name, **options)
+    try:
+      with open(state_path, 'rb') as f:
+        version, saved = pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError, ValueError, AttributeError):
+      return converter
+
+    is_same_options = get_output_options(saved.options) == get_output_options(converter.options)
+    if version == CONVERTER_VERSION and saved.top_name == top_name and is_same_options:
+      saved.options = converter.options
+      return saved
+    return converter
+
+
+def watch(
+    filename: str,
+    top_name: str,
+    output: str,
+    interval: float = 0.5,
+    state_path: Optional[str] = None,
+    **options,
+) -> None:
+  """
+  re-convert whenever the file is modified, until interrupted
+  """
+  if state_path:
+    converter = IncrementalConverter.load(state_path, top_name, **options)
+  else:
+    converter = IncrementalConverter(top_name, **options)
+
+  last_mtime = None
+  while True:
+    try:
+      mtime = os.stat(filename).st_mtime_ns
+    except FileNotFoundError:
+      mtime = None
+
+    if mtime is not None and mtime != last_mtime:
+      last_mtime = mtime
+      start = time.perf_counter()
+      try:
+        open(output, 'w').write(converter.convert(read_source(filename)))
+        if state_path:
+          converter.save(state_path)
+        print(f'converted {filename} in {time.perf_counter() - start:.3f}s', flush=True)
+      except Exception as e:
+        logging.error(f'fail to convert {filename}: {e!r}')
+
+    time.sleep(interval)
@@ -0,0 +1,178 @@
+# index all function definitions of a file in one linear pass
+# comments, string literals and preprocessor lines are skipped by the lexer
+# braces of namespaces and extern "C" blocks are transparent
+# braces of structs and classes are opaque, i.e. methods are not indexed
+
+import logging
+import re
+
+from typing import *
+from tapaconverter.Profile import count
+
+TOKEN_PATTERN = re.compile(r'''
+    (?P<comment>//[^\n]*|/\*.*?\*/)
+  | (?P<string>"(?:\\.|[^\\"\n])*"|'(?:\\.|[^\\'\n])*')
+  | (?P<preprocessor>^[ \t]*\#(?:\\\n|[^\n])*)
+  | (?P<identifier>[A-Za-z_]\w*(?:[ \t]*::[ \t]*~?[A-Za-z_]\w*)*)
+  | (?P<punct>[(){};])
+''', re.DOTALL | re.MULTILINE | re.VERBOSE)
+
+# identifiers followed by "(" that are never function names
+NON_FUNC_KEYWORDS = {
+  'if', 'for', 'while', 'switch', 'return', 'sizeof', 'decltype', 'alignof',
+  'static_assert', '__attribute__', '__declspec', 'catch',
+}
+
+# keywords that open a block whose content is still in the declaration scope
+TRANSPARENT_BLOCK_KEYWORDS = {'namespace', 'extern'}
+
+
+class FuncDef:
+  """
+  the location of a function in the source. All ranges are offsets.
+  func_range follows get_func_range: the end is the index of the closing "}"
+  """
+  def __init__(
+      self,
+      name: str,
+      return_type: str,
+      func_range: Tuple[int, int],
+      param_range: Tuple[int, int],
+      body_range: Optional[Tuple[int, int]],
+  ):
+    self.name = name
+    self.return_type = return_type
+    self.func_range = func_range
+    self.param_range = param_range
+    self.body_range = body_range
+
+  @property
+  def is_definition(self) -> bool:
+    """
+    False for a prototype
+    """
+    return self.body_range is not None
+
+
+def index_functions(raw_code: str) -> List[FuncDef]:
+  """
+  return the definitions and the prototypes in the declaration scope, in source order
+  """
+  func_def_list: List[FuncDef] = []
+
+  depth = 0
+  paren_depth = 0
+  transparent_depths: List[int] = []
+  decl_begin = 0
+  prev_token = None
+  is_transparent_pending = False
+
+  # name, name begin, param begin, param end
+  candidate: Optional[list] = None
+
+  # the function whose body is being skipped: candidate + body begin
+  curr_body: Optional[tuple] = None
+
+  for match in TOKEN_PATTERN.finditer(raw_code):
+    kind = match.lastgroup
+    token = match.group()
+
+    if kind == 'string':
+      continue
+
+    # inside a function body, only track the braces
+    if curr_body is not None:
+      if token == '{':
+        depth += 1
+      elif token == '}':
+        depth -= 1
+        if depth == len(transparent_depths):
+          (name, name_begin, param_begin, param_end), body_begin = curr_body
+          return_type = ' '.join(raw_code[decl_begin:name_begin].split())
+          func_def_list.append(FuncDef(
+            name, return_type, (decl_begin, match.start()), (param_begin, param_end), (body_begin, match.start())))
+          curr_body = None
+          decl_begin = match.end()
+          prev_token = None
+      continue
+
+    is_in_scope = depth == len(transparent_depths)
+
+    if kind == 'comment' or kind == 'preprocessor':
+      # leading comments and macros are not part of the next declaration
+      if is_in_scope and not raw_code[decl_begin:match.start()].strip():
+        decl_begin = match.end()
+      continue
+
+    if not is_in_scope:
+      # inside a struct or class
+      if token == '{':
+        depth += 1
+      elif token == '}':
+        depth -= 1
+      continue
+
+    if kind == 'identifier':
+      if paren_depth == 0 and token in TRANSPARENT_BLOCK_KEYWORDS:
+        is_transparent_pending = True
+      prev_token = match
+      continue
+
+    if token == '(':
+      if paren_depth == 0 and prev_token is not None and prev_token.group() not in NON_FUNC_KEYWORDS:
+        candidate = [prev_token.group(), prev_token.start(), match.end(), None]
+      paren_depth += 1
+
+    elif token == ')':
+      paren_depth = max(paren_depth - 1, 0)
+      if paren_depth == 0 and candidate is not None and candidate[3] is None:
+        candidate[3] = match.start()
+
+    elif paren_depth > 0:
+      # braces and semicolons inside a param list, e.g. default values
+      pass
+
+    elif token == '{':
+      depth += 1
+      if is_transparent_pending and (candidate is None or candidate[3] is None):
+        transparent_depths.append(depth)
+        decl_begin = match.end()
+      elif candidate is not None and candidate[3] is not None:
+        curr_body = (candidate, match.start())
+      candidate = None
+      is_transparent_pending = False
+
+    elif token == '}':
+      if transparent_depths and transparent_depths[-1] == depth:
+        transparent_depths.pop()
+        decl_begin = match.end()
+      else:
+        logging.warning(f'unbalanced "}}" at offset {match.start()}')
+      depth = max(depth - 1, 0)
+      candidate = None
+
+    elif token == ';':
+      if candidate is not None and candidate[3] is not None:
+        name, name_begin, param_begin, param_end = candidate
+        return_type = ' '.join(raw_code[decl_begin:name_begin].split())
+        func_def_list.append(FuncDef(
+          name, return_type, (decl_begin, match.start()), (param_begin, param_end), None))
+      candidate = None
+      is_transparent_pending = False
+      decl_begin = match.end()
+
+    prev_token = None
+
+  count('regex_scans')
+
+  if curr_body is not None:
+    logging.error(f'missing "}}" in function {curr_body[0][0]}')
+
+  # skip the whitespaces before each declaration
+  for func_def in func_def_list:
+    decl_begin, decl_end = func_def.func_range
+    while decl_begin < decl_end and raw_code[decl_begin].isspace():
+      decl_begin += 1
+    func_def.func_range = (decl_begin, decl_end)
+
+  return func_def_list
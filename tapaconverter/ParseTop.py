@@ -1,14 +1,29 @@
+import importlib.util
 import logging
+import os
+import pycparser
 import re
+import subprocess
+import threading
+import types
 
 from typing import *
-from pycparser import c_parser, c_ast, parse_file
-from tapaconverter.common import get_func_range
+from pycparser import c_parser, c_ast
+from tapaconverter.common import get_func_range, read_source, remove_comments
+from tapaconverter.Profile import count, stage, subprocess_timer
+
+# a template name followed by "<". Skip "#include <...>"
+TEMPLATE_NAME_PATTERN = re.compile(r'(?<![\w#])([A-Za-z_]\w*(?:::[A-Za-z_]\w*)*)[ ]*<')
+
+# the angle brackets, and the chars that never appear inside a template type
+TEMPLATE_BRACKET_PATTERN = re.compile(r'[<>\t\n(){}*&;]')
+
 
 def get_fake_type(template_type: str) -> str:
   return template_type.replace('<', '_ANGLE_BRACKET_BEG_') \
                       .replace('>', '_ANGLE_BRACKET_END_') \
                       .replace('::', '_DOUBLE_COLON_') \
+                      .replace(',', '_COMMA_') \
                       .replace(' ', '_SPACE_')
 
 
@@ -16,41 +31,61 @@ def get_orig_type(fake_type: str) -> str:
   return fake_type.replace('_ANGLE_BRACKET_BEG_', '<') \
                   .replace('_ANGLE_BRACKET_END_', '>') \
                   .replace('_DOUBLE_COLON_', '::') \
+                  .replace('_COMMA_', ',') \
                   .replace('_SPACE_', ' ')
 
 
-def get_all_template_types(raw_code: str) -> List[str]:
-  raw_code_no_return = re.sub(r'\n', r' ', raw_code)
-
-  # [^ \n\t(<]* match the template name before "<". Use "(" to filter out cases like for (ap_uint<32> i, ...)
-  regexp_template_name = r'[^ \n\t(<]*'
-
-  # [ ]* matches potential spaces between template name and the "<"
-  regexp_space = r'[ ]*'
-
-  # [ ]*[^<>\t\n]+[ ]* matches the parameter to instantiate the tamplate. 
-  # Note that we do not consider nested templates here
-  regexp_template_param = r'[^<>\t\n(){}*&;]+'
-
-  final_regexp = rf'{regexp_template_name}{regexp_space}<{regexp_template_param}>'
-  init_list = list(set(re.findall(final_regexp, raw_code_no_return)))
-
-  filtered_list = [pattern for pattern in init_list 
-                    if '#include' not in pattern 
-                    and 'template' not in pattern]
+def find_template_end(raw_code: str, begin: int) -> int:
+  """
+  given the index of the "<" after a template name, return the index of the matching ">".
+  Return -1 if it is not a template type, e.g. "i < n;"
+  """
+  depth = 0
+  for match in TEMPLATE_BRACKET_PATTERN.finditer(raw_code, begin):
+    char = match.group()
+    if char == '<':
+      depth += 1
+    elif char == '>':
+      depth -= 1
+      if depth == 0:
+        return match.start()
+    else:
+      return -1
+  return -1
 
-  return filtered_list
 
+def replace_template_types(raw_code: str) -> Tuple[str, Dict[str, str]]:
+  """
+  replace all template types, including the nested ones, by fake types in one pass.
+  Return the new code and the mapping from the fake types to the original types
+  """
+  buf = []
+  fake_to_orig: Dict[str, str] = {}
+  curr = 0
+  pos = 0
+  while True:
+    match = TEMPLATE_NAME_PATTERN.search(raw_code, pos)
+    if not match:
+      break
 
-def replace_template_type(raw_code: str, template_type_list: List[str]) -> str:
+    template_end = find_template_end(raw_code, match.end() - 1)
+    if template_end == -1 or match.group(1) == 'template':
+      pos = match.end()
+      continue
 
-  _replace_template_type = lambda raw_code, template_type: \
-      re.sub(template_type, get_fake_type(template_type), raw_code)
+    template_type = raw_code[match.start():template_end+1]
+    fake_type = get_fake_type(template_type)
+    fake_to_orig[fake_type] = template_type
 
-  for template_type in template_type_list:
-    raw_code = _replace_template_type(raw_code, template_type)
+    buf.append(raw_code[curr:match.start()])
+    buf.append(fake_type)
+    count('bytes_rewritten', len(template_type))
+    curr = pos = template_end + 1
 
-  return raw_code
+  buf.append(raw_code[curr:])
+  count('regex_scans')
+  count('bytes_scanned', len(raw_code))
+  return ''.join(buf), fake_to_orig
 
 
 def add_fake_template_types_def(raw_code: str, template_types: List[str]) -> str:
@@ -65,17 +100,8 @@ def add_fake_template_types_def(raw_code: str, template_types: List[str]) -> str
     fake_type_def_list.append(fake_type_def)
   # fake_type_def_list.append('// end definitions of fake types')
 
-  next_code = fake_type_def_list + raw_code.split('\n')
-  return '\n'.join(next_code)
-
-
-def replace_template_types(raw_code: str, template_types: List[str]) -> str:
-  _temp_code = raw_code
-  for type in template_types:
-    fake_type = get_fake_type(type)
-    _temp_code = re.sub(type, fake_type, _temp_code)
+  return '\n'.join(fake_type_def_list) + '\n' + raw_code
 
-  return _temp_code
 
 def remove_stream_names(raw_code: str) -> str:
   """
@@ -86,78 +112,153 @@ def remove_stream_names(raw_code: str) -> str:
   return re.sub(r'(stream[ ]*<.*>[ ]+[a-zA-Z0-9_]+)\(.*\);', r'\1;', raw_code)
 
 
-def remove_innermost_template_usage(raw_code: str) -> str:
+def remove_template_usage(top_func_raw_code: str) -> Tuple[str, Dict[str, str]]:
   """
   If the code does not include templates, should return the exact same code
   FIXME: check if any task is templated
   """
-  _temp_code = raw_code
-  template_types = get_all_template_types(raw_code)
-
-  _temp_code = replace_template_type(_temp_code, template_types)
-  _temp_code = add_fake_template_types_def(_temp_code, template_types)
-  _temp_code = replace_template_types(_temp_code, template_types)
-
-  return _temp_code
-
-
-def remove_template_usage(top_func_raw_code: str) -> str:
-  # handle nested template types
-  code_curr = top_func_raw_code
-  count = 0
-  while 1:
-    code_next = remove_innermost_template_usage(code_curr)
-    if code_next == code_curr:
-      break
-    else:
-      count += 1
-      code_curr = code_next
+  _temp_code, fake_to_orig = replace_template_types(top_func_raw_code)
+  if fake_to_orig:
+    _temp_code = add_fake_template_types_def(_temp_code, list(fake_to_orig.values()))
 
-    if count > 10:
-      assert False, 'looping in template conversion for 10 times, most likely fall into a infinite loop'
-  
-  return code_curr
+  return _temp_code, fake_to_orig
 
 
-def get_top_func(top_path: str, top_name: str) -> str:
+def get_top_func(raw_code: str, top_name: str) -> str:
   """
-  extract the top kernel function from the raw file
+  extract the top kernel function from the raw code
   """
-  raw_code = open(top_path, 'r').read()
   start_index, end_index = get_func_range(raw_code, top_name)
   return raw_code[start_index: end_index+1]
 
 
-def add_type_defs(temp_code: str, top_path: str) -> str:
+def get_type_defs(raw_code: str) -> List[str]:
+  return re.findall('typedef.*;', raw_code) + re.findall('using.*;', raw_code)
+
+
+def add_type_defs(temp_code: str, raw_code: str) -> str:
   """
   extract all typedefs to include in the fake top func
   """
-  raw_code = open(top_path, 'r').read()
-  includes = re.findall('typedef.*;', raw_code) + re.findall('using.*;', raw_code)
+  includes = get_type_defs(raw_code)
   return '\n'.join(includes) + '\n' + temp_code
 
 
+def preprocess(fake_top_code: str, use_cpp: bool) -> str:
+  """
+  the fake top func has no includes or macros, so it is enough to remove the
+  comments and the line continuations. Optionally pipe through cpp instead
+  """
+  if use_cpp:
+    with subprocess_timer():
+      return subprocess.run(['cpp'], input=fake_top_code, stdout=subprocess.PIPE, check=True, text=True).stdout
+
+  return remove_comments(fake_top_code).replace('\\\n', '')
+
+
 class RevertFakeTypeVisitor(c_ast.NodeVisitor):
   """
   previous we convert all template types to fake types for the cparser
   now we modify the ast to revert the types back
   """
-  def __init__(self, ast):
+  def __init__(self, ast, fake_to_orig: Optional[Dict[str, str]] = None):
+    self.fake_to_orig = fake_to_orig or {}
     self.visit(ast)
 
   def visit_IdentifierType(self, node):
-    node.names = list(map(get_orig_type, node.names))
+    node.names = [self.fake_to_orig.get(name) or get_orig_type(name) for name in node.names]
 
 
-def get_top_ast(top_path: str, top_name: str) -> c_ast.Node:
-  _temp_code = get_top_func(top_path, top_name)
+# the lexer and parser tables of the ply based pycparser 2.x, built once for each pycparser version
+# and reused by later processes. pycparser 3.x has a hand-written parser without tables
+PARSER_TABLE_DIR = os.path.join(
+  os.environ.get('XDG_CACHE_HOME', os.path.join(os.path.expanduser('~'), '.cache')),
+  'tapaconverter',
+  'pycparser_tables',
+  pycparser.__version__,
+)
+# the names of the table modules. They are loaded from their files in the table dir,
+# so that sys.path is left alone and a lextab or yacctab module of another package is never picked up
+LEXTAB_NAME = 'tapaconverter_lextab'
+YACCTAB_NAME = 'tapaconverter_yacctab'
+
+PARSER_LOCAL = threading.local()
+
 
-  _temp_code = add_type_defs(_temp_code, top_path)
-  _temp_code = remove_stream_names(_temp_code)
-  _temp_code = remove_template_usage(_temp_code)
-  
-  open('/tmp/tapaconverter_fake_top_func.cpp', 'w').write(_temp_code)
-  ast = parse_file('/tmp/tapaconverter_fake_top_func.cpp', use_cpp=True, )
-  RevertFakeTypeVisitor(ast)
+def load_table(name: str) -> Union[str, types.ModuleType]:
+  """
+  the table module saved in the table dir. If it is missing, return the name, so that ply builds the table
+  and writes it to the table dir
+  """
+  path = os.path.join(PARSER_TABLE_DIR, f'{name}.py')
+  if not os.path.isfile(path):
+    return name
+
+  spec = importlib.util.spec_from_file_location(name, path)
+  module = importlib.util.module_from_spec(spec)
+  try:
+    spec.loader.exec_module(module)
+  except Exception:
+    logging.warning(f'fail to load {path}, the table is rebuilt')
+    return name
+  return module
+
+
+def create_parser() -> c_parser.CParser:
+  if int(pycparser.__version__.split('.')[0]) >= 3:
+    return c_parser.CParser()
+
+  try:
+    os.makedirs(PARSER_TABLE_DIR, exist_ok=True)
+  except OSError:
+    logging.warning(f'fail to create {PARSER_TABLE_DIR}, the parser tables are built in memory')
+    return c_parser.CParser()
+
+  return c_parser.CParser(
+    lex_optimize=True,
+    lextab=load_table(LEXTAB_NAME),
+    yacc_optimize=True,
+    yacctab=load_table(YACCTAB_NAME),
+    taboutputdir=PARSER_TABLE_DIR,
+  )
+
+
+def get_parser() -> c_parser.CParser:
+  """
+  one parser for each thread, since a parser keeps the state of the current parse
+  """
+  if not hasattr(PARSER_LOCAL, 'parser'):
+    count('parsers')
+    PARSER_LOCAL.parser = create_parser()
+  return PARSER_LOCAL.parser
+
+
+def get_top_ast_from_source(
+    raw_code: str, 
+    top_name: str, 
+    use_cpp: bool = False, 
+    type_def_code: Optional[str] = None,
+) -> c_ast.Node:
+  """
+  parse the top func in memory. Each call uses its own parser so that it is thread-safe.
+  The typedefs are collected from type_def_code if given, e.g. the typedefs of all files of a project
+  """
+  with stage('get_top_ast'):
+    _temp_code = get_top_func(raw_code, top_name)
 
-  return ast
\ No newline at end of file
+    _temp_code = add_type_defs(_temp_code, raw_code if type_def_code is None else type_def_code)
+    _temp_code = remove_stream_names(_temp_code)
+    with stage('remove_template_usage'):
+      _temp_code, fake_to_orig = remove_template_usage(_temp_code)
+    count('template_types', len(fake_to_orig))
+    _temp_code = preprocess(_temp_code, use_cpp)
+
+    with stage('pycparser'):
+      ast = get_parser().parse(_temp_code, f'{top_name}_fake_top_func.cpp')
+    RevertFakeTypeVisitor(ast, fake_to_orig)
+
+  return ast
+
+
+def get_top_ast(top_path: str, top_name: str) -> c_ast.Node:
+  return get_top_ast_from_source(read_source(top_path), top_name)
@@ -0,0 +1,109 @@
+# lightweight instrumentation of the conversion pipeline
+# the active profiler is stored in a context variable, so concurrent conversions
+# in different threads never mix their numbers. Without an active profiler all
+# hooks are no-ops. The worker threads of a conversion run in a copy of its
+# context, so they count to the same profiler
+#
+# with profile() as profiler:
+#   convert(source, top_name)
+# print(profiler.to_dict())
+
+import contextvars
+import json
+import threading
+import time
+
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import *
+
+
+# the counters may be updated by the worker threads of a conversion. A module lock keeps
+# the profiler picklable, e.g. to return it from a batch worker process
+COUNTER_LOCK = threading.Lock()
+
+
+class Profiler:
+  def __init__(self):
+    # stage name -> accumulated wall time. Nested stages are recorded as "outer/inner"
+    self.stage_to_time: Dict[str, float] = defaultdict(float)
+    self.stage_to_calls: Dict[str, int] = defaultdict(int)
+    self.counters: Dict[str, int] = defaultdict(int)
+    self.subprocess_time = 0.0
+    self.stage_stack: List[str] = []
+    self.start_time = time.perf_counter()
+    self.wall_time = 0.0
+
+  @contextmanager
+  def stage(self, name: str) -> Iterator[None]:
+    full_name = '/'.join(self.stage_stack + [name])
+    self.stage_stack.append(name)
+    start = time.perf_counter()
+    try:
+      yield
+    finally:
+      self.stage_to_time[full_name] += time.perf_counter() - start
+      self.stage_to_calls[full_name] += 1
+      self.stage_stack.pop()
+
+  def count(self, name: str, n: int = 1) -> None:
+    with COUNTER_LOCK:
+      self.counters[name] += n
+
+  def to_dict(self) -> Dict[str, Any]:
+    return {
+      'wall_time': round(self.wall_time or time.perf_counter() - self.start_time, 6),
+      'subprocess_time': round(self.subprocess_time, 6),
+      'stages': {
+        name: {'time': round(t, 6), 'calls': self.stage_to_calls[name]} for name, t in self.stage_to_time.items()
+      },
+      'counters': dict(self.counters),
+    }
+
+  def to_json(self) -> str:
+    return json.dumps(self.to_dict(), indent=2)
+
+
+CURRENT_PROFILER: contextvars.ContextVar = contextvars.ContextVar('tapaconverter_profiler', default=None)
+
+
+@contextmanager
+def profile() -> Iterator[Profiler]:
+  """
+  activate a new profiler for the conversions within the block
+  """
+  profiler = Profiler()
+  token = CURRENT_PROFILER.set(profiler)
+  try:
+    yield profiler
+  finally:
+    profiler.wall_time = time.perf_counter() - profiler.start_time
+    CURRENT_PROFILER.reset(token)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+  profiler = CURRENT_PROFILER.get()
+  if profiler is None:
+    yield
+  else:
+    with profiler.stage(name):
+      yield
+
+
+def count(name: str, n: int = 1) -> None:
+  profiler = CURRENT_PROFILER.get()
+  if profiler is not None:
+    profiler.count(name, n)
+
+
+@contextmanager
+def subprocess_timer() -> Iterator[None]:
+  start = time.perf_counter()
+  try:
+    yield
+  finally:
+    profiler = CURRENT_PROFILER.get()
+    if profiler is not None:
+      profiler.subprocess_time += time.perf_counter() - start
+      profiler.count('subprocesses')
@@ -0,0 +1,211 @@
+# convert a design whose top function and tasks are spread over several files
+# - each file is read, rewritten and indexed by its own worker
+# - the stream directions are propagated over the functions of all files, so a task
+#   may call tasks that are defined in any other file
+# - the pointer params and the stream params of the prototypes, e.g. in headers,
+#   follow their definitions
+# - every input file gets its own output, at the same path relative to the output dir
+
+import logging
+import os
+
+from concurrent.futures import ProcessPoolExecutor
+from typing import *
+from tapaconverter.AnalyzeStreamDirectionByOperation import (
+  Func,
+  StreamOpIndex,
+  has_no_params,
+  has_unnamed_params,
+  update_stream_dir_by_operation,
+)
+from tapaconverter.AnalyzeStreamDirectionByFuncCall import populate_stream_dir
+from tapaconverter.Batch import get_available_cores
+from tapaconverter.Convert import get_options, size_top_streams
+from tapaconverter.DataflowGraph import build_dataflow_graph
+from tapaconverter.Formatter import format_source
+from tapaconverter.IndexFunctions import FuncDef, index_functions
+from tapaconverter.ParseTop import get_top_ast_from_source, get_type_defs
+from tapaconverter.Profile import count, stage
+from tapaconverter.SourceBuffer import SourceBuffer
+from tapaconverter.TraverseTopAST import (
+  get_shared_init_version,
+  get_task_mmap_param_types,
+  replace_pointer_param,
+  replace_top_func,
+)
+from tapaconverter.common import read_source
+
+__all__ = [
+  'convert_project',
+]
+
+
+class FileIndex:
+  """
+  a file after the top-independent rewrites, with the functions it defines or declares
+  """
+  def __init__(self, filename: str, code: str, func_def_list: List[FuncDef], type_def_list: List[str]):
+    self.filename = filename
+    self.code = code
+    self.func_def_list = func_def_list
+    self.type_def_list = type_def_list
+
+  def has_definition(self, name: str) -> bool:
+    return any(func_def.name == name and func_def.is_definition for func_def in self.func_def_list)
+
+
+def index_file(filename: str) -> FileIndex:
+  """
+  run in a worker process. Headers and helper files may have no stream at all
+  """
+  raw_code = read_source(filename)
+  code = get_shared_init_version(raw_code, is_stream_required=False)
+  return FileIndex(filename, code, index_functions(code), get_type_defs(raw_code))
+
+
+def index_files(filenames: List[str], max_workers: Optional[int] = None) -> List[FileIndex]:
+  if max_workers is None:
+    max_workers = get_available_cores()
+  max_workers = max(1, min(max_workers, len(filenames)))
+
+  if max_workers == 1:
+    return [index_file(filename) for filename in filenames]
+  with ProcessPoolExecutor(max_workers=max_workers) as executor:
+    return list(executor.map(index_file, filenames))
+
+
+def replace_task_pointers_by_index(file_index: FileIndex, task_to_param_index_to_type: Dict[str, Dict[int, str]]) -> None:
+  """
+  unlike replace_task_pointers, update every definition and prototype of the tasks
+  """
+  buffer = SourceBuffer(file_index.code)
+  for func_def in file_index.func_def_list:
+    if func_def.name not in task_to_param_index_to_type:
+      continue
+    param_list = buffer.text[func_def.param_range[0]:func_def.param_range[1]].split(',')
+    for index, type in task_to_param_index_to_type[func_def.name].items():
+      param_list[index] = replace_pointer_param(param_list[index], type)
+    buffer.add_patch(*func_def.param_range, ','.join(param_list))
+
+  if buffer.patch_starts:
+    file_index.code = buffer.materialize()
+    file_index.func_def_list = index_functions(file_index.code)
+
+
+def update_prototypes(file_index: FileIndex, buffer: SourceBuffer, name_to_func: Dict[str, Func]) -> None:
+  """
+  the stream params of a prototype follow the params at the same position of the definition
+  """
+  for func_def in file_index.func_def_list:
+    if func_def.is_definition or func_def.name not in name_to_func:
+      continue
+    param_list_text = buffer.text[func_def.param_range[0]:func_def.param_range[1]]
+    if has_no_params(param_list_text):
+      continue
+    if has_unnamed_params(param_list_text):
+      logging.warning(f'skip the prototype of {func_def.name} in {file_index.filename} with unnamed params')
+      continue
+    prototype = Func(func_def.name, func_def.return_type, func_def.func_range, buffer, func_def.param_range)
+
+    for param, proto_param in zip(name_to_func[func_def.name].get_param_list(), prototype.get_param_list()):
+      if param.is_stream and proto_param.is_stream:
+        prototype.check_and_update_param_type_by_name(proto_param.param_name, param.param_type)
+    count('prototypes')
+
+
+def get_output_path(filename: str, base_dir: str, output_dir: str) -> str:
+  return os.path.join(output_dir, os.path.relpath(os.path.abspath(filename), base_dir))
+
+
+def convert_project(
+    filenames: List[str],
+    top_name: str,
+    output_dir: Optional[str] = None,
+    max_workers: Optional[int] = None,
+    **options,
+) -> Dict[str, str]:
+  """
+  convert all source and header files of a design. Return input filename -> tapa code.
+  If output_dir is given, also write each output to the same path relative to the
+  common directory of the inputs
+  """
+  options = get_options(options)
+  count('files', len(filenames))
+
+  with stage('index_files'):
+    file_index_list = index_files(filenames, max_workers)
+
+  top_file_list = [file_index for file_index in file_index_list if file_index.has_definition(top_name)]
+  if not top_file_list:
+    logging.error(f'fail to locate the top function')
+    raise NotImplementedError
+  if not any('tapa::stream' in file_index.code for file_index in file_index_list):
+    logging.error(f'fail to replace hls::stream. Possibly the user has specified "using namespace hls;", not supported yet')
+    raise NotImplementedError
+  top_file = top_file_list[0]
+
+  # the top func may use the types defined in any header
+  type_def_list = [
+    type_def for file_index in file_index_list if file_index is not top_file for type_def in file_index.type_def_list
+  ] + top_file.type_def_list
+  ast = get_top_ast_from_source(read_source(top_file.filename), top_name, options['use_cpp'], '\n'.join(type_def_list))
+
+  with stage('get_tapa_init_version'):
+    top_file.code = replace_top_func(top_file.code, top_name, ast)
+    top_file.func_def_list = index_functions(top_file.code)
+
+    task_to_param_index_to_type = get_task_mmap_param_types(ast)
+    for file_index in file_index_list:
+      replace_task_pointers_by_index(file_index, task_to_param_index_to_type)
+
+  with stage('update_stream_directions'):
+    file_to_buffer = {file_index.filename: SourceBuffer(file_index.code) for file_index in file_index_list}
+
+    name_to_func: Dict[str, Func] = {}
+    for file_index in file_index_list:
+      buffer = file_to_buffer[file_index.filename]
+      stream_op_index = StreamOpIndex(buffer.text)
+      for func_def in file_index.func_def_list:
+        if not func_def.is_definition or func_def.name == top_name:
+          continue
+        if func_def.name in name_to_func:
+          logging.warning(f'{func_def.name} is defined in multiple files, use the one in {file_index.filename}')
+        name_to_func[func_def.name] = Func(
+          func_def.name, func_def.return_type, func_def.func_range, buffer, func_def.param_range, stream_op_index)
+    func_list = list(name_to_func.values())
+    count('functions', len(func_list))
+
+    for func in func_list:
+      update_stream_dir_by_operation(func)
+    solver = populate_stream_dir(func_list)
+    count('cross_file_calls', sum(
+      func_call.caller.buffer is not func_call.callee.buffer
+      for func_calls in solver.func_to_func_calls.values() for func_call in func_calls
+    ))
+
+    for file_index in file_index_list:
+      update_prototypes(file_index, file_to_buffer[file_index.filename], name_to_func)
+
+  if options['size_fifos']:
+    func_to_stream_dirs = {
+      name: [param.get_stream_dir() for param in func.get_param_list()] for name, func in name_to_func.items()
+    }
+    graph = build_dataflow_graph(ast, top_name, func_to_stream_dirs=func_to_stream_dirs)
+
+  file_to_tapa_cpp = {}
+  for file_index in file_index_list:
+    tapa_cpp = file_to_buffer[file_index.filename].materialize()
+    if options['size_fifos'] and file_index is top_file:
+      tapa_cpp, _ = size_top_streams(tapa_cpp, top_name, ast, options, graph)
+    if options['format']:
+      tapa_cpp = format_source(tapa_cpp)
+    file_to_tapa_cpp[file_index.filename] = tapa_cpp
+
+  if output_dir is not None:
+    base_dir = os.path.commonpath([os.path.dirname(os.path.abspath(filename)) for filename in filenames])
+    for filename, tapa_cpp in file_to_tapa_cpp.items():
+      output_path = get_output_path(filename, base_dir, output_dir)
+      os.makedirs(os.path.dirname(output_path), exist_ok=True)
+      open(output_path, 'w').write(tapa_cpp)
+
+  return file_to_tapa_cpp
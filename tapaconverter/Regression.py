@@ -0,0 +1,340 @@
+# check the converter against a corpus of designs with known good outputs
+# each case is a directory
+#   corpus/vadd/input.cpp      the HLS source
+#   corpus/vadd/expected.cpp   the expected tapa code
+#   corpus/vadd/case.json      {"top_name": "vadd", "options": {"size_fifos": true}}, options are optional
+# the outputs are compared token by token, so whitespace and the layout do not matter.
+# The timing of each case and each stage is compared with a stored baseline, and a
+# case fails if it is slower than the baseline by more than the given percentage
+#
+# python -m tapaconverter.Regression --corpus corpus --driver library cli --baseline corpus/baseline.json
+# python -m tapaconverter.Regression --corpus corpus --baseline corpus/baseline.json --update_baseline
+
+import argparse
+import json
+import logging
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+
+from typing import *
+from tapaconverter.ConvertOptions import get_option_args
+from tapaconverter.Profile import profile, stage
+
+# the library driver calls the stage entry points, the cli driver runs main.py
+DRIVERS = ['library', 'cli']
+
+# comments and literals are single tokens. Every other char that is not a space is a token
+TOKEN_PATTERN = re.compile(r'''
+    //[^\n]*
+  | /\*.*?\*/
+  | "(?:\\.|[^\\"\n])*"
+  | '(?:\\.|[^\\'\n])*'
+  | [A-Za-z_]\w*
+  | \d[\w.]*
+  | \S
+''', re.DOTALL | re.VERBOSE)
+
+# a slowdown smaller than this is noise, whatever the percentage
+DEFAULT_MIN_SLOWDOWN_SECONDS = 0.02
+
+
+class Case:
+  def __init__(self, name: str, case_dir: str, top_name: str, options: Dict[str, Any]):
+    self.name = name
+    self.case_dir = case_dir
+    self.top_name = top_name
+    self.options = options
+
+  @property
+  def input_path(self) -> str:
+    return os.path.join(self.case_dir, 'input.cpp')
+
+  @property
+  def expected_path(self) -> str:
+    return os.path.join(self.case_dir, 'expected.cpp')
+
+
+class CaseResult:
+  def __init__(self, case: Case, driver: str):
+    self.case = case
+    self.driver = driver
+    self.output: Optional[str] = None
+    self.error: Optional[str] = None
+    # None if the output matches
+    self.mismatch: Optional[str] = None
+    self.total_time = 0.0
+    self.stage_to_time: Dict[str, float] = {}
+    self.baseline: Optional[Dict[str, Any]] = None
+    self.is_regressed = False
+
+  @property
+  def is_success(self) -> bool:
+    return self.error is None and self.mismatch is None and not self.is_regressed
+
+  def get_timing(self) -> Dict[str, Any]:
+    return {
+      'total': round(self.total_time, 6),
+      'stages': {name: round(t, 6) for name, t in self.stage_to_time.items()},
+    }
+
+  def to_dict(self) -> Dict[str, Any]:
+    return {
+      'case': self.case.name,
+      'driver': self.driver,
+      'success': self.is_success,
+      'error': self.error,
+      'mismatch': self.mismatch,
+      'regressed': self.is_regressed,
+      'timing': self.get_timing(),
+      'baseline': self.baseline,
+    }
+
+
+def load_corpus(corpus_dir: str, case_names: Optional[List[str]] = None) -> List[Case]:
+  case_list = []
+  for name in sorted(os.listdir(corpus_dir)):
+    case_dir = os.path.join(corpus_dir, name)
+    if not os.path.isfile(os.path.join(case_dir, 'case.json')):
+      continue
+    if case_names and name not in case_names:
+      continue
+    config = json.loads(open(os.path.join(case_dir, 'case.json')).read())
+    case_list.append(Case(name, case_dir, config['top_name'], config.get('options', {})))
+  return case_list
+
+
+def tokenize(code: str) -> List[Tuple[str, int]]:
+  """
+  (token, line number). The spaces inside a comment are normalized
+  """
+  token_list = []
+  line = 1
+  pos = 0
+  for match in TOKEN_PATTERN.finditer(code):
+    line += code.count('\n', pos, match.start())
+    pos = match.start()
+    token = match.group()
+    if token.startswith('//') or token.startswith('/*'):
+      token = ' '.join(token.split())
+    token_list.append((token, line))
+  return token_list
+
+
+def compare_tokens(expected: str, actual: str) -> Optional[str]:
+  """
+  return None if the two codes have the same tokens, or a description of the first difference
+  """
+  expected_tokens = tokenize(expected)
+  actual_tokens = tokenize(actual)
+  for i, ((expected_token, expected_line), (actual_token, actual_line)) in enumerate(zip(expected_tokens, actual_tokens)):
+    if expected_token != actual_token:
+      context = ' '.join(token for token, _ in expected_tokens[max(0, i - 5):i])
+      return (f'expected "{expected_token}" at line {expected_line}, got "{actual_token}" at line {actual_line}, '
+              f'after "{context}"')
+
+  if len(expected_tokens) != len(actual_tokens):
+    return f'expected {len(expected_tokens)} tokens, got {len(actual_tokens)}'
+  return None
+
+
+def run_library(case: Case) -> Tuple[str, Dict[str, float]]:
+  """
+  run the stage entry points on the files, as a user of the library would.
+  The stage entry points take no options, so the cases with options go through convert
+  """
+  from tapaconverter.Convert import convert
+  from tapaconverter.Formatter import format_source
+  from tapaconverter.TraverseTopAST import get_tapa_init_version
+  from tapaconverter.UpdateStreamDirection import update_stream_directions
+
+  with profile() as profiler:
+    if case.options:
+      with stage('convert'):
+        tapa_cpp = convert(open(case.input_path).read(), case.top_name, **case.options)
+    else:
+      with tempfile.TemporaryDirectory() as temp_dir:
+        init_path = os.path.join(temp_dir, 'init.cpp')
+        open(init_path, 'w').write(get_tapa_init_version(case.input_path, case.top_name))
+        tapa_cpp = update_stream_directions(init_path, case.top_name)
+      with stage('format_source'):
+        tapa_cpp = format_source(tapa_cpp)
+
+  return tapa_cpp, {name: value['time'] for name, value in profiler.to_dict()['stages'].items()}
+
+
+def run_cli(case: Case) -> Tuple[str, Dict[str, float]]:
+  """
+  run main.py in a new interpreter, so the time includes the startup.
+  The interpreter imports the same tapaconverter as this one
+  """
+  package_parent = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+  env = {**os.environ, 'PYTHONPATH': os.pathsep.join(filter(None, [package_parent, os.environ.get('PYTHONPATH')]))}
+  with tempfile.TemporaryDirectory() as temp_dir:
+    output_path = os.path.join(temp_dir, 'output.cpp')
+    profile_path = os.path.join(temp_dir, 'profile.json')
+    subprocess.run(
+      [
+        sys.executable, '-m', 'tapaconverter.main',
+        '--filename', case.input_path,
+        '--top_name', case.top_name,
+        '--output', output_path,
+        '--profile', profile_path,
+      ] + get_option_args(case.options),
+      check=True,
+      capture_output=True,
+      text=True,
+      env=env,
+    )
+    stages = json.loads(open(profile_path).read())['stages']
+    return open(output_path).read(), {name: value['time'] for name, value in stages.items()}
+
+
+def run_case(case: Case, driver: str, repeat: int = 3) -> CaseResult:
+  """
+  keep the timing of the fastest run
+  """
+  result = CaseResult(case, driver)
+  run = run_library if driver == 'library' else run_cli
+  result.total_time = float('inf')
+  try:
+    for _ in range(repeat):
+      start = time.perf_counter()
+      output, stage_to_time = run(case)
+      elapsed = time.perf_counter() - start
+      if elapsed < result.total_time:
+        result.total_time = elapsed
+        result.stage_to_time = stage_to_time
+      result.output = output
+  except subprocess.CalledProcessError as e:
+    result.error = e.stderr
+  except Exception as e:
+    result.error = repr(e)
+
+  if result.error is not None:
+    result.total_time = 0.0
+    return result
+
+  result.mismatch = compare_tokens(open(case.expected_path).read(), result.output)
+  return result
+
+
+def check_timing(
+    result: CaseResult,
+    baseline: Dict[str, Dict[str, Any]],
+    max_slowdown: float,
+    min_slowdown_seconds: float = DEFAULT_MIN_SLOWDOWN_SECONDS,
+) -> List[str]:
+  """
+  compare with the baseline of the same case and driver. A case regresses if its total time
+  exceeds the baseline by more than max_slowdown percent. Return the stages that are slower in the same way
+  """
+  result.baseline = baseline.get(result.case.name, {}).get(result.driver)
+  if result.baseline is None or result.error is not None:
+    return []
+
+  def is_slower(t: float, baseline_t: float) -> bool:
+    return t - baseline_t > min_slowdown_seconds and t > baseline_t * (1 + max_slowdown / 100)
+
+  result.is_regressed = is_slower(result.total_time, result.baseline['total'])
+  return [
+    name for name, t in result.stage_to_time.items()
+    if name in result.baseline['stages'] and is_slower(t, result.baseline['stages'][name])
+  ]
+
+
+def run_regression(
+    case_list: List[Case],
+    driver_list: List[str],
+    baseline: Dict[str, Dict[str, Any]],
+    max_slowdown: float,
+    repeat: int = 3,
+    min_slowdown_seconds: float = DEFAULT_MIN_SLOWDOWN_SECONDS,
+) -> List[CaseResult]:
+  result_list = []
+  for case in case_list:
+    for driver in driver_list:
+      result = run_case(case, driver, repeat)
+      slower_stages = check_timing(result, baseline, max_slowdown, min_slowdown_seconds)
+      if slower_stages:
+        logging.warning(f'{case.name} ({driver}) is slower in {", ".join(slower_stages)}')
+      result_list.append(result)
+  return result_list
+
+
+def update_baseline(baseline: Dict[str, Dict[str, Any]], result_list: List[CaseResult]) -> Dict[str, Dict[str, Any]]:
+  """
+  the cases and the drivers that are not run keep their baseline
+  """
+  baseline = {name: dict(driver_to_timing) for name, driver_to_timing in baseline.items()}
+  for result in result_list:
+    if result.error is None:
+      baseline.setdefault(result.case.name, {})[result.driver] = result.get_timing()
+  return baseline
+
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser()
+  parser.add_argument('--corpus', type=str, required=True, help='a directory of case directories')
+  parser.add_argument('--case', type=str, nargs='+', default=None, help='only run these cases')
+  parser.add_argument('--driver', type=str, nargs='+', default=['library'], choices=DRIVERS)
+  parser.add_argument('--baseline', type=str, default=None, help='the stored timing as json')
+  parser.add_argument('--max_slowdown', type=float, default=20, help='in percent of the baseline time')
+  parser.add_argument('--min_slowdown', type=float, default=DEFAULT_MIN_SLOWDOWN_SECONDS,
+                      help='in seconds, smaller slowdowns are ignored')
+  parser.add_argument('--repeat', type=int, default=3, help='keep the fastest of several runs')
+  parser.add_argument('--update_baseline', action='store_true', help='store the timing of this run as the baseline')
+  parser.add_argument('--update_expected', action='store_true', help='accept the outputs of this run as expected')
+  parser.add_argument('--summary', type=str, default=None, help='write the results as json')
+  args = parser.parse_args()
+
+  baseline = {}
+  if args.baseline and os.path.exists(args.baseline):
+    baseline = json.loads(open(args.baseline).read())
+
+  case_list = load_corpus(args.corpus, args.case)
+  result_list = run_regression(case_list, args.driver, baseline, args.max_slowdown, args.repeat, args.min_slowdown)
+
+  for result in result_list:
+    if result.error is not None:
+      status, detail = 'FAIL', result.error.strip().split('\n')[-1]
+    elif result.mismatch is not None:
+      status, detail = 'DIFF', result.mismatch
+    elif result.is_regressed:
+      status, detail = 'SLOW', f'baseline {result.baseline["total"]:.3f}s'
+    else:
+      status, detail = 'OK  ', ''
+    print(f'{status} {result.total_time:8.3f}s {result.case.name} ({result.driver}) {detail}')
+
+  if args.update_expected:
+    for result in result_list:
+      if result.error is None and result.mismatch is not None:
+        open(result.case.expected_path, 'w').write(result.output)
+        print(f'updated {result.case.expected_path}')
+  if args.update_baseline:
+    if not args.baseline:
+      parser.error('--update_baseline requires --baseline')
+    open(args.baseline, 'w').write(json.dumps(update_baseline(baseline, result_list), indent=2))
+    print(f'updated {args.baseline}')
+  if args.summary:
+    open(args.summary, 'w').write(json.dumps([result.to_dict() for result in result_list], indent=2))
+
+  failure_count = 0
+  accepted_count = 0
+  for result in result_list:
+    if result.is_success:
+      continue
+    is_accepted = (
+      result.error is None
+      and (result.mismatch is None or args.update_expected)
+      and (not result.is_regressed or args.update_baseline)
+    )
+    accepted_count += is_accepted
+    failure_count += not is_accepted
+
+  passed_count = len(result_list) - failure_count - accepted_count
+  print(f'{passed_count} passed, {accepted_count} accepted, {failure_count} failed')
+  sys.exit(1 if failure_count else 0)
@@ -0,0 +1,101 @@
+# recommend the depth of each stream of the top from the dataflow graph
+# - a stream with a literal depth pragma starts from the declared depth
+# - a stream without a depth pragma starts from the minimum depth
+# - a stream whose depth is not a literal, e.g. a macro, keeps the expression and
+#   is modeled with the default depth
+# - the streams are deepened until all reconvergent paths are balanced. Each round
+#   deepens the last stream of the least buffered path of the first unbalanced
+#   reconvergence, i.e. the buffer sits right before the join task.
+#   Depths only grow, so a balanced reconvergence stays balanced and at most one
+#   round is needed for each reconvergence
+# each depth comes with the reasoning, which is emitted as a comment of the declaration
+
+import logging
+
+from copy import deepcopy
+from typing import *
+from tapaconverter.AnalyzeDataflowGraph import (
+  find_cycles,
+  find_reconvergences,
+  get_acyclic_part,
+  get_stream_depth,
+)
+from tapaconverter.DataflowGraph import DataflowGraph
+
+__all__ = [
+  'apply_stream_depths',
+  'size_stream_depths',
+]
+
+DEFAULT_MIN_FIFO_DEPTH = 2
+
+
+def size_stream_depths(
+    graph: DataflowGraph,
+    task_to_latency: Optional[Dict[str, int]] = None,
+    min_depth: int = DEFAULT_MIN_FIFO_DEPTH,
+) -> Dict[str, Tuple[str, str]]:
+  """
+  return stream name -> (depth, reason) for all streams of the graph, in declaration order.
+  task_to_latency maps a task name or a node name to its latency in cycles
+  """
+  task_to_latency = task_to_latency or {}
+  # the depths are updated on a copy so that the analysis sees the deepened streams
+  graph = deepcopy(graph)
+
+  stream_to_reasons: Dict[str, List[str]] = {}
+  stream_to_extra_depth: Dict[str, int] = {}
+  for stream in graph.stream_list:
+    stream_to_extra_depth[stream.name] = 0
+    if stream.depth is not None:
+      stream_to_reasons[stream.name] = [f'declared depth {stream.depth}']
+    elif stream.depth_text is None:
+      stream.depth = min_depth
+      stream_to_reasons[stream.name] = [f'no depth pragma, minimum depth {min_depth}']
+    else:
+      stream_to_reasons[stream.name] = [f'declared depth {stream.depth_text}, modeled as {get_stream_depth(stream)}']
+
+  component_list, topo_order, node_to_out_edges = get_acyclic_part(graph)
+  while True:
+    unbalanced_list = [
+      reconvergence for reconvergence in find_reconvergences(graph, topo_order, node_to_out_edges, task_to_latency)
+      if reconvergence.missing_depth > 0
+    ]
+    if not unbalanced_list:
+      break
+
+    reconvergence = unbalanced_list[0]
+    stream = graph.name_to_stream[reconvergence.short_path_streams[-1]]
+    stream.depth = get_stream_depth(stream) + reconvergence.missing_depth
+    stream_to_extra_depth[stream.name] += reconvergence.missing_depth
+    stream_to_reasons[stream.name].append(
+      f'+{reconvergence.missing_depth} to balance {" -> ".join(reconvergence.short_path)} '
+      f'with the latency {reconvergence.max_latency} of {" -> ".join(reconvergence.long_path)}')
+    logging.info(f'deepen {stream.name} by {reconvergence.missing_depth}')
+
+  # the depth of a feedback stream depends on the tokens in flight, which is not modeled
+  for cycle in find_cycles(graph, component_list, graph.get_edges()):
+    for stream in cycle.streams:
+      if 'in a stream cycle' not in stream_to_reasons[stream.name]:
+        stream_to_reasons[stream.name].append('in a stream cycle')
+
+  stream_to_depth = {}
+  for stream in graph.stream_list:
+    if stream.depth_text is not None and not stream.depth_text.isdigit():
+      extra_depth = stream_to_extra_depth[stream.name]
+      depth = f'{stream.depth_text} + {extra_depth}' if extra_depth else stream.depth_text
+    else:
+      depth = str(stream.depth)
+    stream_to_depth[stream.name] = (depth, ', '.join(stream_to_reasons[stream.name]))
+
+  return stream_to_depth
+
+
+def apply_stream_depths(graph: DataflowGraph, stream_to_depth: Dict[str, Tuple[str, str]]) -> None:
+  """
+  update the graph to the sized depths
+  """
+  for stream in graph.stream_list:
+    depth_text, _ = stream_to_depth[stream.name]
+    stream.depth_text = depth_text
+    stream.depth = int(depth_text) if depth_text.isdigit() else None
@@ -0,0 +1,67 @@
+import bisect
+
+from typing import *
+
+
+class SourceBuffer:
+  """
+  the source text shared by all functions of a file.
+  Edits are recorded as patches on the offsets of the original text and are
+  only applied when the text is materialized, so the offsets never shift.
+  The new text of a patch can be a callable that renders it on demand.
+  """
+  def __init__(self, text: str):
+    self.text = text
+    self.patch_starts: List[int] = []
+    self.start_to_patch: Dict[int, Tuple[int, Union[str, Callable[[], str]]]] = {}
+
+  def add_patch(self, start: int, end: int, new_text: Union[str, Callable[[], str]]) -> None:
+    """
+    replace text[start:end] by new_text. A later patch of the same range overrides the previous one
+    """
+    assert 0 <= start <= end <= len(self.text), f'patch range ({start}, {end}) out of bound'
+    if start not in self.start_to_patch:
+      i = bisect.bisect_left(self.patch_starts, start)
+      assert i == 0 or self.start_to_patch[self.patch_starts[i-1]][0] <= start, \
+        f'patch ({start}, {end}) overlaps with a previous patch'
+      assert i == len(self.patch_starts) or end <= self.patch_starts[i], \
+        f'patch ({start}, {end}) overlaps with a following patch'
+      self.patch_starts.insert(i, start)
+    else:
+      assert self.start_to_patch[start][0] == end, f'patch ({start}, {end}) overlaps with a previous patch'
+
+    self.start_to_patch[start] = (end, new_text)
+
+  def get_text(self, start: int = 0, end: Optional[int] = None) -> str:
+    """
+    return text[start:end] with all patches inside the range applied
+    """
+    if end is None:
+      end = len(self.text)
+
+    buf = []
+    curr = start
+    i = bisect.bisect_left(self.patch_starts, start)
+    while i < len(self.patch_starts) and self.patch_starts[i] < end:
+      patch_start = self.patch_starts[i]
+      patch_end, new_text = self.start_to_patch[patch_start]
+      assert patch_end <= end, f'patch ({patch_start}, {patch_end}) crosses the boundary of ({start}, {end})'
+      buf.append(self.text[curr:patch_start])
+      buf.append(new_text if isinstance(new_text, str) else new_text())
+      curr = patch_end
+      i += 1
+    buf.append(self.text[curr:end])
+
+    return ''.join(buf)
+
+  def get_patched_bytes(self) -> int:
+    """
+    the number of bytes of the original text that are replaced by patches
+    """
+    return sum(self.start_to_patch[start][0] - start for start in self.patch_starts)
+
+  def materialize(self) -> str:
+    """
+    apply all patches in a single pass
+    """
+    return self.get_text()
@@ -5,10 +5,9 @@ from collections import defaultdict
 from copy import deepcopy
 from typing import *
 from pycparser import c_ast, c_generator
-from tapaconverter.ParseTop import get_top_ast
-from tapaconverter.common import get_func_range
-
-generator = c_generator.CGenerator()
+from tapaconverter.ParseTop import get_top_ast_from_source
+from tapaconverter.common import get_func_range, read_source, remove_comments
+from tapaconverter.Profile import count, stage
 
 __all__ = [
   'get_all_streams',
@@ -24,13 +23,22 @@ class Task:
 
 
 class Stream:
-  def __init__(self, name: str, depth: str, type: str):
+  def __init__(self, name: str, depth: str, type: str, comment: Optional[str] = None):
     self.name = name
     self.depth = depth
     self.type = type
+    self.comment = comment
+    # the number of streams if it is a stream array, e.g. "4" for hls::stream<int> s[4]
+    self.array_size: Optional[str] = None
 
   def get_tapa_stream(self):
-    return f'tapa::stream<{self.type}, {self.depth}> {self.name};'
+    if self.array_size is None:
+      tapa_stream = f'tapa::stream<{self.type}, {self.depth}> {self.name};'
+    else:
+      tapa_stream = f'tapa::streams<{self.type}, {self.array_size}, {self.depth}> {self.name};'
+    if self.comment:
+      tapa_stream += f' // {self.comment}'
+    return tapa_stream
 
 
 class Pragma:
@@ -68,11 +76,12 @@ class GetTaskVisitor(c_ast.NodeVisitor):
   """
   def __init__(self, ast: c_ast.FileAST):
     self.task_list:  List[Task] = []
+    self.generator = c_generator.CGenerator()
     self.visit(ast)
 
   def visit_FuncCall(self, node):
     task_name = node.name.name
-    arg_list = [generator.visit(arg) for arg in node.args.exprs]
+    arg_list = [self.generator.visit(arg) for arg in node.args.exprs]
     self.task_list.append(Task(task_name, arg_list))
 
   def dump_task_invoke(self) -> str:
@@ -115,8 +124,22 @@ class GetPragmaVisitor(c_ast.NodeVisitor):
 class GetStreamVisitor(c_ast.NodeVisitor):
   def __init__(self, ast):
     self.stream_to_type = {}
+    # the stream arrays, name -> the size of each dimension
+    self.stream_to_dims: Dict[str, List[str]] = {}
     self.visit(ast)
 
+  def visit_ArrayDecl(self, node):
+    """
+    record the dimensions of stream arrays, e.g. hls::stream<int> s[4]
+    """
+    dim_list = []
+    while isinstance(node, c_ast.ArrayDecl):
+      dim_list.append(c_generator.CGenerator().visit(node.dim) if node.dim is not None else '')
+      node = node.type
+    self.visit(node)
+    if isinstance(node, c_ast.TypeDecl) and node.declname in self.stream_to_type:
+      self.stream_to_dims[node.declname] = dim_list
+
   def visit_FuncDecl(self, node):
     """
     avoid visiting the decl nodes within a FuncDecl node
@@ -145,7 +168,8 @@ class GetTapaFuncDefVisitor(c_ast.NodeVisitor):
     self.top_type = None
     self.tapa_param_str = None
     self.mmap_arg_to_type = {}
-    self.visit(deepcopy(ast))
+    self.generator = c_generator.CGenerator()
+    self.visit(ast)
     
   def _visit_children(self, node):
     for c in node:
@@ -153,13 +177,15 @@ class GetTapaFuncDefVisitor(c_ast.NodeVisitor):
 
   def visit_ParamList(self, node):
     """
-    set a mark so that children visit knows we are under a param list
+    set a mark so that children visit knows we are under a param list.
+    Only the param list is rewritten, so only copy the param list instead of the whole ast
     """
+    node = deepcopy(node)
     self.is_top_func_decl_children = True
     self._visit_children(node)
     self.is_top_func_decl_children = False
 
-    self.tapa_param_str = generator.visit(node)
+    self.tapa_param_str = self.generator.visit(node)
 
   def visit_Decl(self, node):
     """
@@ -207,15 +233,29 @@ def get_all_tasks(ast: c_ast.FileAST):
   return get_task_visitor.dump_task_invoke()
 
 
-def get_all_streams(ast: c_ast.FileAST) -> str:
-  get_pragma_visitor = GetPragmaVisitor(ast)
-  stream_list = get_pragma_visitor.get_streams()
-
+def get_all_streams(ast: c_ast.FileAST, stream_to_depth: Optional[Dict[str, Tuple[str, str]]] = None) -> str:
+  """
+  by default, declare the streams with a depth pragma at the declared depth.
+  If stream_to_depth is given, i.e. stream name -> (depth, reason), declare these streams
+  at the given depths with the reasons as comments
+  """
   get_stream_visitor = GetStreamVisitor(ast)
 
+  if stream_to_depth is None:
+    get_pragma_visitor = GetPragmaVisitor(ast)
+    stream_list = get_pragma_visitor.get_streams()
+  else:
+    stream_list = [Stream(name, depth, 'none_type', reason) for name, (depth, reason) in stream_to_depth.items()]
+
   stream_def_list = []
   for s in stream_list:
     s.type = get_stream_visitor.stream_to_type[s.name]
+    dim_list = get_stream_visitor.stream_to_dims.get(s.name)
+    if dim_list is not None:
+      if len(dim_list) == 1 and dim_list[0]:
+        s.array_size = dim_list[0]
+      else:
+        logging.warning(f'tapa::streams only has one dimension of a known size, {s.name} is declared as a single stream')
     stream_def_list.append('\t' + s.get_tapa_stream() + '\n')
   return ''.join(stream_def_list)
 
@@ -224,34 +264,41 @@ def get_tapa_top_header(ast: c_ast.FileAST) -> str:
   return GetTapaFuncDefVisitor(ast).get_tapa_top_func_header()
 
 
-def get_tapa_top(ast: c_ast.FileAST) -> str:
+def get_tapa_top(ast: c_ast.FileAST, stream_to_depth: Optional[Dict[str, Tuple[str, str]]] = None) -> str:
   header = get_tapa_top_header(ast)
-  stream_def = get_all_streams(ast)
+  stream_def = get_all_streams(ast, stream_to_depth)
   task_def = get_all_tasks(ast)
 
   return f'{header} {{\n{stream_def}\n{task_def}}}'
 
 
-def replace_hls_stream(raw_code: str) -> str:
+def replace_hls_stream(raw_code: str, is_stream_required: bool = True) -> str:
   _temp_code = raw_code
 
   # at this point, we have not yet determined the stream direction, so use a placeholder
   _temp_code, change_count = re.subn(r'hls::stream', 'tapa::stream', _temp_code)
-  if change_count == 0:
+  if change_count == 0 and is_stream_required:
     logging.error(f'fail to replace hls::stream. Possibly the user has specified "using namespace hls;", not supported yet')
-    import pdb; pdb.set_trace()
     raise NotImplementedError
   _temp_code = re.sub(r'read_nb', 'try_read', _temp_code)
   _temp_code = re.sub(r'write_nb', 'try_write', _temp_code)
   return _temp_code
 
-def replace_top_func(raw_code: str, top_name: str, ast: c_ast.FileAST) -> str:
-  tapa_top_func = get_tapa_top(ast)
+def replace_top_func(
+    raw_code: str, 
+    top_name: str, 
+    ast: c_ast.FileAST, 
+    stream_to_depth: Optional[Dict[str, Tuple[str, str]]] = None,
+) -> str:
+  tapa_top_func = get_tapa_top(ast, stream_to_depth)
   start_index, end_index = get_func_range(raw_code, top_name)
   return raw_code[:start_index] + tapa_top_func + raw_code[end_index+1:]
 
 
-def replace_task_pointers(raw_code, top_func_ast: c_ast.FileAST) -> str:
+def get_task_mmap_param_types(top_func_ast: c_ast.FileAST) -> Dict[str, Dict[int, str]]:
+  """
+  task name -> index of the pointer param -> the tapa::mmap type that replaces it
+  """
   task_visitor = GetTaskVisitor(top_func_ast)
   top_func_visitor = GetTapaFuncDefVisitor(top_func_ast)
 
@@ -265,6 +312,17 @@ def replace_task_pointers(raw_code, top_func_ast: c_ast.FileAST) -> str:
         index = task.arg_list.index(arg)
         task_to_param_index_to_type[task.task_name][index] = type
 
+  return task_to_param_index_to_type
+
+
+def replace_pointer_param(param_str: str, type: str) -> str:
+  assert '*' in param_str, f'trying to replace a non-pointer argument with tapa::mmap'
+  return '\n\t' + type + ' ' + param_str.split('*')[-1]
+
+
+def replace_task_pointers(raw_code, top_func_ast: c_ast.FileAST) -> str:
+  task_to_param_index_to_type = get_task_mmap_param_types(top_func_ast)
+
   # FIXME: remove all comments beforehand
   for task_name, param_index_to_type in task_to_param_index_to_type.items():
     for index, type in param_index_to_type.items():
@@ -274,8 +332,7 @@ def replace_task_pointers(raw_code, top_func_ast: c_ast.FileAST) -> str:
       param_list_str_range = match.span(1)
 
       param_list = param_list_str.split(',')
-      assert '*' in param_list[index], f'trying to replace a non-pointer argument with tapa::mmap'
-      param_list[index] = '\n\t' + type + ' ' + param_list[index].split('*')[-1]
+      param_list[index] = replace_pointer_param(param_list[index], type)
 
       raw_code = raw_code[:param_list_str_range[0]] + ','.join(param_list) + raw_code[param_list_str_range[1]:]
   
@@ -293,34 +350,54 @@ def add_extra_newline_to_curly_braces(raw_code: str) -> str:
   """ prevent troubles in parsing functions """
   return raw_code.replace('{', '{\n').replace('}', '}\n')
 
-def remove_comments(raw_code: str) -> str:
-  """ from stackoverflow.com/questions/241327/remove-c-and-c-comments-using-python
-  """
-  def replacer(match):
-    s = match.group(0)
-    if s.startswith('/'):
-      return " " # note: a space and not an empty string
-    else:
-      return s
-  pattern = re.compile(
-    r'//.*?$|/\*.*?\*/|\'(?:\\.|[^\\\'])*\'|"(?:\\.|[^\\"])*"',
-    re.DOTALL | re.MULTILINE
-  )
-  return re.sub(pattern, replacer, raw_code)
+def apply_rewrites(raw_code: str, rewrite_list: List[Callable[[str], str]]) -> str:
+  _temp_code = raw_code
+  with stage('rewrite_source'):
+    for rewrite in rewrite_list:
+      _temp_code = rewrite(_temp_code)
+      count('regex_scans')
+      count('bytes_scanned', len(_temp_code))
+  return _temp_code
 
-def get_tapa_init_version(top_path, top_name) -> str:
+
+def get_shared_init_version(raw_code: str, is_stream_required: bool = True) -> str:
+  """
+  the rewrites that do not depend on the top function.
+  The result can be shared by all top functions of the same source
+  """
+  return apply_rewrites(raw_code, [
+    remove_comments,
+    add_space_around_ref_and_ptr,
+    add_extra_newline_to_curly_braces,
+    lambda code: replace_hls_stream(code, is_stream_required),
+    replace_header_file,
+  ])
+
+
+def get_tapa_init_version_from_shared(shared_code: str, top_name: str, ast: c_ast.FileAST) -> str:
+  return apply_rewrites(shared_code, [
+    lambda code: replace_top_func(code, top_name, ast),
+    lambda code: replace_task_pointers(code, ast),
+  ])
+
+
+def get_tapa_init_version_from_source(
+    raw_code: str, 
+    top_name: str, 
+    use_cpp: bool = False, 
+    ast: Optional[c_ast.FileAST] = None,
+) -> str:
   """
   the result is almost the final tapa code
-  however, the stream directions have not been determined
+  however, the stream directions have not been determined.
+  Pass the ast of the top func to skip parsing it again
   """
-  ast = get_top_ast(top_path, top_name)
-  _temp_code = open(top_path, 'r').read()
-  _temp_code = remove_comments(_temp_code)
-  _temp_code = add_space_around_ref_and_ptr(_temp_code)
-  _temp_code = add_extra_newline_to_curly_braces(_temp_code)
-  _temp_code = replace_hls_stream(_temp_code)
-  _temp_code = replace_top_func(_temp_code, top_name, ast)
-  _temp_code = replace_task_pointers(_temp_code, ast)
-  _temp_code = replace_header_file(_temp_code)
-  return _temp_code
+  with stage('get_tapa_init_version'):
+    if ast is None:
+      ast = get_top_ast_from_source(raw_code, top_name, use_cpp)
+
+    return get_tapa_init_version_from_shared(get_shared_init_version(raw_code), top_name, ast)
 
+
+def get_tapa_init_version(top_path, top_name) -> str:
+  return get_tapa_init_version_from_source(read_source(top_path), top_name)
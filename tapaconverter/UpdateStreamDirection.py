@@ -1,4 +1,3 @@
-from functools import cmp_to_key
 from typing import *
 from tapaconverter.AnalyzeStreamDirectionByOperation import (
   extract_functions, 
@@ -6,35 +5,92 @@ from tapaconverter.AnalyzeStreamDirectionByOperation import (
   Func,
 )
 from tapaconverter.AnalyzeStreamDirectionByFuncCall import populate_stream_dir
-from tapaconverter.common import get_func_range
+from tapaconverter.Profile import count, stage
+from tapaconverter.SourceBuffer import SourceBuffer
+from tapaconverter.common import read_source
 
 
-
-def update_whole_file(whole_file: str, updated_func: Func) -> str:
+def update_stream_directions_from_source(
+    raw_code: str, 
+    top_name: str, 
+    max_workers: int = 1, 
+    pool_type: str = 'process',
+) -> str:
   """
-  first determine the range of the function in the whole file
-  then replace
+  the signatures and the stream operations of the functions are analyzed by max_workers threads or processes
   """
-  func_range = get_func_range(whole_file, updated_func.name)
-  return whole_file[:func_range[0]] + updated_func.get_text() + whole_file[func_range[1]:]
+  with stage('update_stream_directions'):
+    buffer = SourceBuffer(raw_code)
+    with stage('extract_functions'):
+      func_list: List[Func] = extract_functions(buffer, max_workers, pool_type)
+    # filter out the top func
+    func_list = [func for func in func_list if func.name != top_name]
+    count('functions', len(func_list))
 
+    # update params based on stream operations
+    with stage('update_stream_dir_by_operation'):
+      for func in func_list:
+        update_stream_dir_by_operation(func)
+    count('stream_op_conflicts', sum(len(func.stream_op_conflicts) for func in func_list))
 
-def update_stream_directions(filename, top_name) -> str:
-  func_list: List[Func] = extract_functions(filename)
-  # filter out the top func
-  func_list = [func for func in func_list if func.name != top_name]
+    # update params based on subcalls
+    with stage('populate_stream_dir'):
+      solver = populate_stream_dir(func_list)
+    count('call_sites', sum(len(func_calls) for func_calls in solver.func_to_func_calls.values()))
+    count('fixed_point_iterations', solver.iteration_count)
+    count('stream_dir_conflicts', len(solver.conflicts))
+    count('recursive_cycles', len(solver.cycles))
 
-  curr_text = open(filename, 'r').read()
+    # all param updates are recorded as patches of the buffer
+    with stage('materialize'):
+      tapa_cpp = buffer.materialize()
+    count('bytes_rewritten', buffer.get_patched_bytes())
 
-  # update params based on stream operations
-  for func in func_list:
-    update_stream_dir_by_operation(func)
-    curr_text = update_whole_file(curr_text, func)
+  return tapa_cpp
 
-  # update params based on subcalls
-  for _ in range(10):  # FIXME
-    populate_stream_dir(func_list)
+
+
+def get_stream_param_types(
+    raw_code: str, 
+    max_workers: int = 1, 
+    pool_type: str = 'process',
+) -> Dict[str, Dict[str, str]]:
+  """
+  analyze all functions of a source, including the top functions.
+  Return func name -> stream param name -> param type
+  """
+  with stage('analyze_stream_directions'):
+    buffer = SourceBuffer(raw_code)
+    func_list: List[Func] = extract_functions(buffer, max_workers, pool_type)
+    count('functions', len(func_list))
     for func in func_list:
-      curr_text = update_whole_file(curr_text, func)
+      update_stream_dir_by_operation(func)
+    populate_stream_dir(func_list)
+
+  return {
+    func.name: {param.param_name: param.param_type for param in func.get_stream_param_list()} 
+    for func in func_list
+  }
 
-  return curr_text
\ No newline at end of file
+
+def apply_stream_param_types(raw_code: str, top_name: str, name_to_param_types: Dict[str, Dict[str, str]]) -> str:
+  """
+  same as update_stream_directions_from_source, but the directions come from a previous analysis
+  """
+  with stage('update_stream_directions'):
+    buffer = SourceBuffer(raw_code)
+    for func in extract_functions(buffer):
+      if func.name == top_name or func.name not in name_to_param_types:
+        continue
+      for param_name, param_type in name_to_param_types[func.name].items():
+        if param_name in func.name_to_param and func.name_to_param[param_name].is_stream:
+          func.check_and_update_param_type_by_name(param_name, param_type)
+
+    tapa_cpp = buffer.materialize()
+    count('bytes_rewritten', buffer.get_patched_bytes())
+
+  return tapa_cpp
+
+
+def update_stream_directions(filename, top_name) -> str:
+  return update_stream_directions_from_source(read_source(filename), top_name)
@@ -0,0 +1,30 @@
+# the public names are imported on first use, so that e.g. the daemon client or
+# --cache_info do not pay for importing pycparser and compiling all patterns
+# The names are resolved by the module __getattr__ of PEP 562, which needs python 3.7
+
+import importlib
+
+NAME_TO_MODULE = {
+  'convert': 'tapaconverter.Convert',
+  'convert_file': 'tapaconverter.Convert',
+  'convert_tops': 'tapaconverter.Convert',
+  'convert_with_graph': 'tapaconverter.Convert',
+  'analyze_dataflow_graph': 'tapaconverter.AnalyzeDataflowGraph',
+  'convert_project': 'tapaconverter.Project',
+  'Profiler': 'tapaconverter.Profile',
+  'profile': 'tapaconverter.Profile',
+}
+
+__all__ = list(NAME_TO_MODULE)
+
+
+def __getattr__(name):
+  if name not in NAME_TO_MODULE:
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+  value = getattr(importlib.import_module(NAME_TO_MODULE[name]), name)
+  globals()[name] = value
+  return value
+
+
+def __dir__():
+  return sorted(set(globals()) | set(__all__))
@@ -1,33 +1,191 @@
+import hashlib
 import logging
+import mmap
+import os
 import re
 
 from typing import *
+from tapaconverter.BraceIndex import get_brace_index
+
+
+def get_converter_version() -> str:
+  """
+  a hash of the sources of the package, so that the cached outputs and the saved incremental states
+  of an older converter are never reused, without having to bump a version by hand
+  """
+  package_dir = os.path.dirname(os.path.abspath(__file__))
+  hasher = hashlib.sha256()
+  for name in sorted(os.listdir(package_dir)):
+    if name.endswith('.py'):
+      hasher.update(name.encode('utf-8'))
+      hasher.update(b'\0')
+      with open(os.path.join(package_dir, name), 'rb') as f:
+        hasher.update(f.read())
+      hasher.update(b'\0')
+  return hasher.hexdigest()[:16]
+
+
+CONVERTER_VERSION = get_converter_version()
+
+# larger sources are decoded straight from a memory map
+MMAP_THRESHOLD_BYTES = 1 << 20
+# the sources are decoded the same way whatever their size, independent of the locale
+SOURCE_ENCODING = 'utf-8'
+
+
+PAREN_PATTERN = re.compile(r'[()]')
+
+Node = TypeVar('Node')
+
+
+def read_source(filename: str) -> str:
+  """
+  read a source file once, to be shared by all stages.
+  Large files are mapped instead of read, so the raw bytes never occupy the heap besides the text
+  """
+  if os.path.getsize(filename) < MMAP_THRESHOLD_BYTES:
+    with open(filename, 'r', encoding=SOURCE_ENCODING) as f:
+      return f.read()
+
+  with open(filename, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+    text = str(memoryview(mapped), SOURCE_ENCODING)
+
+  # same as the universal newlines of text mode
+  if '\r' in text:
+    text = text.replace('\r\n', '\n').replace('\r', '\n')
+  return text
 
-# note that the suffix must be .cpp otherwise ctags will not work
-TEMP_FILE_PATH = '/tmp/tapaconverter.cpp'
 
 def get_func_range(raw_code: str, top_name: str) -> Tuple[int, int]:
-  
-  match_type = '[a-zA-Z0-9_<>:]+'
+  """
+  the end of the function is looked up in the brace index of the source
+  """
+  match_type_char = '[a-zA-Z0-9_<>:]'
   match_mandatory_space = '[ ]+'
   match_optional_space = '[ ]*'
   
-  match = re.search(rf'{match_type}{match_mandatory_space}{top_name}{match_optional_space}\(', raw_code)
+  # find the name first, then extend backwards over the type. Much faster than
+  # trying to match the type at every position
+  match = re.search(rf'(?<={match_type_char}){match_mandatory_space}{top_name}{match_optional_space}\(', raw_code)
   if not match:
     logging.error(f'fail to locate the top function')
     raise NotImplementedError
   start_index = match.start()
+  type_char_pattern = re.compile(match_type_char)
+  while start_index > 0 and type_char_pattern.match(raw_code, start_index - 1):
+    start_index -= 1
+
+  end_index = get_brace_index(raw_code).get_block_end(start_index)
+  assert end_index >= 0, f'Missing "}}" in the top function'
+
+  return (start_index, end_index)
+
+
+def find_matching_paren(raw_code: str, start_index: int) -> int:
+  """
+  given the index of a "(", return the index of the matching ")"
+  """
+  assert raw_code[start_index] == '(', f'expect "(" at index {start_index}'
+  depth = 0
+  for match in PAREN_PATTERN.finditer(raw_code, start_index):
+    if match.group() == '(':
+      depth += 1
+    else:
+      depth -= 1
+      if depth == 0:
+        return match.start()
+
+  return -1
+
+
+def split_top_level_args(arg_str: str) -> List[str]:
+  """
+  split an argument list by the commas that are not nested in (), [] or {}
+  """
+  if not arg_str.strip():
+    return []
+
+  arg_list = []
+  depth = 0
+  begin = 0
+  for i, char in enumerate(arg_str):
+    if char in '([{':
+      depth += 1
+    elif char in ')]}':
+      depth -= 1
+    elif char == ',' and depth == 0:
+      arg_list.append(arg_str[begin:i].strip())
+      begin = i + 1
+  arg_list.append(arg_str[begin:].strip())
+
+  return arg_list
+
+
+def remove_comments(raw_code: str) -> str:
+  """ from stackoverflow.com/questions/241327/remove-c-and-c-comments-using-python
+  """
+  def replacer(match):
+    s = match.group(0)
+    if s.startswith('/'):
+      return " " # note: a space and not an empty string
+    else:
+      return s
+  pattern = re.compile(
+    r'//.*?$|/\*.*?\*/|\'(?:\\.|[^\\\'])*\'|"(?:\\.|[^\\"])*"',
+    re.DOTALL | re.MULTILINE
+  )
+  return re.sub(pattern, replacer, raw_code)
+
+
+def get_strongly_connected_components(
+    node_list: List[Node],
+    node_to_successors: Dict[Node, List[Node]],
+) -> List[List[Node]]:
+  """
+  Tarjan's algorithm without recursion. The components are returned in reverse topological order,
+  i.e. a component comes after all components it reaches
+  """
+  index_of: Dict[Node, int] = {}
+  low_link: Dict[Node, int] = {}
+  stack: List[Node] = []
+  on_stack: Set[Node] = set()
+  component_list: List[List[Node]] = []
+
+  for root in node_list:
+    if root in index_of:
+      continue
+
+    index_of[root] = low_link[root] = len(index_of)
+    stack.append(root)
+    on_stack.add(root)
+    dfs_stack = [(root, iter(node_to_successors[root]))]
+
+    while dfs_stack:
+      node, successor_iter = dfs_stack[-1]
+      successor = next(successor_iter, None)
+      if successor is not None:
+        if successor not in index_of:
+          index_of[successor] = low_link[successor] = len(index_of)
+          stack.append(successor)
+          on_stack.add(successor)
+          dfs_stack.append((successor, iter(node_to_successors[successor])))
+        elif successor in on_stack:
+          low_link[node] = min(low_link[node], index_of[successor])
+        continue
+
+      dfs_stack.pop()
+      if dfs_stack:
+        parent = dfs_stack[-1][0]
+        low_link[parent] = min(low_link[parent], low_link[node])
+
+      if low_link[node] == index_of[node]:
+        component = []
+        while True:
+          member = stack.pop()
+          on_stack.discard(member)
+          component.append(member)
+          if member == node:
+            break
+        component_list.append(component)
 
-  raw_code_crop = raw_code[start_index:]
-  stack = 0
-  init_flag = False
-  for i, char in enumerate(raw_code_crop):
-    if char == '{':
-      init_flag = True
-      stack += 1
-    elif char == '}':
-      stack -= 1
-    if init_flag and stack == 0:
-      return (start_index, start_index + i)
-
-  assert False, f'Missing "}}" in the top function'
\ No newline at end of file
+  return component_list
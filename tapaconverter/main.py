@@ -1,23 +1,127 @@
 import argparse
-import os
+import json
+import sys
+import time
 
-from tapaconverter.common import TEMP_FILE_PATH
-from tapaconverter.Formatter import format_output
-from tapaconverter.TraverseTopAST import get_tapa_init_version
-from tapaconverter.UpdateStreamDirection import update_stream_directions
+# the converter modules are imported by the branches that use them, so that
+# e.g. --cache_info does not pay for importing pycparser
+from tapaconverter.Cache import ConversionCache, DEFAULT_CACHE_DIR, DEFAULT_CACHE_MAX_BYTES
+from tapaconverter.ConvertOptions import add_option_arguments, get_options_from_args, get_task_latency
+from tapaconverter.Profile import profile
 
 if __name__ == '__main__':
   parser = argparse.ArgumentParser()  
-  parser.add_argument('--filename', type=str, required=True)
-  parser.add_argument('--top_name', type=str, required=True)
-  parser.add_argument('--output', type=str, required=True)
+  parser.add_argument('--filename', type=str)
+  parser.add_argument('--top_name', type=str, nargs='+', help='multiple tops of the same file share the analysis')
+  parser.add_argument('--output', type=str, nargs='+', help='one output for each top')
+  parser.add_argument('--project', type=str, nargs='+', help='source and header files of a multi-file design')
+  parser.add_argument('--output_dir', type=str, default=None, help='where the converted files of --project are written')
+  parser.add_argument('--manifest', type=str, help='json list of {filename, top_name, output, options} to convert in batch')
+  parser.add_argument('--jobs', type=int, default=None, help='number of parallel jobs, default to the available cores')
+  parser.add_argument('--summary', type=str, default=None, help='write the batch summary as json to this path')
+  parser.add_argument('--cache', action='store_true', help='reuse the output of identical previous conversions')
+  parser.add_argument('--cache_dir', type=str, default=DEFAULT_CACHE_DIR)
+  parser.add_argument('--cache_max_size', type=int, default=DEFAULT_CACHE_MAX_BYTES // 2**20, help='in MB')
+  parser.add_argument('--cache_info', action='store_true', help='print the cache entries and exit')
+  parser.add_argument('--cache_purge', action='store_true', help='remove all cache entries and exit')
+  parser.add_argument('--profile', type=str, default=None, help='write the per-stage timing and counters as json')
+  parser.add_argument('--stats', action='store_true', help='print the per-stage timing and counters')
+  parser.add_argument('--incremental_state', type=str, default=None, 
+                      help='reuse the per-function analysis saved in this file and update it')
+  parser.add_argument('--watch', action='store_true', help='re-convert incrementally whenever the file changes')
+  parser.add_argument('--watch_interval', type=float, default=0.5, help='in seconds')
+  parser.add_argument('--graph', type=str, default=None, help='write the dataflow graph as json, or as dot if it ends with .dot')
+  parser.add_argument('--analyze', action='store_true', 
+                      help='print the reconvergent paths, the stream cycles and the critical chain of the dataflow graph')
+  add_option_arguments(parser)
   args = parser.parse_args()
 
-  tapa_cpp = get_tapa_init_version(args.filename, args.top_name)
+  task_to_latency = get_task_latency(parser, args)
+  options = get_options_from_args(parser, args)
 
-  open(TEMP_FILE_PATH, 'w').write(tapa_cpp)
-  tapa_cpp = update_stream_directions(TEMP_FILE_PATH, args.top_name)
+  cache = ConversionCache(args.cache_dir, args.cache_max_size * 2**20)
+  if args.cache_info:
+    print(json.dumps({**cache.get_stats(), 'entry_list': cache.list_entries()}, indent=2))
+    sys.exit(0)
+  if args.cache_purge:
+    print(f'removed {cache.purge()} entries from {args.cache_dir}')
+    sys.exit(0)
+  if not args.cache:
+    cache = None
 
-  open(args.output, 'w').write(tapa_cpp)
+  if args.manifest:
+    from tapaconverter.Batch import load_manifest, run_batch, get_summary
+    start = time.perf_counter()
+    result_list = run_batch(load_manifest(args.manifest), args.jobs, cache, options)
+    summary = get_summary(result_list, time.perf_counter() - start)
 
-  format_output(args.output)
\ No newline at end of file
+    for result in result_list:
+      status = 'OK  ' if result.is_success else 'FAIL'
+      print(f'{status} {result.elapsed:8.3f}s {result.job.filename} ({result.job.top_name})')
+    print(f'{summary["success"]} succeeded, {summary["failure"]} failed in {summary["wall_time"]:.3f}s')
+
+    if args.summary:
+      open(args.summary, 'w').write(json.dumps(summary, indent=2))
+    if args.profile or args.stats:
+      profile_list = [{**result.job.to_dict(), 'profile': result.profiler.to_dict()} for result in result_list]
+      if args.profile:
+        open(args.profile, 'w').write(json.dumps(profile_list, indent=2))
+      if args.stats:
+        print(json.dumps(profile_list, indent=2))
+    sys.exit(1 if summary['failure'] else 0)
+
+  if args.project:
+    if not (args.top_name and args.output_dir) or len(args.top_name) > 1:
+      parser.error('--project requires a single --top_name and --output_dir')
+    from tapaconverter.Project import convert_project
+    with profile() as profiler:
+      convert_project(args.project, args.top_name[0], args.output_dir, args.jobs, **options)
+    if args.profile:
+      open(args.profile, 'w').write(profiler.to_json())
+    if args.stats:
+      print(profiler.to_json())
+    sys.exit(0)
+
+  if not (args.filename and args.top_name and args.output):
+    parser.error('--filename, --top_name and --output are required without --manifest')
+  if len(args.top_name) != len(args.output):
+    parser.error('--top_name and --output must have the same number of values')
+  if (args.watch or args.incremental_state) and len(args.top_name) > 1:
+    parser.error('--watch and --incremental_state only support a single top')
+  if (args.graph or args.analyze) and (len(args.top_name) > 1 or args.watch or args.incremental_state):
+    parser.error('--graph and --analyze only support a single top without --watch and --incremental_state')
+
+  if args.watch:
+    from tapaconverter.Incremental import watch
+    try:
+      watch(args.filename, args.top_name[0], args.output[0], args.watch_interval, args.incremental_state, **options)
+    except KeyboardInterrupt:
+      pass
+    sys.exit(0)
+
+  from tapaconverter.Convert import convert_file
+  from tapaconverter.Incremental import IncrementalConverter
+  from tapaconverter.common import read_source
+
+  with profile() as profiler:
+    if args.incremental_state:
+      converter = IncrementalConverter.load(args.incremental_state, args.top_name[0], **options)
+      open(args.output[0], 'w').write(converter.convert(read_source(args.filename)))
+      converter.save(args.incremental_state)
+    elif args.graph or args.analyze:
+      from tapaconverter.Convert import convert_with_graph
+      tapa_cpp, graph = convert_with_graph(read_source(args.filename), args.top_name[0], **options)
+      open(args.output[0], 'w').write(tapa_cpp)
+    else:
+      convert_file(args.filename, args.top_name, args.output, cache=cache, **options)
+
+  if args.graph:
+    open(args.graph, 'w').write(graph.to_dot() if args.graph.endswith('.dot') else graph.to_json())
+  if args.analyze:
+    from tapaconverter.AnalyzeDataflowGraph import analyze_dataflow_graph
+    print(json.dumps(analyze_dataflow_graph(graph, task_to_latency).to_dict(), indent=2))
+
+  if args.profile:
+    open(args.profile, 'w').write(profiler.to_json())
+  if args.stats:
+    print(profiler.to_json())
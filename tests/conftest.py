@@ -0,0 +1,51 @@
+# the corpus shared by the tests
+# - a test with a "case" param runs on every case of the corpus
+# - a test with a "sample" param runs on the input of every case of the corpus and
+#   on the designs of the DESIGN_CONFIGS of its module
+# a module leaves out the cases in its SKIPPED_CASES
+
+import os
+
+import pytest
+
+from tapaconverter.GenerateDesign import generate_design
+from tapaconverter.Regression import load_corpus
+
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'corpus')
+CORPUS_CASES = load_corpus(CORPUS_DIR)
+
+
+class Sample:
+  """
+  a source to convert, from the corpus or generated
+  """
+  def __init__(self, name, source, top_name, options):
+    self.name = name
+    self.source = source
+    self.top_name = top_name
+    self.options = options
+
+
+def get_samples(module):
+  skipped_cases = getattr(module, 'SKIPPED_CASES', ())
+  sample_list = [
+    Sample(f'corpus/{case.name}', open(case.input_path).read(), case.top_name, case.options)
+    for case in CORPUS_CASES if case.name not in skipped_cases
+  ]
+  for name, config in getattr(module, 'DESIGN_CONFIGS', {}).items():
+    sample_list.append(Sample(f'design/{name}', generate_design(config), config.top_name, {}))
+  return sample_list
+
+
+def pytest_generate_tests(metafunc):
+  skipped_cases = getattr(metafunc.module, 'SKIPPED_CASES', ())
+  if 'case' in metafunc.fixturenames:
+    case_list = [case for case in CORPUS_CASES if case.name not in skipped_cases]
+    metafunc.parametrize('case', case_list, ids=lambda case: case.name)
+  if 'sample' in metafunc.fixturenames:
+    metafunc.parametrize('sample', get_samples(metafunc.module), ids=lambda sample: sample.name)
+
+
+@pytest.fixture
+def corpus_dir():
+  return CORPUS_DIR
@@ -0,0 +1,33 @@
+import pytest
+
+from tapaconverter.Convert import convert
+from tapaconverter.GenerateDesign import DesignConfig, generate_design
+from tapaconverter.Incremental import IncrementalConverter
+from tapaconverter.Profile import profile
+
+SOURCE = generate_design(DesignConfig(num_tasks=256))
+
+
+@pytest.mark.parametrize('pool', ['thread', 'process'])
+def test_counters_of_workers(pool):
+  with profile() as serial_profiler:
+    expected = convert(SOURCE, 'top')
+  with profile() as profiler:
+    assert convert(SOURCE, 'top', analysis_workers=4, analysis_pool=pool) == expected
+  assert profiler.counters['analysis_chunks'] > 1
+  assert profiler.counters['stream_ops'] == serial_profiler.counters['stream_ops']
+
+
+def test_incremental_with_workers(tmp_path):
+  expected = convert(SOURCE, 'top')
+  converter = IncrementalConverter('top', analysis_workers=4, analysis_pool='thread')
+  with profile() as profiler:
+    assert converter.convert(SOURCE) == expected
+  assert profiler.counters['analysis_chunks'] > 1
+
+  state_path = str(tmp_path / 'state.pkl')
+  converter.save(state_path)
+  loaded = IncrementalConverter.load(state_path, 'top')
+  assert loaded.name_to_state
+  assert loaded.options['analysis_workers'] == 1
+  assert loaded.convert(SOURCE) == expected
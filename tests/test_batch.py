@@ -0,0 +1,38 @@
+import json
+import os
+import pytest
+
+from tapaconverter.Batch import load_manifest, run_batch
+from tapaconverter.Convert import convert
+from tapaconverter.common import read_source
+
+
+def write_manifest(tmp_path, entry_list) -> str:
+  manifest_path = tmp_path / 'manifest.json'
+  manifest_path.write_text(json.dumps(entry_list))
+  return str(manifest_path)
+
+
+def test_options_reach_every_job(corpus_dir, tmp_path):
+  """
+  the options of the batch apply to the jobs, the options of a job take precedence
+  """
+  source_path = os.path.join(corpus_dir, 'stream_array', 'input.cpp')
+  manifest_path = write_manifest(tmp_path, [
+    {'filename': source_path, 'top_name': 'top', 'output': 'batch.cpp'},
+    {'filename': source_path, 'top_name': 'top', 'output': 'job.cpp', 'options': {'format': False}},
+  ])
+  result_list = run_batch(load_manifest(manifest_path), 2, options={'size_fifos': True})
+  assert all(result.is_success for result in result_list)
+
+  source = read_source(source_path)
+  assert (tmp_path / 'batch.cpp').read_text() == convert(source, 'top', size_fifos=True)
+  assert (tmp_path / 'job.cpp').read_text() == convert(source, 'top', size_fifos=True, format=False)
+
+
+def test_unknown_option_in_manifest(tmp_path):
+  manifest_path = write_manifest(tmp_path, [
+    {'filename': 'a.cpp', 'top_name': 'top', 'output': 'a_tapa.cpp', 'options': {'fifo_size': True}},
+  ])
+  with pytest.raises(TypeError):
+    load_manifest(manifest_path)
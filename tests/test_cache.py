@@ -0,0 +1,20 @@
+import os
+
+from tapaconverter.Cache import ConversionCache
+from tapaconverter.Convert import convert_file
+
+
+def test_key_ignores_output_neutral_options(tmp_path):
+  cache = ConversionCache(str(tmp_path))
+  key = cache.get_key('void top() {}', 'top', {'use_cpp': False})
+  assert cache.get_key('void top() {}', 'top', {'use_cpp': False, 'analysis_workers': 4, 'analysis_pool': 'thread'}) == key
+  assert cache.get_key('void top() {}', 'top', {'use_cpp': True}) != key
+
+
+def test_hit_with_other_workers(corpus_dir, tmp_path):
+  source_path = os.path.join(corpus_dir, 'vadd', 'input.cpp')
+  cache = ConversionCache(str(tmp_path / 'cache'))
+  convert_file(source_path, 'vadd', str(tmp_path / 'out1.cpp'), cache=cache)
+  convert_file(source_path, 'vadd', str(tmp_path / 'out2.cpp'), cache=cache, analysis_workers=2, analysis_pool='thread')
+  assert len(cache.list_entries()) == 1
+  assert (tmp_path / 'out1.cpp').read_text() == (tmp_path / 'out2.cpp').read_text()
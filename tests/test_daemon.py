@@ -0,0 +1,84 @@
+import errno
+import os
+import socket
+import tempfile
+import threading
+
+import pytest
+
+from tapaconverter.Client import get_default_socket_path, send_request
+from tapaconverter.Daemon import UnixDaemon, make_private_dir
+from tapaconverter.Regression import compare_tokens, load_corpus
+
+
+@pytest.fixture
+def socket_path(tmp_path):
+  return str(tmp_path / 'daemon.sock')
+
+
+def test_default_socket_path(monkeypatch):
+  monkeypatch.setenv('XDG_RUNTIME_DIR', '/run/user/1000')
+  assert get_default_socket_path() == '/run/user/1000/tapaconverter.sock'
+  monkeypatch.delenv('XDG_RUNTIME_DIR')
+  assert os.path.dirname(get_default_socket_path()) == os.path.join(tempfile.gettempdir(), f'tapaconverter-{os.getuid()}')
+
+
+def test_private_dir(tmp_path):
+  dir_path = str(tmp_path / 'private')
+  make_private_dir(dir_path)
+  assert os.stat(dir_path).st_mode & 0o777 == 0o700
+  # reused as is
+  make_private_dir(dir_path)
+
+  shared_path = str(tmp_path / 'shared')
+  os.mkdir(shared_path)
+  os.chmod(shared_path, 0o777)
+  with pytest.raises(PermissionError):
+    make_private_dir(shared_path)
+
+
+def test_refuse_socket_of_other_user(socket_path, monkeypatch):
+  with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as other:
+    other.bind(socket_path)
+    other.listen()
+    uid = os.getuid()
+    monkeypatch.setattr(os, 'getuid', lambda: uid + 1)
+    with pytest.raises(PermissionError):
+      send_request({'command': 'ping'}, socket_path)
+
+
+def test_refuse_live_socket(socket_path):
+  with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as other:
+    other.bind(socket_path)
+    other.listen()
+    with pytest.raises(OSError) as info:
+      UnixDaemon(socket_path, 1)
+    assert info.value.errno == errno.EADDRINUSE
+    assert os.path.exists(socket_path)
+
+
+def test_convert_with_options(socket_path, corpus_dir, tmp_path):
+  # a socket file left by a dead daemon is replaced
+  with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as dead:
+    dead.bind(socket_path)
+
+  server = UnixDaemon(socket_path, 1)
+  thread = threading.Thread(target=server.serve_forever)
+  thread.start()
+  try:
+    assert os.stat(socket_path).st_mode & 0o777 == 0o600
+    for case in load_corpus(corpus_dir, ['fifo_sizing', 'gen_hier']):
+      output = str(tmp_path / f'{case.name}.cpp')
+      response = send_request({
+        'command': 'convert',
+        'filename': case.input_path,
+        'top_name': [case.top_name],
+        'output': [output],
+        'options': case.options,
+      }, socket_path)
+      assert response['success'], response['error']
+      assert compare_tokens(open(case.expected_path).read(), open(output).read()) is None
+  finally:
+    server.shutdown()
+    thread.join()
+    server.server_close()
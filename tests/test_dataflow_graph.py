@@ -0,0 +1,47 @@
+from tapaconverter.AnalyzeDataflowGraph import analyze_dataflow_graph
+from tapaconverter.Convert import convert_with_graph
+from tapaconverter.common import get_strongly_connected_components
+
+STREAM_ARRAY_SOURCE = '''
+#include <hls_stream.h>
+
+void src(hls::stream<int>& out, int n) {
+  for (int i = 0; i < n; i++) {
+    out.write(i);
+  }
+}
+
+void dst(hls::stream<int>& in, int* mem, int n) {
+  for (int i = 0; i < n; i++) {
+    mem[i] = in.read();
+  }
+}
+
+void top(int* mem0, int* mem1, int n) {
+#pragma HLS dataflow
+  hls::stream<int> s[2];
+#pragma HLS stream variable=s depth=8
+  src(s[0], n);
+  src(s[1], n);
+  dst(s[0], mem0, n);
+  dst(s[1], mem1, n);
+}
+'''
+
+
+def test_stream_array_elements():
+  _, graph = convert_with_graph(STREAM_ARRAY_SOURCE, 'top')
+  stream = graph.name_to_stream['s']
+  assert stream.producers == ['src[0]', 'src[1]']
+  assert stream.consumers == ['dst[0]', 'dst[1]']
+  assert [(producer, consumer) for producer, consumer, _ in graph.get_edges()] == [
+    ('src[0]', 'dst[0]'),
+    ('src[1]', 'dst[1]'),
+  ]
+  assert analyze_dataflow_graph(graph).unconnected_stream_list == []
+
+
+def test_strongly_connected_components():
+  node_to_successors = {'a': ['b'], 'b': ['c', 'd'], 'c': ['b'], 'd': []}
+  component_list = get_strongly_connected_components(['a', 'b', 'c', 'd'], node_to_successors)
+  assert [sorted(component) for component in component_list] == [['d'], ['b', 'c'], ['a']]
@@ -0,0 +1,82 @@
+import re
+import shutil
+import subprocess
+
+import pytest
+
+from tapaconverter.Convert import convert
+from tapaconverter.Formatter import format_source
+from tapaconverter.GenerateDesign import DesignConfig
+
+# the options and the post-processing of the astyle based formatter that Formatter replaces
+ASTYLE_OPTIONS = [
+  '--delete-empty-lines',
+  '--align-reference=type',
+  '--align-pointer=type',
+  '--convert-tabs',
+  '--unpad-paren',
+  '--pad-paren-in',
+]
+
+DESIGN_CONFIGS = {
+  'chain': DesignConfig(num_tasks=8),
+  'lanes': DesignConfig(num_tasks=6, num_lanes=3, num_template_types=3),
+  'hier': DesignConfig(num_tasks=5, hier_depth=2, num_mmaps=4, num_depth_pragmas=2),
+}
+
+
+def run_astyle(contents):
+  contents = subprocess.run(['astyle'] + ASTYLE_OPTIONS, input=contents, capture_output=True, text=True, check=True).stdout
+  contents = re.sub(r'(\S ) +', r'\1', contents)
+  return re.sub(r'(\n\n)\n+', r'\n\n', contents)
+
+
+@pytest.fixture(params=['input', 'tapa'])
+def source(request, sample):
+  """
+  the source of the sample, or its unformatted conversion
+  """
+  if request.param == 'tapa':
+    return convert(sample.source, sample.top_name, **{**sample.options, 'format': False})
+  return sample.source
+
+
+@pytest.mark.skipif(shutil.which('astyle') is None, reason='astyle is not installed')
+def test_same_as_astyle(source):
+  assert format_source(source) == run_astyle(source)
+
+
+@pytest.mark.skipif(shutil.which('astyle') is None, reason='astyle is not installed')
+@pytest.mark.parametrize('source', [
+  # a prototype with unnamed params, as left by the project conversion
+  'void consume(tapa::stream<int> & ,\n\ttapa::mmap<int >&  , int);\n',
+  'x = g("s"  , c /* c */ , d);\nint a  , b;\n',
+  # the statements after a label get their own lines
+  'switch (k) {\ncase 0: acc += v; break;\ncase A::B: /* b */ f(a,\nb);\ndefault: break;\n}\nL: x++;\n',
+  # the continuation of a body on the line of its header is indented one more level
+  'if (i > 2) acc += 1;\nelse acc = helper(i,\n n);\nfor (;;) y =\n3;\nif (x) int a[] = {1,\n2};\n',
+])
+def test_snippet_same_as_astyle(source):
+  assert format_source(source) == run_astyle(source)
+
+
+def test_no_space_before_comma():
+  assert format_source('f(a , data & , b);\n') == 'f( a, data &, b );\n'
+
+
+@pytest.mark.parametrize('code', [
+  'int x = ( a & b );',
+  'foo( a * b, c & d );',
+  'if( a & b ) {\n    c = d * e;\n}',
+])
+def test_expressions_unchanged(code):
+  assert format_source(code + '\n') == code + '\n'
+
+
+def test_pointer_aligned_to_type():
+  assert format_source('void f( int * a, data_t & b );\n') == 'void f( int* a, data_t& b );\n'
+
+
+def test_template_header_is_a_statement():
+  code = 'template <typename T>\nvoid f( T a ) {\n    g( a );\n}\n'
+  assert format_source(code) == code
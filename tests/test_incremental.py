@@ -0,0 +1,70 @@
+from tapaconverter.Convert import convert
+from tapaconverter.Incremental import IncrementalConverter
+
+LEAF = '''void leaf(hls::stream<int>& o, int n) {
+  for (int i = 0; i < n; i++) {
+    o.write(i);
+  }
+}
+
+'''
+
+HELPER = '''void helper(hls::stream<int>& o, int n) {
+  o.write(n);
+}
+
+'''
+
+SOURCE = '''#include <hls_stream.h>
+
+''' + LEAF + '''void wrap(hls::stream<int>& o, int n) {
+  leaf(o, n);
+  helper(o, n);
+}
+
+void sink(hls::stream<int>& in, int* mem, int n) {
+  for (int i = 0; i < n; i++) {
+    mem[i] = in.read();
+  }
+}
+
+void top(int* mem, int n) {
+#pragma HLS dataflow
+  hls::stream<int> s;
+  wrap(s, n);
+  sink(s, mem, n);
+}
+'''
+
+# each edit applies to the source of the previous one
+EDITS = [
+  # the only callee of wrap that is defined is removed, wrap itself is unchanged
+  ('remove_callee', lambda source: source.replace(LEAF, '')),
+  # a callee of the unchanged wrap is added
+  ('add_callee', lambda source: source.replace('void wrap', HELPER + 'void wrap')),
+  ('edit_callee', lambda source: source.replace('o.write(n);', 'n = o.read();')),
+  ('add_leaf_back', lambda source: source.replace('void helper', LEAF + 'void helper')),
+  ('remove_all_callees', lambda source: source.replace(LEAF, '').replace(HELPER, '')),
+]
+
+
+def test_same_as_convert_after_edits():
+  converter = IncrementalConverter('top')
+  source = SOURCE
+  assert converter.convert(source) == convert(source, 'top')
+  for name, edit in EDITS:
+    source = edit(source)
+    assert converter.convert(source) == convert(source, 'top'), name
+
+
+def test_same_as_convert_after_edits_with_saved_state(tmp_path):
+  state_path = str(tmp_path / 'state.pkl')
+  source = SOURCE
+  converter = IncrementalConverter('top')
+  converter.convert(source)
+  converter.save(state_path)
+  for name, edit in EDITS:
+    converter = IncrementalConverter.load(state_path, 'top')
+    source = edit(source)
+    assert converter.convert(source) == convert(source, 'top'), name
+    converter.save(state_path)
@@ -0,0 +1,54 @@
+import re
+import shutil
+import subprocess
+
+import pytest
+
+from tapaconverter.GenerateDesign import DesignConfig
+from tapaconverter.IndexFunctions import index_functions
+from tapaconverter.TraverseTopAST import get_tapa_init_version_from_source
+from tapaconverter.common import get_func_range
+
+DESIGN_CONFIGS = {
+  'chain': DesignConfig(num_tasks=8),
+  'hier': DesignConfig(num_tasks=5, hier_depth=3, num_lanes=2),
+}
+
+
+@pytest.fixture(params=['input', 'init'])
+def source(request, sample):
+  """
+  the source of the sample, or its init version
+  """
+  if request.param == 'init':
+    return get_tapa_init_version_from_source(sample.source, sample.top_name)
+  return sample.source
+
+
+def test_same_range_as_get_func_range(source):
+  """
+  the ranges of the functions were computed by get_func_range for each tag of ctags
+  """
+  func_def_list = [func_def for func_def in index_functions(source) if func_def.is_definition]
+  assert func_def_list
+  for func_def in func_def_list:
+    assert func_def.func_range == get_func_range(source, func_def.name), func_def.name
+    assert source[func_def.body_range[1]] == '}'
+
+
+@pytest.mark.skipif(shutil.which('ctags') is None, reason='ctags is not installed')
+def test_same_functions_as_ctags(source, tmp_path):
+  """
+  the functions and their return types, as the ctags based extraction found them
+  """
+  path = str(tmp_path / 'source.cpp')
+  open(path, 'w').write(source)
+  out = subprocess.run(['ctags', '-x', '--c++-kinds=f', path], capture_output=True, text=True, check=True).stdout
+  expected = []
+  for tag in out.strip().split('\n'):
+    func_name = re.search(r'(\S+)\s+function', tag).group(1)
+    func_type = re.search(rf'{re.escape(path)}\s+(\S+)\s+{func_name}', tag).group(1)
+    expected.append((func_name, func_type))
+
+  actual = [(func_def.name, func_def.return_type) for func_def in index_functions(source) if func_def.is_definition]
+  assert sorted(actual) == sorted(expected)
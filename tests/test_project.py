@@ -0,0 +1,66 @@
+import logging
+
+from tapaconverter.AnalyzeStreamDirectionByOperation import has_unnamed_params, parse_param_list_text
+from tapaconverter.Project import convert_project
+
+HEADER = '''#include <hls_stream.h>
+
+int get_n();
+void produce(hls::stream<int>& out, int n);
+void consume(hls::stream<int>&, int*, int);
+'''
+
+TASKS = '''#include "tasks.h"
+
+int get_n() {
+  return 16;
+}
+
+void produce(hls::stream<int>& out, int n) {
+  for (int i = 0; i < n; i++) {
+    out.write(i);
+  }
+}
+
+void consume(hls::stream<int>& in, int* mem, int n) {
+  for (int i = 0; i < n; i++) {
+    mem[i] = in.read();
+  }
+}
+'''
+
+TOP = '''#include "tasks.h"
+
+void top(int* mem, int n) {
+#pragma HLS dataflow
+  hls::stream<int> s;
+  produce(s, n);
+  consume(s, mem, n);
+}
+'''
+
+
+def test_param_list_without_params():
+  assert parse_param_list_text('') == ()
+  assert parse_param_list_text(' void ') == ()
+  assert not has_unnamed_params('')
+
+
+def test_unnamed_params():
+  assert has_unnamed_params('hls::stream<int>&, int*, int')
+  assert has_unnamed_params('int a, unsigned int')
+  assert not has_unnamed_params('hls::stream<int>& s, const data_t* p, int buf[16]')
+
+
+def test_prototypes(tmp_path, caplog):
+  filenames = []
+  for name, text in [('tasks.h', HEADER), ('tasks.cpp', TASKS), ('top.cpp', TOP)]:
+    (tmp_path / name).write_text(text)
+    filenames.append(str(tmp_path / name))
+
+  with caplog.at_level(logging.WARNING):
+    filename_to_code = convert_project(filenames, 'top', max_workers=1)
+  header = filename_to_code[filenames[0]]
+  assert 'int get_n();' in header
+  assert 'tapa::ostream<int>& out' in header.replace(' &', '&')
+  assert 'skip the prototype of consume' in caplog.text
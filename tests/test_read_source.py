@@ -0,0 +1,15 @@
+import pytest
+
+from tapaconverter import common
+from tapaconverter.common import read_source
+
+# a comment with non-ascii chars, e.g. by a non-english author
+SOURCE = '// résumé 数据流\r\nvoid f() {}\r\n'
+
+
+@pytest.mark.parametrize('threshold', [1 << 20, 0])
+def test_same_text_on_both_paths(tmp_path, monkeypatch, threshold):
+  path = tmp_path / 'a.cpp'
+  path.write_bytes(SOURCE.encode('utf-8'))
+  monkeypatch.setattr(common, 'MMAP_THRESHOLD_BYTES', threshold)
+  assert read_source(str(path)) == SOURCE.replace('\r\n', '\n')
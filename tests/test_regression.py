@@ -0,0 +1,10 @@
+import pytest
+
+from tapaconverter.Regression import run_case
+
+
+@pytest.mark.parametrize('driver', ['library', 'cli'])
+def test_corpus(case, driver):
+  result = run_case(case, driver, repeat=1)
+  assert result.error is None, result.error
+  assert result.mismatch is None, result.mismatch
@@ -0,0 +1,54 @@
+import re
+
+import pytest
+
+from tapaconverter.AnalyzeStreamDirectionByOperation import parse_param_list_text
+from tapaconverter.Convert import convert
+from tapaconverter.GenerateDesign import DesignConfig, generate_design
+from tapaconverter.IndexFunctions import index_functions
+
+
+def get_stream_param_types(code):
+  """
+  function name -> the types of its stream params, without spaces
+  """
+  name_to_types = {}
+  for func_def in index_functions(code):
+    if func_def.is_definition:
+      param_list = parse_param_list_text(code[func_def.param_range[0]:func_def.param_range[1]])
+      name_to_types[func_def.name] = [re.sub(r'\s', '', param.param_type) for param in param_list if param.is_stream]
+  return name_to_types
+
+
+def test_same_as_expected(case):
+  """
+  the expected outputs of the corpus come from the converter with the fixed number of passes,
+  except for fifo_sizing, nonblocking_read, stream_array and template_commas, see the notes in their case.json
+  """
+  output = convert(open(case.input_path).read(), case.top_name, **{**case.options, 'format': False})
+  assert get_stream_param_types(output) == get_stream_param_types(open(case.expected_path).read())
+
+
+def reverse_tasks(code):
+  """
+  put the wrappers before the functions they call. The generated design defines the leaves first,
+  so a single pass in the order of the source would already reach the outermost wrapper
+  """
+  block_list = code.split('\n\n')
+  task_indices = [i for i, block in enumerate(block_list) if block.startswith('void task_')]
+  for i, block in zip(task_indices, reversed([block_list[i] for i in task_indices])):
+    block_list[i] = block
+  return '\n\n'.join(block_list)
+
+
+def test_deep_hierarchy():
+  """
+  the fixed 10 passes could not reach the leaves of a hierarchy deeper than 10 levels
+  """
+  config = DesignConfig(num_tasks=3, hier_depth=14)
+  code = reverse_tasks(generate_design(config))
+  assert code.index('void task_0_hier_14(') < code.index('void task_0(')
+  name_to_types = get_stream_param_types(convert(code, config.top_name, format=False))
+  undetermined = {name: types for name, types in name_to_types.items() if any('::stream<' in t for t in types)}
+  assert len(name_to_types) > 14
+  assert undetermined == {}
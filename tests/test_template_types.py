@@ -0,0 +1,93 @@
+import re
+
+import pytest
+from pycparser import c_ast, c_generator
+
+from tapaconverter.GenerateDesign import DesignConfig
+from tapaconverter.ParseTop import (
+  RevertFakeTypeVisitor,
+  add_type_defs,
+  get_parser,
+  get_top_ast_from_source,
+  get_top_func,
+  preprocess,
+  remove_stream_names,
+)
+
+# the old rewrite cannot parse multi-argument templates
+SKIPPED_CASES = ['template_commas']
+
+DESIGN_CONFIGS = {
+  'lanes': DesignConfig(num_tasks=6, num_lanes=3, num_template_types=3),
+  'hier': DesignConfig(num_tasks=5, hier_depth=2, num_template_types=4),
+}
+
+
+# the iterative rewrite that the single pass replaced, as the reference.
+# It replaces the innermost template types until nothing changes, and cannot handle commas
+
+def get_old_fake_type(template_type):
+  return template_type.replace('<', '_ANGLE_BRACKET_BEG_') \
+                      .replace('>', '_ANGLE_BRACKET_END_') \
+                      .replace('::', '_DOUBLE_COLON_') \
+                      .replace(' ', '_SPACE_')
+
+
+def get_old_template_types(raw_code):
+  raw_code = re.sub(r'\n', r' ', raw_code)
+  init_list = list(set(re.findall(r'[^ \n\t(<]*[ ]*<[^<>\t\n(){}*&;]+>', raw_code)))
+  return [pattern for pattern in init_list if '#include' not in pattern and 'template' not in pattern]
+
+
+def remove_innermost_template_usage(raw_code):
+  template_types = get_old_template_types(raw_code)
+  for template_type in template_types:
+    raw_code = re.sub(template_type, get_old_fake_type(template_type), raw_code)
+  type_defs = [f'typedef struct {get_old_fake_type(t)} {{}} {get_old_fake_type(t)};' for t in template_types]
+  return '\n'.join(type_defs + raw_code.split('\n'))
+
+
+def old_remove_template_usage(raw_code):
+  while True:
+    next_code = remove_innermost_template_usage(raw_code)
+    if next_code == raw_code:
+      return raw_code
+    raw_code = next_code
+
+
+def get_old_top_ast(raw_code, top_name):
+  code = remove_stream_names(add_type_defs(get_top_func(raw_code, top_name), raw_code))
+  ast = get_parser().parse(preprocess(old_remove_template_usage(code), False), 'old_fake_top_func.cpp')
+  RevertFakeTypeVisitor(ast)
+  return ast
+
+
+def get_code_without_fake_types(ast):
+  """
+  the structs that declare the fake types differ between the rewrites, e.g. the old one also declares the inner types
+  """
+  generator = c_generator.CGenerator()
+  return [
+    generator.visit(node) for node in ast.ext
+    if not (isinstance(node, c_ast.Typedef) and '_ANGLE_BRACKET_BEG_' in node.name)
+  ]
+
+
+def test_same_ast_as_iterative_rewrite(sample):
+  expected = get_code_without_fake_types(get_old_top_ast(sample.source, sample.top_name))
+  assert get_code_without_fake_types(get_top_ast_from_source(sample.source, sample.top_name)) == expected
+
+
+def test_nested_and_comma_types():
+  source = '''
+void top(int n) {
+#pragma HLS dataflow
+  hls::stream<ap_axiu<64, 0, 0, 0> > s;
+  hls::stream<ap_uint<32> > t;
+  f(s, t, n);
+}
+'''
+  generator = c_generator.CGenerator()
+  code = generator.visit(get_top_ast_from_source(source, 'top'))
+  assert 'hls::stream<ap_axiu<64, 0, 0, 0> > s;' in code
+  assert 'hls::stream<ap_uint<32> > t;' in code